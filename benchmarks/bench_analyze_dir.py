@@ -0,0 +1,340 @@
+"""
+Benchmark the directory analysis functions on synthetic dataset layouts.
+
+Generates LibriSpeech-like, Europarl-ST-like, flat (one directory with up to a
+million files) and deep-narrow trees, then measures ``summarize_tree``,
+``find_all_meta_files``, ``read_meta_files`` and ``get_markdown`` on each.
+
+Every (tree, function) pair runs in a fresh subprocess so peak RSS is not
+shared between measurements. Per pair the report has:
+
+* wall time (best of ``--repeat`` runs),
+* filesystem calls per second: ``scandir``/``stat``/``open`` calls counted in a
+  separate instrumented run, divided by the uninstrumented wall time,
+* peak RSS of the subprocess, and the RSS it had before the measured call,
+* estimated prompt tokens of the function's output.
+
+Results are saved as JSON; pass a previous file to ``--compare`` to print the
+change per measurement.
+
+Usage:
+    python benchmarks/bench_analyze_dir.py --root /tmp/dw-bench --output bench.json
+    python benchmarks/bench_analyze_dir.py --root /tmp/dw-bench --compare bench.json
+"""
+import argparse
+import builtins
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+from dataset_wizard.src import analyze_dir
+from dataset_wizard.src.utils import estimate_tokens
+
+FUNCTIONS = ["summarize_tree", "find_all_meta_files", "read_meta_files", "get_markdown"]
+
+README_TEXT = "Synthetic benchmark corpus.\n" + "Lorem ipsum dolor sit amet.\n" * 40
+
+
+def _touch(path, text=None):
+    with open(path, "w") as f:
+        if text:
+            f.write(text)
+
+
+def make_librispeech(root, scale):
+    """LibriSpeech/<subset>/<speaker>/<chapter>/<speaker>-<chapter>-<utt>.flac + trans.txt."""
+    base = os.path.join(root, "LibriSpeech")
+    os.makedirs(base)
+    for name in ("README.TXT", "SPEAKERS.TXT", "CHAPTERS.TXT", "LICENSE.TXT"):
+        _touch(os.path.join(base, name), README_TEXT)
+    speaker = 19
+    for subset in ("dev-clean", "dev-other", "test-clean", "train-clean-100"):
+        for _ in range(max(1, 4 * scale)):
+            speaker += 37
+            for chapter in (speaker * 10 + 1, speaker * 10 + 7):
+                chapter_dir = os.path.join(base, subset, str(speaker), str(chapter))
+                os.makedirs(chapter_dir)
+                lines = []
+                for utt in range(20):
+                    utt_id = f"{speaker}-{chapter}-{utt:04d}"
+                    _touch(os.path.join(chapter_dir, utt_id + ".flac"))
+                    lines.append(f"{utt_id} SOME TRANSCRIPT WORDS\n")
+                _touch(os.path.join(chapter_dir, f"{speaker}-{chapter}.trans.txt"), "".join(lines))
+
+
+def make_europarl_st(root, scale):
+    """v1.1/<src>/audios/*.m4a and v1.1/<src>/<tgt>/<split>/segments.* and speeches.*."""
+    langs = ["de", "en", "es", "fr", "it", "nl", "pl", "pt", "ro"]
+    base = os.path.join(root, "v1.1")
+    os.makedirs(base)
+    _touch(os.path.join(base, "README"), README_TEXT)
+    for src in langs:
+        audios = os.path.join(base, src, "audios")
+        os.makedirs(audios)
+        for i in range(25 * scale):
+            _touch(os.path.join(audios, f"{src}.2009{i % 12 + 1:02d}{i % 28 + 1:02d}.{i}.3-{i:03d}.m4a"))
+        for tgt in langs:
+            if tgt == src:
+                continue
+            for split in ("train", "dev", "test"):
+                split_dir = os.path.join(base, src, tgt, split)
+                os.makedirs(split_dir)
+                _touch(os.path.join(split_dir, "segments.lst"), f"{src}.20090101.0.3-000 0.00 4.20\n" * 10)
+                for suffix in ("speeches.lst", f"segments.{src}", f"segments.{tgt}",
+                               f"speeches.{src}", f"speeches.{tgt}"):
+                    _touch(os.path.join(split_dir, suffix), "Text of the segment.\n" * 10)
+
+
+def make_flat(root, n_files):
+    """One directory with ``n_files`` images and a labels file."""
+    base = os.path.join(root, "images")
+    os.makedirs(base)
+    _touch(os.path.join(root, "labels.csv"), "file,label\n" + "img_0000000.jpg,cat\n" * 20)
+    for i in range(n_files):
+        _touch(os.path.join(base, f"img_{i:07d}.jpg"))
+
+
+def make_deep_narrow(root, depth):
+    """A single chain of ``depth`` nested directories, each with a wav and a meta file."""
+    path = root
+    for level in range(depth):
+        path = os.path.join(path, f"level_{level:03d}")
+        os.mkdir(path)
+        _touch(os.path.join(path, f"clip_{level:03d}.wav"))
+        _touch(os.path.join(path, "info.json"), '{"level": %d}\n' % level)
+
+
+def tree_builders(args):
+    return {
+        "librispeech": lambda path: make_librispeech(path, args.scale),
+        "europarl_st": lambda path: make_europarl_st(path, args.scale),
+        "flat": lambda path: make_flat(path, args.flat_files),
+        "deep_narrow": lambda path: make_deep_narrow(path, args.deep_depth),
+    }
+
+
+def ensure_tree(root, name, build, params):
+    """Build the tree once per parameter set and reuse it on later runs."""
+    path = os.path.join(root, name)
+    marker = os.path.join(path, ".bench_params.json")
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == params:
+                return path
+    # Other parameters, or a build that was interrupted before the marker.
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    build(path)
+    with open(marker, "w") as f:
+        json.dump(params, f)
+    return path
+
+
+class FsCallCounter:
+    """Count filesystem calls made through ``os`` and ``open`` while active."""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._originals = {}
+
+    def _count(self, n=1):
+        with self._lock:
+            self.calls += n
+
+    def __enter__(self):
+        counter = self
+        original_scandir = os.scandir
+        original_stat = os.stat
+        original_open = builtins.open
+
+        class CountingEntry:
+            def __init__(self, entry):
+                self._entry = entry
+
+            def __getattr__(self, name):
+                return getattr(self._entry, name)
+
+            def stat(self, *args, **kwargs):
+                counter._count()
+                return self._entry.stat(*args, **kwargs)
+
+        class CountingScandir:
+            def __init__(self, it):
+                self._it = it
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self._it.close()
+
+            def __iter__(self):
+                for entry in self._it:
+                    yield CountingEntry(entry)
+
+            def close(self):
+                self._it.close()
+
+        def scandir(*args, **kwargs):
+            counter._count()
+            return CountingScandir(original_scandir(*args, **kwargs))
+
+        def stat(*args, **kwargs):
+            counter._count()
+            return original_stat(*args, **kwargs)
+
+        def counting_open(*args, **kwargs):
+            counter._count()
+            return original_open(*args, **kwargs)
+
+        self._originals = {"scandir": original_scandir, "stat": original_stat, "open": original_open}
+        os.scandir = scandir
+        os.stat = stat
+        builtins.open = counting_open
+        return self
+
+    def __exit__(self, *exc):
+        os.scandir = self._originals["scandir"]
+        os.stat = self._originals["stat"]
+        builtins.open = self._originals["open"]
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _prepare(func, path):
+    """Build the inputs of ``func`` outside of the measured region."""
+    if func in ("summarize_tree", "get_markdown"):
+        return ()
+    tree = analyze_dir.summarize_tree(path, max_dirs=3, patterns=True)
+    if func == "find_all_meta_files":
+        return (tree,)
+    return (tree, analyze_dir.find_all_meta_files(tree, path))
+
+
+def _call(func, path, prepared):
+    """Run ``func`` once and return its output rendered as prompt text."""
+    if func == "summarize_tree":
+        tree = analyze_dir.summarize_tree(path, max_dirs=3, patterns=True, inspect_archives=True)
+        return analyze_dir.print_summary_to_string(tree)
+    if func == "find_all_meta_files":
+        return "\n".join(analyze_dir.find_all_meta_files(prepared[0], path))
+    if func == "read_meta_files":
+        previews = analyze_dir.read_meta_files(prepared[1], time_budget=None)
+        return "\n".join(line for _, lines in previews for line in lines)
+    return analyze_dir.get_markdown(path, scan_time_budget=None, dir_timeout=None)
+
+
+def run_one(func, path, repeat):
+    """Measure ``func`` on ``path`` in this process; meant to run as a child."""
+    prepared = _prepare(func, path)
+    rss_before = _peak_rss_mb()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = _call(func, path, prepared)
+        timings.append(time.perf_counter() - start)
+    peak_rss = _peak_rss_mb()
+
+    with FsCallCounter() as counter:
+        _call(func, path, prepared)
+
+    wall = min(timings)
+    return {
+        "wall_s": wall,
+        "fs_calls": counter.calls,
+        "fs_calls_per_s": counter.calls / wall if wall > 0 else None,
+        "peak_rss_mb": peak_rss,
+        "rss_before_mb": rss_before,
+        "output_tokens": estimate_tokens(output),
+    }
+
+
+def compare(results, previous):
+    old = {(r["tree"], r["function"]): r for r in previous["results"]}
+    print(f"\n{'tree':<14} {'function':<20} {'wall':>8} {'fs calls/s':>11} {'peak RSS':>9} {'tokens':>8}")
+    for r in results:
+        before = old.get((r["tree"], r["function"]))
+        if before is None:
+            continue
+
+        def change(key):
+            if not before.get(key) or r.get(key) is None:
+                return "n/a"
+            return f"{100 * (r[key] - before[key]) / before[key]:+.0f}%"
+
+        print(
+            f"{r['tree']:<14} {r['function']:<20} {change('wall_s'):>8} "
+            f"{change('fs_calls_per_s'):>11} {change('peak_rss_mb'):>9} {change('output_tokens'):>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--root", default=os.path.join("/tmp", "dataset_wizard_bench"),
+                        help="Where the synthetic trees are generated (reused across runs)")
+    parser.add_argument("--trees", nargs="+", default=["librispeech", "europarl_st", "flat", "deep_narrow"])
+    parser.add_argument("--functions", nargs="+", default=FUNCTIONS, choices=FUNCTIONS)
+    parser.add_argument("--scale", type=int, default=4,
+                        help="Size multiplier for the LibriSpeech- and Europarl-ST-like trees")
+    parser.add_argument("--flat-files", type=int, default=1_000_000)
+    parser.add_argument("--deep-depth", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_analyze_dir.json")
+    parser.add_argument("--compare", help="Previous result JSON to compare against")
+    parser.add_argument("--child", nargs=2, metavar=("FUNCTION", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        func, path = args.child
+        print(json.dumps(run_one(func, path, args.repeat)))
+        return
+
+    builders = tree_builders(args)
+    params = {"scale": args.scale, "flat_files": args.flat_files, "deep_depth": args.deep_depth}
+    results = []
+    print(f"{'tree':<14} {'function':<20} {'wall [s]':>9} {'fs calls/s':>11} {'peak RSS':>9} {'tokens':>7}")
+    for tree in args.trees:
+        path = ensure_tree(args.root, tree, builders[tree], params)
+        for func in args.functions:
+            proc = subprocess.run(
+                [sys.executable, __file__, "--child", func, path, "--repeat", str(args.repeat)],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                raise RuntimeError(f"{func} on {tree} failed:\n{proc.stderr}")
+            result = {"tree": tree, "function": func, **json.loads(proc.stdout.strip().splitlines()[-1])}
+            results.append(result)
+            print(
+                f"{tree:<14} {func:<20} {result['wall_s']:>9.3f} {result['fs_calls_per_s'] or 0:>11,.0f} "
+                f"{result['peak_rss_mb']:>7.1f}MB {result['output_tokens']:>7}"
+            )
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {**params, "repeat": args.repeat},
+        "results": results,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark the concurrent directory walker in ``summarize_tree``.
+
+Builds a synthetic deep tree and times ``summarize_tree`` for several worker
+counts. Local disks answer ``scandir`` in microseconds, so ``--latency-ms``
+adds an artificial delay to every directory scan to mimic Lustre/NFS.
+
+Usage:
+    python benchmarks/bench_summarize_tree.py --depth 4 --fanout 4 --latency-ms 20
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from dataset_wizard.src import analyze_dir
+
+
+def make_deep_tree(root, depth, fanout, files_per_dir):
+    """Create ``fanout`` subdirectories per level down to ``depth``, each with a few files."""
+    def build(path, level):
+        for i in range(files_per_dir):
+            open(os.path.join(path, f"{i:05d}.flac"), "w").close()
+        open(os.path.join(path, "trans.txt"), "w").close()
+        if level == depth:
+            return
+        for i in range(fanout):
+            child = os.path.join(path, f"d{i:03d}")
+            os.mkdir(child)
+            build(child, level + 1)
+
+    build(root, 0)
+
+
+def with_latency(scan_fn, latency):
+    def slow_scan(path, *args, **kwargs):
+        time.sleep(latency)
+        return scan_fn(path, *args, **kwargs)
+    return slow_scan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--files-per-dir", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=20.0,
+                        help="Artificial delay added to every directory scan")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    original_scan = analyze_dir._scan_dir
+    if args.latency_ms > 0:
+        analyze_dir._scan_dir = with_latency(original_scan, args.latency_ms / 1000)
+
+    with tempfile.TemporaryDirectory() as root:
+        make_deep_tree(root, args.depth, args.fanout, args.files_per_dir)
+        max_dirs = args.fanout
+
+        reference = None
+        baseline = None
+        print(f"{'workers':>8} {'best [s]':>10} {'speedup':>8}")
+        for workers in args.workers:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                summary = analyze_dir.summarize_tree(root, max_dirs=max_dirs, workers=workers)
+                timings.append(time.perf_counter() - start)
+            if reference is None:
+                reference = summary
+            elif summary != reference:
+                raise RuntimeError(f"Summary with {workers} workers differs from the first run")
+            best = min(timings)
+            baseline = baseline or best
+            print(f"{workers:>8} {best:>10.3f} {baseline / best:>7.1f}x")
+
+    analyze_dir._scan_dir = original_scan
+
+
+if __name__ == "__main__":
+    main()
@@ -2,24 +2,67 @@ import argparse
 import json
 from pathlib import Path
 import os
+import shutil
+import sys
+import threading
+import time
+import traceback
 
-from dataset_wizard.src.providers.openai_provider import OpenAIProvider
-from dataset_wizard.src.providers.gemini_provider import GeminiProvider
+from dataset_wizard.src.providers.openai_provider import AsyncOpenAIProvider, OpenAIProvider
+from dataset_wizard.src.providers.gemini_provider import AsyncGeminiProvider, GeminiProvider
+from dataset_wizard.src.providers.async_support import SyncProvider
+from dataset_wizard.src.providers.compacting_provider import CompactingProvider
+from dataset_wizard.src.providers.stable_prefix_provider import StablePrefixProvider
+from dataset_wizard.src.providers.scheduled_provider import (
+    DEFAULT_DEADLINE,
+    DEFAULT_MAX_RETRIES,
+    SchedulingProvider,
+)
+from dataset_wizard.src.providers.replay_provider import (
+    LATENCY_PROFILES,
+    AsyncReplayProvider,
+    ReplayProvider,
+)
+from dataset_wizard.src.providers.cached_provider import (
+    DEFAULT_MAX_CACHE_BYTES,
+    CachedProvider,
+    ResponseCache,
+)
 from dataset_wizard.src.utils import load_resource
-from dataset_wizard.src.stages.analyze_dir_stage import AnalyzeDirStage
+from dataset_wizard.src.scan_index import ScanIndex
+from dataset_wizard.src.batch import DEFAULT_WORKERS, SpecError, SpecResponder, load_specs, run_batch
+from dataset_wizard.src.checkpoint import SessionCheckpoint, latest_session, sessions_dir
+from dataset_wizard.src.telemetry import TELEMETRY_FILENAME, InstrumentedProvider, Telemetry
+from dataset_wizard.src.stage_graph import StageGraph
+from dataset_wizard.src.stages.analyze_dir_stage import AnalyzeDirStage, SelectDatasetDirStage
+from dataset_wizard.src.dry_run import DEFAULT_BUDGET_HOURS
 from dataset_wizard.src.stages.define_dataset_stage import DefineDatasetStage
 from dataset_wizard.src.stages.define_datasetdict_stage import DefineDatasetDictStage
+from dataset_wizard.src.stages.dry_run_stage import DryRunDatasetCodeStage
 from dataset_wizard.src.stages.generate_dataset_code_stage import GenerateDatasetCodeStage
-from dataset_wizard.src.stages.validate_dataset_info_stage import ValidateDatasetInfoStage
+from dataset_wizard.src.stages.validate_dataset_info_stage import (
+    SelectReferenceStage,
+    ValidateDatasetInfoStage,
+)
 from dataset_wizard.src.stages.validate_dataset_class import ValidateDatasetClassStage
 from dataset_wizard.src.stages.generate_dataset_class_stage import GenerateDatasetClassStage
 
 DEFAULT_PROVIDER = "openai"
 DEFAULT_MODEL = "o4-mini-2025-04-16"
+RESULTS_DIR = "dataset"
 
 PROVIDER_REGISTRY = {
     "openai": OpenAIProvider,
     "gemini": GeminiProvider,
+    "replay": ReplayProvider,
+}
+
+# asyncio providers (``async def chat``) sharing a pooled HTTP client; wrap in
+# SyncProvider to use them from the stages.
+ASYNC_PROVIDER_REGISTRY = {
+    "openai": AsyncOpenAIProvider,
+    "gemini": AsyncGeminiProvider,
+    "replay": AsyncReplayProvider,
 }
 
 
@@ -66,34 +109,383 @@ def save_results(messages, output_dir="dataset", base_filename="result"):
     print(f"✅ Saved results to:\n  - {json_path}\n  - {md_path}")
 
 
+def index_command(args):
+    """Inspect or invalidate the persistent directory scan index."""
+    with ScanIndex() as index:
+        if args.index_action == "show":
+            rows = index.summary(args.path)
+            print(f"Scan index: {index.path}")
+            if not rows:
+                print("  (empty)")
+            for kind, count, size, updated in rows:
+                last = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(updated))
+                print(f"  {kind:<6} {count:>8} entries {size or 0:>12} bytes  last update {last}")
+        elif args.index_action == "clear":
+            removed = index.invalidate(args.path)
+            target = args.path or "all paths"
+            print(f"Removed {removed} entries for {target} from {index.path}")
+
+
+def provider_model(provider_name, model):
+    """The model ``provider_name`` actually runs; replays are offline and cost nothing."""
+    return "replay" if provider_name == "replay" else model
+
+
+def create_provider(provider_name, model, args):
+    """Instantiate a registry provider as configured on the command line."""
+    model = provider_model(provider_name, model)
+    registry = ASYNC_PROVIDER_REGISTRY if args.async_provider else PROVIDER_REGISTRY
+    provider_cls = registry.get(provider_name)
+    if provider_cls is None:
+        raise ValueError(f"Unknown provider: {provider_name}")
+    if provider_name == "replay":
+        provider = provider_cls(
+            model=model, recording=args.replay_file, profile=args.replay_profile
+        )
+    else:
+        provider = provider_cls(model=model)
+    if args.async_provider:
+        provider = SyncProvider(provider)
+    return provider
+
+
+def cache_command(args):
+    """Inspect or clear the on-disk LLM response cache."""
+    cache = ResponseCache()
+    if args.cache_action == "show":
+        count, size, last_used = cache.summary()
+        print(f"Response cache: {cache.path}")
+        last = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(last_used)) if last_used else "never"
+        print(f"  {count:>8} responses {size:>12} bytes  last use {last}")
+    elif args.cache_action == "clear":
+        removed = cache.clear()
+        print(f"Removed {removed} responses from {cache.path}")
+
+
+def build_provider(provider_name, args, telemetry, cache=None, slots=None):
+    """
+    Create the configured provider and its wrappers, innermost first:
+    scheduling (deadline, retries, rate limit, hedging), stable prompt prefix,
+    compaction, response cache and telemetry.
+
+    Args:
+        cache (ResponseCache): wrap in a ``CachedProvider`` using this cache.
+        slots (threading.Semaphore): LLM request slots shared with other sessions.
+    """
+    provider = create_provider(provider_name, args.model, args)
+    hedge = None
+    if args.hedge_provider or args.hedge_model:
+        hedge = create_provider(
+            args.hedge_provider or provider_name, args.hedge_model or args.model, args
+        )
+    provider = SchedulingProvider(
+        provider,
+        deadline=args.deadline,
+        max_retries=args.max_retries,
+        requests_per_minute=args.rpm,
+        hedge=hedge,
+        hedge_after=args.hedge_after,
+        slots=slots,
+    )
+    if not args.no_prefix_layout:
+        provider = StablePrefixProvider(provider)
+    if not args.no_compaction:
+        provider = CompactingProvider(provider)
+    if cache is not None:
+        provider = CachedProvider(provider, provider_name, cache)
+    return InstrumentedProvider(
+        provider, telemetry, provider_name, provider_model(provider_name, args.model)
+    )
+
+
+def build_stages(args, index=None):
+    """
+    The stages in transcript order; ``StageGraph`` runs independent ones concurrently.
+
+    ``index`` is a scan index shared by several sessions; by default the
+    directory analysis opens its own.
+    """
+    stages = [
+        SelectDatasetDirStage(),
+        AnalyzeDirStage(
+            use_index=not args.no_scan_index, probe_audio=not args.no_audio_probe, index=index
+        ),
+        SelectReferenceStage(),
+        DefineDatasetStage(),
+        DefineDatasetDictStage(),
+        ValidateDatasetInfoStage(),
+        GenerateDatasetCodeStage(candidates=args.candidates),
+    ]
+    if not args.no_dry_run:
+        stages.append(DryRunDatasetCodeStage(budget_hours=args.dry_run_budget))
+    stages += [
+        ValidateDatasetClassStage(),
+        GenerateDatasetClassStage(candidates=args.candidates),
+    ]
+    return stages
+
+
+def batch_command(args):
+    """Run one headless session per dataset spec, several at a time."""
+    try:
+        specs = load_specs(args.spec)
+    except (OSError, ValueError, SpecError) as e:
+        raise SystemExit(f"Cannot read batch spec {args.spec}: {e}")
+    provider_name = args.provider or auto_detect_provider() or DEFAULT_PROVIDER
+    cache = None
+    if args.cache:
+        cache = ResponseCache(max_bytes=int(args.cache_max_mb * 1024 * 1024))
+    # One pool of request slots bounds the LLM concurrency of all sessions.
+    slots = threading.BoundedSemaphore(args.max_concurrent_llm or args.workers)
+    # One connection for all sessions, instead of one writer each on the same file.
+    index = None if args.no_scan_index else ScanIndex()
+
+    def run_session(spec, output_dir):
+        telemetry = Telemetry(output_dir / TELEMETRY_FILENAME)
+        provider = build_provider(provider_name, args, telemetry, cache, slots)
+        stages = build_stages(args, index)
+        checkpoint = SessionCheckpoint(output_dir)
+        responder = SpecResponder(spec, output_dir)
+        context = {"results_dir": str(output_dir)}
+        for stage in stages:
+            stage.context = context
+            stage.checkpoint = checkpoint
+            stage.responder = responder
+        messages = [{"role": "user", "content": load_resource("system_prompt.md")}]
+        session_start = time.perf_counter()
+        result = {}
+        try:
+            messages, completed = StageGraph(stages).run(provider, messages, telemetry)
+            result["status"] = "ok" if completed else "stopped"
+        except Exception as e:
+            traceback.print_exc(file=sys.stdout)
+            result["status"] = "error"
+            result["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            telemetry.emit(
+                "session",
+                provider=provider_name,
+                model=provider_model(provider_name, args.model),
+                wall_s=time.perf_counter() - session_start,
+            )
+            telemetry.close()
+        save_results(messages, output_dir=output_dir)
+        print(telemetry.summary())
+        return {
+            **result,
+            "stages_completed": [record["id"] for record in checkpoint.stages],
+            **telemetry.totals(),
+            # A file rewritten by a later stage (e.g. the dry run) is listed once.
+            "outputs": sorted({path for stage in stages for path in stage.outputs}),
+        }
+
+    report_dir = Path(args.output_dir or Path(RESULTS_DIR) / "batch")
+    print(
+        f"Running {len(specs)} datasets with {args.workers} workers and at most "
+        f"{args.max_concurrent_llm or args.workers} concurrent LLM requests ..."
+    )
+    try:
+        results = run_batch(specs, run_session, report_dir, workers=args.workers)
+    finally:
+        if index is not None:
+            index.close()
+    n_ok = sum(result["status"] == "ok" for result in results)
+    print(f"\n{n_ok} of {len(results)} datasets completed; report: {report_dir / 'summary.md'}")
+    if cache is not None:
+        print(f"Response cache: {cache.hits} hits, {cache.misses} misses")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="CLI tool for chatting with AI via staged prompts."
     )
     parser.add_argument(
-        "--provider", default=None, help="Provider name (e.g., openai, gemini)"
+        "--provider", default=None, help="Provider name (e.g., openai, gemini, replay)"
     )
     parser.add_argument(
         "--model", default=DEFAULT_MODEL, help="Model name (e.g., gpt-4o, gemini-pro)"
     )
+    parser.add_argument(
+        "--no-scan-index",
+        action="store_true",
+        help="Rescan the dataset directory instead of reusing the persistent scan index",
+    )
+    parser.add_argument(
+        "--no-audio-probe",
+        action="store_true",
+        help="Do not read headers of sampled audio files during directory analysis",
+    )
+    parser.add_argument(
+        "--async-provider",
+        action="store_true",
+        help="Run the provider on its asyncio client with pooled connections",
+    )
+    parser.add_argument(
+        "--replay-file",
+        help="With --provider replay: result.json transcript whose replies are replayed",
+    )
+    parser.add_argument(
+        "--replay-profile",
+        choices=sorted(LATENCY_PROFILES),
+        help="With --provider replay: simulated latency (time to first token, tokens/s)",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=DEFAULT_DEADLINE,
+        help="Seconds an LLM request may take, including retries (for streams: until the first chunk, then between chunks)",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=DEFAULT_MAX_RETRIES,
+        help="Retries with jittered exponential backoff on rate limits and transient errors",
+    )
+    parser.add_argument(
+        "--rpm", type=float, default=None, help="Limit LLM requests per minute"
+    )
+    parser.add_argument(
+        "--hedge-provider",
+        default=None,
+        help="Also send a slow request to this provider after --hedge-after seconds; the first answer wins",
+    )
+    parser.add_argument(
+        "--hedge-model", default=None, help="Model for the hedged request (default: --model)"
+    )
+    parser.add_argument(
+        "--hedge-after",
+        type=float,
+        default=30.0,
+        help="Seconds without an answer (or first streamed token) before hedging",
+    )
+    parser.add_argument(
+        "--no-compaction",
+        action="store_true",
+        help="Send the full conversation on every request instead of compacting finished stages",
+    )
+    parser.add_argument(
+        "--no-prefix-layout",
+        action="store_true",
+        help="Send messages in transcript order instead of keeping reference material in a stable prompt prefix",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Answer repeated LLM requests (same provider, model and messages) from the on-disk response cache",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_MAX_CACHE_BYTES / (1024 * 1024),
+        help="Size limit of the response cache; least recently used responses are evicted",
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=1,
+        help="Generate this many code candidates concurrently and keep the best one that passes local checks",
+    )
+    parser.add_argument(
+        "--no-dry-run",
+        action="store_true",
+        help="Do not run the generated create_dataset.py on a sample of the dataset",
+    )
+    parser.add_argument(
+        "--dry-run-budget",
+        type=float,
+        default=DEFAULT_BUDGET_HOURS,
+        metavar="HOURS",
+        help="Ask for a faster create_dataset.py when the projected full run takes longer",
+    )
+    parser.add_argument(
+        "--no-speculation",
+        action="store_true",
+        help="Do not request the likely next reply in the background while you review a proposal",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="SESSION",
+        default=None,
+        help="Continue a checkpointed session ('latest' for the most recent); completed stages are skipped",
+    )
+    parser.add_argument(
+        "--from-stage",
+        metavar="STAGE_ID",
+        default=None,
+        help="Resume (the latest session unless --resume is given) from this stage, re-running it and all later ones",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    index_parser = subparsers.add_parser(
+        "index", help="Inspect or invalidate the persistent directory scan index"
+    )
+    index_parser.add_argument("index_action", choices=["show", "clear"])
+    index_parser.add_argument(
+        "path", nargs="?", default=None,
+        help="Restrict to entries at or below this directory",
+    )
+    cache_parser = subparsers.add_parser(
+        "cache", help="Inspect or clear the on-disk LLM response cache"
+    )
+    cache_parser.add_argument("cache_action", choices=["show", "clear"])
+    batch_parser = subparsers.add_parser(
+        "batch", help="Onboard several datasets without prompts, answering from per-dataset specs"
+    )
+    batch_parser.add_argument(
+        "spec", help="JSON file with a list of dataset specs (path, fields, splits, format, class_name, ...)"
+    )
+    batch_parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS, help="Datasets processed at the same time"
+    )
+    batch_parser.add_argument(
+        "--max-concurrent-llm",
+        type=int,
+        default=None,
+        help="LLM requests in flight across all datasets (default: --workers)",
+    )
+    batch_parser.add_argument(
+        "--output-dir",
+        default=None,
+        help=f"Per-dataset outputs and summary report (default: {RESULTS_DIR}/batch)",
+    )
     args = parser.parse_args()
 
+    if args.command == "index":
+        index_command(args)
+        return
+    if args.command == "cache":
+        cache_command(args)
+        return
+    if args.command == "batch":
+        batch_command(args)
+        return
+
+    resume = args.resume or args.from_stage
+    if resume:
+        session = args.resume or "latest"
+        if session == "latest":
+            session = latest_session(RESULTS_DIR)
+            if session is None:
+                parser.error(f"No checkpointed session in {sessions_dir(RESULTS_DIR)}")
+        try:
+            checkpoint = SessionCheckpoint.load(RESULTS_DIR, session)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        checkpoint = SessionCheckpoint(RESULTS_DIR)
+
     provider_name = args.provider or auto_detect_provider() or DEFAULT_PROVIDER
-    provider_cls = PROVIDER_REGISTRY.get(provider_name)
-    if provider_cls is None:
-        raise ValueError(f"Unknown provider: {provider_name}")
-    provider = provider_cls(model=args.model)
+    cache = None
+    if args.cache:
+        cache = ResponseCache(max_bytes=int(args.cache_max_mb * 1024 * 1024))
+    # Next to the checkpoint, continued when the session is resumed.
+    telemetry = Telemetry(checkpoint.path.parent / TELEMETRY_FILENAME, append=bool(resume))
+    provider = build_provider(provider_name, args, telemetry, cache)
 
-    # Define stages
-    stages = [
-        AnalyzeDirStage(),
-        DefineDatasetStage(),
-        DefineDatasetDictStage(),
-        ValidateDatasetInfoStage(),
-        GenerateDatasetCodeStage(),
-        ValidateDatasetClassStage(),
-        GenerateDatasetClassStage(),
-    ]
+    stages = build_stages(args)
+    context = {}
+    for stage in stages:
+        stage.context = context
+        stage.checkpoint = checkpoint
 
     messages = []
     # The very initial system prompt
@@ -103,11 +495,44 @@ def main():
             "content": load_resource("system_prompt.md"),
         }
     )
+    skip = set()
+    if resume:
+        try:
+            skip, messages = checkpoint.restore(stages, provider, args.from_stage)
+        except ValueError as e:
+            parser.error(str(e))
+    context["speculation"] = not args.no_speculation
     clear_screen()
-    for stage in stages:
-        messages = stage.run(provider, messages)
+    if resume:
+        skipped = ", ".join(stage.id for stage in stages if stage.id in skip) or "none"
+        print(f"Resuming session {checkpoint.session}; skipping completed stages: {skipped}\n")
+    session_start = time.perf_counter()
+    try:
+        messages, _ = StageGraph(stages).run(provider, messages, telemetry, skip=skip)
+    except BaseException:
+        if checkpoint.stages:
+            print(
+                f"\nProgress up to the last completed stage is saved; continue with "
+                f"--resume {checkpoint.session}"
+            )
+        raise
+    finally:
+        telemetry.emit(
+            "session",
+            provider=provider_name,
+            model=provider_model(provider_name, args.model),
+            wall_s=time.perf_counter() - session_start,
+        )
+        telemetry.close()
+        # The whole session's events also go next to result.json.
+        telemetry_path = Path(RESULTS_DIR) / TELEMETRY_FILENAME
+        shutil.copyfile(telemetry.path, telemetry_path)
 
-    save_results(messages)
+    save_results(messages, output_dir=RESULTS_DIR)
+    print(f"\nSession telemetry (events in {telemetry_path}):")
+    print(telemetry.summary())
+    if cache is not None:
+        print(f"Response cache: {cache.hits} hits, {cache.misses} misses")
 
 if __name__ == "__main__":
     main()
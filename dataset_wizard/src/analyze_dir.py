@@ -1,6 +1,36 @@
+import heapq
+import itertools
 import os
+import re
+import sqlite3
+import time
 from typing import Dict, Union
-from collections import defaultdict
+from bisect import insort
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from dataset_wizard.src.archive_listing import (
+    DEFAULT_ARCHIVE_PREVIEW_BYTES,
+    DEFAULT_ARCHIVE_TIME_BUDGET,
+    DEFAULT_MAX_MEMBERS,
+    archive_format,
+    list_archive,
+)
+from dataset_wizard.src.audio_probe import (
+    DEFAULT_AUDIO_SAMPLE_SIZE,
+    format_audio_summary,
+    probe_audio,
+    select_audio_sample,
+    summarize_audio,
+)
+from dataset_wizard.src.name_patterns import (
+    add_name,
+    best_templates,
+    new_pattern_stats,
+    render_patterns,
+    template_key,
+)
+from dataset_wizard.src.scan_index import stat_stamp
+from dataset_wizard.src.utils import DaemonThreadPool, estimate_tokens
 
 ARCHIVE_LIKE_EXTS = {
     '.zip', '.tar', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar',
@@ -8,53 +38,615 @@ ARCHIVE_LIKE_EXTS = {
     '.bin', '.dat'
 }
 
-def summarize_tree(path, max_dirs=5, max_files=100):
-    def summarize_dir(current_path) -> Dict[str, Union[list, dict]]:
-        summary = {}
-        try:
-            entries = os.scandir(current_path)
-        except Exception as e:
-            return {"_error": str(e)}
-
-        dirs = []
-        files_by_ext = defaultdict(list)
-        for entry in sorted(entries, key=lambda e: e.name):
-            if entry.name.startswith('.'):
+# Directory scans are dominated by metadata round trips on network
+# filesystems, so a few threads hide most of the latency.
+DEFAULT_SCAN_WORKERS = 8
+DEFAULT_SCAN_TIME_BUDGET = 120.0
+DEFAULT_DIR_TIMEOUT = 30.0
+
+# Meta previews: a single "line" of a minified manifest can be hundreds of MB.
+DEFAULT_PREVIEW_BYTES = 64 * 1024
+DEFAULT_PREVIEW_LINE_CHARS = 1000
+DEFAULT_PREVIEW_TIME_BUDGET = 10.0
+TRUNCATED_MARKER = " [...truncated]"
+_NEWLINE_RE = re.compile(r"\r\n|\r|\n")
+
+# Prompt rendering: default budget for the analysis message, a rough cost of
+# its fixed header, and what makes a meta preview worth keeping.
+DEFAULT_TOKEN_BUDGET = 6000
+HEADER_TOKENS = 20
+PREVIEW_KEYWORDS = ('readme', 'speaker', 'meta', 'info', 'manifest', 'license', 'split', 'index')
+MANIFEST_EXTS = {'.csv', '.tsv', '.json', '.jsonl', '.lst', '.txt', '.yaml', '.yml', '.xml'}
+
+# Archives listed per directory when archive inspection is on, and archive
+# members whose contents are never worth previewing.
+MAX_ARCHIVES_PER_DIR = 10
+MAX_ARCHIVE_PREVIEWS = 256
+NO_PREVIEW_EXTS = ARCHIVE_LIKE_EXTS | {
+    '.flac', '.wav', '.mp3', '.ogg', '.opus', '.m4a', '.aac', '.mp4', '.mkv',
+    '.webm', '.avi', '.mov', '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif',
+    '.tiff', '.npy', '.npz', '.pt', '.pth', '.ckpt', '.safetensors', '.arrow',
+    '.parquet', '.h5', '.hdf5', '.pkl', '.pdf'
+}
+
+
+def _keep_smallest(names, name, k):
+    """
+    Insert ``name`` into the sorted list ``names``, keeping only the ``k`` smallest.
+
+    Returns:
+        str: the name that did not make it (``name`` or an evicted one), or None.
+    """
+    if len(names) < k:
+        insort(names, name)
+        return None
+    if name < names[-1]:
+        insort(names, name)
+        return names.pop()
+    return name
+
+
+def _add_file(exts, name, size, sample_size, patterns=None):
+    """Count a file into the per-extension stats (and name patterns) of a scan record."""
+    ext = os.path.splitext(name)[1]
+    stats = exts.get(ext)
+    if stats is None:
+        stats = exts[ext] = {"count": 0, "bytes": 0, "sample": []}
+    stats["count"] += 1
+    stats["bytes"] += size
+    if patterns is not None:
+        if ext not in patterns:
+            patterns[ext] = new_pattern_stats()
+        add_name(patterns[ext], name)
+    return _keep_smallest(stats["sample"], name, sample_size)
+
+
+def _scan_dir(
+    current_path,
+    max_dirs=5,
+    sample_size=5,
+    with_sizes=False,
+    inspect_archives=False,
+    patterns=False,
+):
+    """
+    Read a single directory level in one streaming pass.
+
+    Only counts and the ``sample_size`` lexicographically smallest names per
+    extension are kept, so memory does not grow with the number of entries.
+
+    Returns:
+        dict: {"dirs": first ``max_dirs`` subdirectory names, "n_dirs": int,
+               "exts": {ext: {"count": int, "bytes": int, "sample": [names]}},
+               "archives": listable archive names (with ``inspect_archives``),
+               "patterns"/"dir_patterns": name templates (with ``patterns``)}
+    """
+    sample_size = max(1, sample_size)
+    dirs = []
+    n_dirs = 0
+    exts = {}
+    archives = []
+    file_patterns = {} if patterns else None
+    dir_patterns = new_pattern_stats() if patterns else None
+    with os.scandir(current_path) as it:
+        for entry in it:
+            name = entry.name
+            if name.startswith('.'):
                 continue
             if entry.is_dir():
-                dirs.append(entry.name)
+                n_dirs += 1
+                if max_dirs > 0:
+                    _keep_smallest(dirs, name, max_dirs)
+                if patterns:
+                    add_name(dir_patterns, name, split_ext=False)
+                continue
+            ext = os.path.splitext(name)[1]
+            if ext in ARCHIVE_LIKE_EXTS:
+                if inspect_archives and archive_format(name):
+                    _keep_smallest(archives, name, MAX_ARCHIVES_PER_DIR)
+                continue
+            size = 0
+            if with_sizes:
+                try:
+                    size = entry.stat().st_size
+                except OSError:
+                    pass
+            _add_file(exts, name, size, sample_size, file_patterns)
+    record = {"dirs": dirs, "n_dirs": n_dirs, "exts": exts, "archives": archives}
+    if patterns:
+        record["patterns"] = file_patterns
+        record["dir_patterns"] = dir_patterns
+    return record
+
+
+def _index_get(index, kind, path, stamp, params):
+    """``index.get``, with a database error (e.g. locked) counted as a miss."""
+    try:
+        return index.get(kind, path, stamp, params)
+    except sqlite3.Error:
+        return None
+
+
+def _index_put(index, kind, path, stamp, params, payload):
+    """``index.put``; the entry is dropped if the database is unavailable."""
+    try:
+        index.put(kind, path, stamp, params, payload)
+    except sqlite3.Error:
+        pass
+
+
+def _scan_dir_indexed(current_path, options, index=None):
+    """Serve the scan record from ``index`` when the directory is unchanged."""
+    if index is None:
+        return _scan_dir(current_path, **options)
+
+    # Stamp before scanning: a change during the scan makes the next run rescan.
+    stamp = stat_stamp(current_path)
+    record = _index_get(index, "dir", current_path, stamp, options)
+    if record is None:
+        record = _scan_dir(current_path, **options)
+        _index_put(index, "dir", current_path, stamp, options, record)
+    return record
+
+
+def _scan_archive(archive_path, max_dirs=5, sample_size=5, patterns=False, preview_lines=5):
+    """
+    List an archive into scan records shaped like ``_scan_dir`` output, one per
+    directory inside the archive (keyed by its relative path, "" for the root).
+    Previews are captured on the fly for text-like members that end up among
+    the sampled names, since a tar stream cannot be rewound.
+
+    Returns:
+        dict: {"format", "members", "truncated", "records", "previews"}
+    """
+    sample_size = max(1, sample_size)
+
+    def new_record():
+        return {"dirs": set(), "exts": {}, "patterns": {} if patterns else None}
+
+    records = {"": new_record()}
+    previews = {}
+
+    def split(name):
+        parts = [part for part in name.split("/") if part not in ("", ".")]
+        if any(part.startswith(".") for part in parts):
+            return None
+        return parts
+
+    def record_for(parts):
+        rel = ""
+        for part in parts:
+            records[rel]["dirs"].add(part)
+            rel = os.path.join(rel, part)
+            if rel not in records:
+                records[rel] = new_record()
+        return rel, records[rel]
+
+    def want_preview(name):
+        parts = split(name)
+        if not parts or len(previews) >= MAX_ARCHIVE_PREVIEWS:
+            return False
+        ext = os.path.splitext(parts[-1])[1]
+        if ext in NO_PREVIEW_EXTS:
+            return False
+        stats = records.get(os.path.join("", *parts[:-1]), {"exts": {}})["exts"].get(ext)
+        return stats is None or len(stats["sample"]) < sample_size or parts[-1] < stats["sample"][-1]
+
+    def on_member(name, size, is_dir, preview):
+        parts = split(name)
+        if not parts:
+            return
+        if is_dir:
+            record_for(parts)
+            return
+        if os.path.splitext(parts[-1])[1] in ARCHIVE_LIKE_EXTS:
+            return
+        rel, record = record_for(parts[:-1])
+        dropped = _add_file(record["exts"], parts[-1], size, sample_size, record["patterns"])
+        if dropped is not None:
+            previews.pop(os.path.join(rel, dropped), None)
+        if preview is not None and dropped != parts[-1]:
+            if b"\0" in preview:
+                lines = ["[binary content]"]
             else:
-                ext = os.path.splitext(entry.name)[1]
-                if ext in ARCHIVE_LIKE_EXTS:
-                    continue  
-                files_by_ext[ext].append(entry.name)
+                lines = _split_preview(
+                    preview, preview_lines, DEFAULT_ARCHIVE_PREVIEW_BYTES, DEFAULT_PREVIEW_LINE_CHARS
+                )
+            previews[os.path.join(rel, parts[-1])] = lines
+
+    info = list_archive(
+        archive_path,
+        on_member,
+        want_preview=want_preview,
+        preview_bytes=DEFAULT_ARCHIVE_PREVIEW_BYTES,
+        max_members=DEFAULT_MAX_MEMBERS,
+        time_budget=DEFAULT_ARCHIVE_TIME_BUDGET,
+    )
+    for record in records.values():
+        names = sorted(record["dirs"])
+        record["n_dirs"] = len(names)
+        record["dirs"] = names[:max_dirs]
+        record["archives"] = []
+        if patterns:
+            record["dir_patterns"] = new_pattern_stats()
+            for name in names:
+                add_name(record["dir_patterns"], name, split_ext=False)
+        else:
+            del record["patterns"]
+    info["records"] = records
+    info["previews"] = previews
+    return info
+
+
+def _scan_archive_indexed(archive_path, options, index=None):
+    kwargs = {key: options[key] for key in ("max_dirs", "sample_size", "patterns")}
+    if index is None:
+        return _scan_archive(archive_path, **kwargs)
+
+    stamp = stat_stamp(archive_path, with_size=True)
+    listing = _index_get(index, "archive", archive_path, stamp, kwargs)
+    if listing is None:
+        listing = _scan_archive(archive_path, **kwargs)
+        _index_put(index, "archive", archive_path, stamp, kwargs, listing)
+    return listing
+
+
+class ScanSkipped(Exception):
+    """A directory or archive that was not scanned within the time limits."""
+
+
+class ScanProgress:
+    """Live counters of a running tree scan, readable from another thread."""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.dirs = 0
+        self.files = 0
+        self.skipped = 0
+
+    def update(self, record):
+        if "records" in record:  # archive listing
+            self.files += record["members"]
+        else:
+            self.dirs += 1
+            self.files += sum(stats["count"] for stats in record["exts"].values())
+
+    def status(self) -> str:
+        elapsed = max(time.monotonic() - self.start, 1e-6)
+        text = (
+            f"{self.dirs:,} dirs, {self.files:,} files "
+            f"({self.dirs / elapsed:,.0f} dirs/s, {self.files / elapsed:,.0f} files/s)"
+        )
+        if self.skipped:
+            text += f", {self.skipped} skipped"
+        return text
+
+
+def _walk_concurrently(
+    path,
+    options,
+    workers,
+    index=None,
+    time_budget=None,
+    dir_timeout=None,
+    progress=None,
+):
+    """
+    Scan ``path`` and the first ``max_dirs`` subdirectories of every level on a
+    bounded thread pool, breadth-first: shallower directories are always
+    scanned before deeper ones, and at most ``workers`` scans are in flight.
+    Archives found along the way are listed on the same pool.
 
-        bulk_exts = {ext for ext, files in files_by_ext.items() if len(files) >= max_files}
+    With ``time_budget`` the walk stops after that many seconds, and with
+    ``dir_timeout`` a single directory scan is abandoned after that long.
+    Whatever was not scanned is recorded as ``ScanSkipped`` so the summary
+    stays well-formed. Abandoned scans are left to finish on daemon threads,
+    which do not hold up the interpreter's exit.
 
-        file_summary = {}
-        for ext, files in files_by_ext.items():
-            tag = "_bulk" if ext in bulk_exts else "_meta"
-            display = files[:5]
-            if len(files) > 5:
-                display.append(f"... and {len(files) - 5} more")
-            if tag not in file_summary:
-                file_summary[tag] = []
-            file_summary[tag].extend(display)
+    Args:
+        options (dict): keyword arguments for ``_scan_dir``.
+        progress (ScanProgress): optional live counters.
 
-        dir_summaries = {}
-        for subdir in dirs[:max_dirs]:
-            dir_summaries[subdir] = summarize_dir(os.path.join(current_path, subdir))
-        if len(dirs) > max_dirs:
-            dir_summaries["_more_dirs"] = f"... and {len(dirs) - max_dirs} more"
+    Returns:
+        dict: {directory or archive path: scan record or Exception}
+    """
+    scans = {}
+    workers = max(1, workers)
+    limited = time_budget is not None or dir_timeout is not None
+    # Headroom so that abandoned scans do not starve the pool.
+    pool = DaemonThreadPool(workers * 2 if limited else workers)
+    start = time.monotonic()
+    frontier = []
+    order = itertools.count()
+    running = {}
 
-        summary.update(dir_summaries)
-        summary.update(file_summary)
-        return summary
+    def push(kind, current_path, depth):
+        heapq.heappush(frontier, (depth, next(order), kind, current_path))
 
-    return summarize_dir(path)
+    def skip(current_path, reason):
+        scans[current_path] = ScanSkipped(reason)
+        if progress is not None:
+            progress.skipped += 1
 
+    push("dir", path, 0)
+    try:
+        while frontier or running:
+            if time_budget is not None and time.monotonic() - start > time_budget:
+                break
+            while frontier and len(running) < workers:
+                depth, _, kind, current_path = heapq.heappop(frontier)
+                scan_fn = _scan_dir_indexed if kind == "dir" else _scan_archive_indexed
+                future = pool.submit(scan_fn, current_path, options, index)
+                running[future] = (current_path, kind, depth, time.monotonic())
 
-def print_summary_to_string(summary, indent=0) -> str:
+            deadlines = []
+            if time_budget is not None:
+                deadlines.append(start + time_budget)
+            if dir_timeout is not None:
+                deadlines.extend(
+                    started + dir_timeout
+                    for _, kind, _, started in running.values() if kind == "dir"
+                )
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                current_path, _, depth, _ = running.pop(future)
+                try:
+                    record = future.result()
+                except Exception as e:
+                    scans[current_path] = e
+                    continue
+                scans[current_path] = record
+                if progress is not None:
+                    progress.update(record)
+                for subdir in record.get("dirs", []):
+                    push("dir", os.path.join(current_path, subdir), depth + 1)
+                for archive in record.get("archives", []):
+                    push("archive", os.path.join(current_path, archive), depth + 1)
+
+            if dir_timeout is not None:
+                now = time.monotonic()
+                for future, (current_path, kind, _, started) in list(running.items()):
+                    if kind == "dir" and now - started > dir_timeout:
+                        del running[future]
+                        skip(current_path, f"scan timed out after {dir_timeout:g}s")
+    finally:
+        for current_path, _, _, _ in running.values():
+            skip(current_path, "scan time budget exhausted")
+        for _, _, _, current_path in frontier:
+            skip(current_path, "scan time budget exhausted")
+        pool.shutdown(cancel_futures=True)
+    return scans
+
+
+def _layout_signature(summary):
+    """
+    Structure of a summarized directory with counts and concrete names
+    abstracted away: per-extension bulk/meta tags and name templates, plus the
+    name templates and layouts of its subdirectories.
+    """
+    if "_error" in summary or "_unexplored" in summary:
+        return ("error",)
+    files = frozenset(
+        (ext, stats["bulk"], frozenset(stats.get("templates", ())))
+        for ext, stats in summary.get("_stats", {}).get("files", {}).items()
+    )
+    children = frozenset(
+        (template_key(name, split_ext=False), _layout_signature(child))
+        for name, child in summary.items()
+        if not name.startswith("_") and isinstance(child, dict)
+    )
+    return files, children
+
+
+def _collapse_siblings(record, dir_summaries):
+    """
+    Replace scanned sibling directories that share one layout by a single
+    representative labelled with their name template (``_group``). When every
+    scanned sibling matches and all sibling names follow one template, the
+    group stands for all of them instead of stopping at ``max_dirs``.
+    """
+    def group_key(subdir):
+        # Only names that differ in their fields (19/, 26/, ...) are grouped,
+        # never distinct literal names such as train/ and dev/.
+        return template_key(subdir, split_ext=False), _layout_signature(dir_summaries[subdir])
+
+    groups = {}
+    for subdir in record["dirs"]:
+        groups.setdefault(group_key(subdir), []).append(subdir)
+    if all(len(members) < 2 for members in groups.values()):
+        return dir_summaries
+
+    dir_templates, overflow = best_templates(record["dir_patterns"])
+    covers_all = len(groups) == 1 and len(dir_templates) == 1 and not overflow
+
+    collapsed = {}
+    for subdir in record["dirs"]:
+        members = groups[group_key(subdir)]
+        if len(members) < 2:
+            collapsed[subdir] = dir_summaries[subdir]
+            continue
+        if subdir != members[0]:
+            continue
+        if covers_all:
+            stats = record["dir_patterns"]
+        else:
+            stats = new_pattern_stats()
+            for name in members:
+                add_name(stats, name, split_ext=False)
+        label = " | ".join(render_patterns(stats, suffix="/"))
+        summary = dict(dir_summaries[subdir])
+        summary["_group"] = f"{label} (same layout in the {len(members)} scanned, shown once)"
+        collapsed[subdir] = summary
+    if covers_all:
+        return collapsed
+    if "_more_dirs" in dir_summaries:
+        collapsed["_more_dirs"] = dir_summaries["_more_dirs"]
+    return collapsed
+
+
+def _assemble_summary(current_path, scans, max_files) -> Dict[str, Union[list, dict]]:
+    """Turn the collected scan records below ``current_path`` into the nested summary."""
+    summary = {}
+    record = scans[current_path]
+    if isinstance(record, ScanSkipped):
+        return {"_unexplored": str(record)}
+    if isinstance(record, Exception):
+        return {"_error": str(record)}
+    patterns = record.get("patterns")
+
+    # Same order as listing the directory sorted by name: an extension
+    # appears where its first file would have.
+    exts = sorted(record["exts"].items(), key=lambda item: item[1]["sample"][0])
+
+    file_summary = {}
+    for ext, stats in exts:
+        tag = "_bulk" if stats["count"] >= max_files else "_meta"
+        if tag == "_bulk" and patterns:
+            display = render_patterns(patterns[ext])
+        else:
+            display = list(stats["sample"])
+            if stats["count"] > len(display):
+                display.append(f"... and {stats['count'] - len(display)} more")
+        if tag not in file_summary:
+            file_summary[tag] = []
+        file_summary[tag].extend(display)
+
+    dir_summaries = {}
+    for subdir in record["dirs"]:
+        dir_summaries[subdir] = _assemble_summary(
+            os.path.join(current_path, subdir), scans, max_files
+        )
+    if record["n_dirs"] > len(record["dirs"]):
+        dir_summaries["_more_dirs"] = f"... and {record['n_dirs'] - len(record['dirs'])} more"
+
+    summary["_stats"] = {
+        "dirs": record["n_dirs"],
+        "files": {},
+    }
+    for ext, stats in exts:
+        ext_stats = {
+            "count": stats["count"],
+            "bytes": stats["bytes"],
+            "bulk": stats["count"] >= max_files,
+            "sample": stats["sample"],
+        }
+        if patterns:
+            ext_stats["templates"] = sorted(best_templates(patterns[ext])[0])
+        summary["_stats"]["files"][ext] = ext_stats
+
+    if patterns is not None:
+        dir_summaries = _collapse_siblings(record, dir_summaries)
+
+    summary.update(dir_summaries)
+    summary.update(file_summary)
+
+    archive_summaries = {}
+    for archive in record.get("archives", []):
+        listing = scans.get(os.path.join(current_path, archive))
+        if listing is None:
+            continue
+        if isinstance(listing, ScanSkipped):
+            archive_summaries[archive] = {"unexplored": str(listing)}
+            continue
+        if isinstance(listing, Exception):
+            archive_summaries[archive] = {"error": str(listing)}
+            continue
+        tree = _assemble_summary("", listing["records"], max_files)
+        archive_summaries[archive] = {
+            "format": listing["format"],
+            "members": listing["members"],
+            "truncated": listing["truncated"],
+            "tree": tree,
+            "previews": [
+                (member, listing["previews"][member])
+                for member in find_all_meta_files(tree, "")
+                if member in listing["previews"]
+            ],
+        }
+    if archive_summaries:
+        summary["_archives"] = archive_summaries
+
+    # Keep _stats last, after the entries that are rendered.
+    summary["_stats"] = summary.pop("_stats")
+    return summary
+
+
+def summarize_tree(
+    path,
+    max_dirs=5,
+    max_files=100,
+    workers=DEFAULT_SCAN_WORKERS,
+    sample_size=5,
+    with_sizes=False,
+    index=None,
+    inspect_archives=False,
+    patterns=False,
+    time_budget=None,
+    dir_timeout=None,
+    progress=None,
+):
+    """
+    Summarize a directory tree into nested dicts of ``_bulk``/``_meta`` files.
+
+    Files are aggregated per extension while streaming, so a flat directory
+    with millions of files costs the same memory as one with a hundred. Each
+    level also carries a ``_stats`` entry with the per-extension counts (and
+    total bytes when ``with_sizes`` is set).
+
+    Args:
+        path (str): root directory to summarize.
+        max_dirs (int): number of subdirectories to descend into per level.
+        max_files (int): files of one extension at which they count as bulk.
+        workers (int): number of threads used to scan sibling directories.
+        sample_size (int): example file names listed per extension.
+        with_sizes (bool): also sum file sizes (one extra stat per file).
+        index (ScanIndex): optional persistent index; unchanged directories are
+            not rescanned.
+        inspect_archives (bool): list zip/tar archives from their headers and
+            summarize their members under ``_archives`` instead of skipping them.
+        patterns (bool): list bulk files as inferred name templates with value
+            ranges (``{int}-{int:04}.flac ×28539 [...]``) and collapse sibling
+            directories with identical layout into one ``_group`` entry.
+        time_budget (float): stop scanning after this many seconds; directories
+            not reached are marked ``_unexplored``.
+        dir_timeout (float): give up on a single directory scan after this many
+            seconds (e.g. a hung network mount).
+        progress (ScanProgress): live dir/file counters, e.g. for a spinner.
+
+    Returns:
+        dict: nested summary of the tree.
+    """
+    options = {
+        "max_dirs": max_dirs,
+        "sample_size": sample_size,
+        "with_sizes": with_sizes,
+        "inspect_archives": inspect_archives,
+        "patterns": patterns,
+    }
+    scans = _walk_concurrently(
+        path, options, workers, index, time_budget, dir_timeout, progress
+    )
+    return _assemble_summary(path, scans, max_files)
+
+
+def _elided_line(summary, indent):
+    stats = summary.get("_stats", {})
+    n_files = sum(ext["count"] for ext in stats.get("files", {}).values())
+    return "    " * indent + f"... {stats.get('dirs', 0)} subdirectories and {n_files} files not shown"
+
+
+def print_summary_to_string(summary, indent=0, max_depth=None) -> str:
+    """
+    Render a ``summarize_tree`` result as an indented listing.
+
+    Args:
+        max_depth (int): directories at this indent level are shown with a
+            one-line count of their contents instead of being expanded.
+    """
+    if max_depth is not None and indent >= max_depth:
+        return _elided_line(summary, indent)
     lines = []
     for name, content in summary.items():
         if name == "_bulk":
@@ -67,9 +659,30 @@ def print_summary_to_string(summary, indent=0) -> str:
             lines.append("    " * indent + content)
         elif name == "_error":
             lines.append("    " * indent + f"- [error] {content}")
+        elif name == "_unexplored":
+            lines.append("    " * indent + f"- [unexplored] {content}")
+        elif name == "_stats":
+            continue
+        elif name == "_archives":
+            for archive, listing in content.items():
+                if "unexplored" in listing:
+                    lines.append("    " * indent + f"- [archive] {archive}: [unexplored] {listing['unexplored']}")
+                    continue
+                if "error" in listing:
+                    lines.append("    " * indent + f"- [archive] {archive}: [error] {listing['error']}")
+                    continue
+                note = ", listing truncated" if listing["truncated"] else ""
+                lines.append(
+                    "    " * indent
+                    + f"- [archive] {archive} ({listing['format']}, {listing['members']:,} members{note})"
+                )
+                if listing["tree"]:
+                    lines.append(print_summary_to_string(listing["tree"], indent + 1, max_depth))
+        elif name == "_group":
+            continue
         else:
-            lines.append("    " * indent + f"{name}/")
-            lines.append(print_summary_to_string(content, indent + 1))
+            lines.append("    " * indent + content.get("_group", f"{name}/"))
+            lines.append(print_summary_to_string(content, indent + 1, max_depth))
     return "\n".join(lines)
 
 
@@ -79,42 +692,285 @@ def find_all_meta_files(summary, current_path, current_prefix=""):
         if key == "_meta":
             for f in val:
                 results.append(os.path.join(current_path, f))
+        elif key in ("_stats", "_archives"):
+            continue
         elif isinstance(val, dict):
             new_prefix = os.path.join(current_path, key)
             results.extend(find_all_meta_files(val, new_prefix))
     return results
 
 
-def read_meta_files(meta_paths, max_lines=5):
+def find_archive_previews(summary, current_path):
+    """
+    Collect the member previews captured while listing archives.
+
+    Returns:
+        List[Tuple[str, List[str]]]: ("<archive path>::<member>", preview lines).
+    """
+    results = []
+    for key, val in summary.items():
+        if key == "_archives":
+            for archive, listing in val.items():
+                for member, lines in listing.get("previews", []):
+                    results.append((f"{os.path.join(current_path, archive)}::{member}", lines))
+        elif key == "_stats":
+            continue
+        elif isinstance(val, dict):
+            results.extend(find_archive_previews(val, os.path.join(current_path, key)))
+    return results
+
+
+def _read_preview(full_path, max_lines, max_bytes, max_line_chars):
+    """
+    Read at most ``max_bytes`` from the start of a file and return its first
+    ``max_lines`` lines. Lines cut by either limit end with ``TRUNCATED_MARKER``,
+    so a minified JSON or CSV "line" never costs more than ``max_bytes``.
+    """
+    with open(full_path, "rb") as f:
+        data = f.read(max_bytes + 1)
+    return _split_preview(data, max_lines, max_bytes, max_line_chars)
+
+
+def _split_preview(data, max_lines, max_bytes, max_line_chars):
+    """Split the first ``max_bytes + 1`` bytes of a file into marked preview lines."""
+    hit_byte_cap = len(data) > max_bytes
+    text = data[:max_bytes].decode("utf-8", errors="ignore")
+
+    # Same line endings as text-mode iteration (universal newlines).
+    raw_lines = _NEWLINE_RE.split(text)
+    if raw_lines and raw_lines[-1] == "" and not hit_byte_cap:
+        raw_lines.pop()
+
+    lines = []
+    for i, line in enumerate(raw_lines[:max_lines]):
+        cut_by_bytes = hit_byte_cap and i == len(raw_lines) - 1
+        if len(line) > max_line_chars:
+            line = line[:max_line_chars]
+            cut_by_bytes = True
+        lines.append(line + TRUNCATED_MARKER if cut_by_bytes else line)
+    return lines
+
+
+def _read_preview_indexed(full_path, max_lines, max_bytes, max_line_chars, index=None):
+    if index is None:
+        return _read_preview(full_path, max_lines, max_bytes, max_line_chars)
+
+    params = {"max_lines": max_lines, "max_bytes": max_bytes, "max_line_chars": max_line_chars}
+    stamp = stat_stamp(full_path, with_size=True)
+    lines = _index_get(index, "meta", full_path, stamp, params)
+    if lines is None:
+        lines = _read_preview(full_path, max_lines, max_bytes, max_line_chars)
+        _index_put(index, "meta", full_path, stamp, params, lines)
+    return lines
+
+
+def read_meta_files(
+    meta_paths,
+    max_lines=5,
+    index=None,
+    max_bytes=DEFAULT_PREVIEW_BYTES,
+    max_line_chars=DEFAULT_PREVIEW_LINE_CHARS,
+    workers=DEFAULT_SCAN_WORKERS,
+    time_budget=DEFAULT_PREVIEW_TIME_BUDGET,
+):
+    """
+    Read short previews of metadata files concurrently.
+
+    Args:
+        meta_paths (List[str]): files to preview.
+        max_lines (int): lines kept per file.
+        index (ScanIndex): optional persistent index for unchanged files.
+        max_bytes (int): hard cap on bytes read per file.
+        max_line_chars (int): longer lines are cut and marked as truncated.
+        workers (int): number of reader threads.
+        time_budget (float): seconds for the whole preview phase; files not
+            read in time get a placeholder instead. None waits for all.
+
+    Returns:
+        List[Tuple[str, List[str]]]: (path, preview lines) in input order.
+    """
+    # Daemon threads: a read stuck past the budget must not block exit either.
+    pool = DaemonThreadPool(workers)
+    futures = [
+        pool.submit(
+            _read_preview_indexed, full_path, max_lines, max_bytes, max_line_chars, index
+        )
+        for full_path in meta_paths
+    ]
+    wait(futures, timeout=time_budget)
+    # Do not block on reads stuck past the budget (e.g. a hung network mount).
+    pool.shutdown(cancel_futures=True)
+
     previews = []
-    for full_path in meta_paths:
-        try:
-            with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-                lines = [line.rstrip("\n") for _, line in zip(range(max_lines), f)]
-        except Exception as e:
-            lines = [f"[Error reading file: {e}]"]
+    for full_path, future in zip(meta_paths, futures):
+        if not future.done() or future.cancelled():
+            lines = [f"[Preview skipped: time budget of {time_budget}s exceeded]"]
+        elif future.exception() is not None:
+            lines = [f"[Error reading file: {future.exception()}]"]
+        else:
+            lines = future.result()
         previews.append((full_path, lines))
     return previews
 
 
-def get_markdown(download_path):
-    tree = summarize_tree(download_path, max_dirs=3, max_files=100)
+def _tree_depth(summary, indent=0):
+    depth = indent
+    for name, content in summary.items():
+        if name == "_archives":
+            for listing in content.values():
+                if listing.get("tree"):
+                    depth = max(depth, _tree_depth(listing["tree"], indent + 1))
+        elif not name.startswith("_") and isinstance(content, dict):
+            depth = max(depth, _tree_depth(content, indent + 1))
+    return depth
 
-    tree_output = print_summary_to_string(tree)
-    meta_paths = find_all_meta_files(tree, download_path)
-    meta_previews = read_meta_files(meta_paths)
 
-    text = f"""## Analyzed directory: {download_path}
-**tree**
-```
-{tree_output}
-```"""
-    for path, lines in meta_previews:
-        text += f"""
+def _preview_score(rel_path, seen_templates):
+    """
+    Rough informativeness of a meta preview: documentation and manifests near
+    the root first, repeats of an already ranked name template last.
+    """
+    name = os.path.basename(rel_path).lower()
+    score = 5.0
+    if any(word in name for word in PREVIEW_KEYWORDS):
+        score += 3
+    if os.path.splitext(name)[1] in MANIFEST_EXTS:
+        score += 1
+    score -= 0.5 * rel_path.count(os.sep)
+    template = template_key(os.path.basename(rel_path))
+    if template in seen_templates:
+        score -= 3
+    seen_templates.add(template)
+    return score
+
+
+def render_markdown(download_path, tree, meta_previews, audio_text=None, token_budget=None):
+    """
+    Build the analysis prompt, optionally fitted to a token budget.
+
+    Meta previews and tree levels are ranked by informativeness. While the
+    estimate exceeds ``token_budget``, previews are first trimmed to two lines,
+    then the lowest-ranked preview or the deepest tree level (whichever is
+    worth less) is dropped. What was left out is listed at the end.
+
+    Returns:
+        str: markdown text.
+    """
+    tree_depth = _tree_depth(tree)
+    max_depth = None
+    previews = [
+        (os.path.relpath(path, download_path), lines) for path, lines in meta_previews
+    ]
+    seen_templates = set()
+    scores = [_preview_score(rel_path, seen_templates) for rel_path, _ in previews]
+    kept = list(range(len(previews)))
+    dropped = []
+    preview_lines = None
 
-**{os.path.relpath(path, download_path)}**
+    def preview_block(i):
+        rel_path, lines = previews[i]
+        if preview_lines is not None and len(lines) > preview_lines:
+            lines = lines[:preview_lines] + ["..."]
+        preview = "\n".join(lines)
+        return f"""
+
+**{rel_path}**
 ```
-{"\n".join(lines)}
+{preview}
 ```
 """
+
+    def build():
+        parts = [
+            f"""## Analyzed directory: {download_path}
+**tree**
+```
+{print_summary_to_string(tree, max_depth=max_depth)}
+```"""
+        ]
+        if audio_text:
+            parts.append(f"""
+
+**audio**
+{audio_text}
+""")
+        parts.extend(preview_block(i) for i in kept)
+        elided = []
+        if preview_lines is not None:
+            elided.append(f"meta previews trimmed to {preview_lines} lines")
+        if dropped:
+            names = ", ".join(dropped[:5])
+            if len(dropped) > 5:
+                names += f", ... and {len(dropped) - 5} more"
+            elided.append(f"{len(dropped)} meta previews dropped ({names})")
+        if max_depth is not None:
+            elided.append(f"tree collapsed below depth {max_depth}")
+        if elided:
+            parts.append(
+                f"\n_Elided to fit a budget of ~{token_budget} tokens: {'; '.join(elided)}._\n"
+            )
+        return "".join(parts)
+
+    text = build()
+    if token_budget is None or estimate_tokens(text) <= token_budget:
+        return text
+
+    preview_lines = 2
+    while estimate_tokens(text := build()) > token_budget:
+        # A tree level is worth 8 at the root, one less per level down.
+        depth = max_depth if max_depth is not None else tree_depth + 1
+        tree_score = 8 - depth if depth > 1 else None
+        worst = min(kept, key=lambda i: scores[i]) if kept else None
+        if worst is None and tree_score is None:
+            break
+        if worst is not None and (tree_score is None or scores[worst] <= tree_score):
+            kept.remove(worst)
+            dropped.append(previews[worst][0])
+        else:
+            max_depth = depth - 1
     return text
+
+
+def get_markdown(
+    download_path,
+    workers=DEFAULT_SCAN_WORKERS,
+    index=None,
+    preview_time_budget=DEFAULT_PREVIEW_TIME_BUDGET,
+    inspect_archives=True,
+    patterns=True,
+    probe_audio_headers=False,
+    audio_sample_size=DEFAULT_AUDIO_SAMPLE_SIZE,
+    token_budget=DEFAULT_TOKEN_BUDGET,
+    scan_time_budget=DEFAULT_SCAN_TIME_BUDGET,
+    dir_timeout=DEFAULT_DIR_TIMEOUT,
+    progress=None,
+):
+    tree = summarize_tree(
+        download_path,
+        max_dirs=3,
+        max_files=100,
+        workers=workers,
+        index=index,
+        inspect_archives=inspect_archives,
+        patterns=patterns,
+        time_budget=scan_time_budget,
+        dir_timeout=dir_timeout,
+        progress=progress,
+    )
+
+    meta_paths = find_all_meta_files(tree, download_path)
+    meta_previews = read_meta_files(
+        meta_paths, index=index, workers=workers, time_budget=preview_time_budget
+    )
+    meta_previews += find_archive_previews(tree, download_path)
+
+    audio_text = None
+    if probe_audio_headers:
+        strata = select_audio_sample(tree, download_path, audio_sample_size)
+        paths = [path for stratum in strata for path in stratum["paths"]]
+        if paths:
+            probes = dict(zip(paths, probe_audio(paths)))
+            n_dirs = len({os.path.dirname(path) for path in paths})
+            audio_text = format_audio_summary(summarize_audio(strata, probes), n_dirs)
+
+    return render_markdown(download_path, tree, meta_previews, audio_text, token_budget)
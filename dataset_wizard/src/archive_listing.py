@@ -0,0 +1,115 @@
+import tarfile
+import time
+import zipfile
+
+# Suffix -> (format label, tarfile stream mode). Zip archives are handled
+# separately through their central directory.
+TAR_SUFFIXES = {
+    ".tar": ("tar", "r:"),
+    ".tar.gz": ("tar.gz", "r|gz"),
+    ".tgz": ("tar.gz", "r|gz"),
+    ".tar.bz2": ("tar.bz2", "r|bz2"),
+    ".tbz2": ("tar.bz2", "r|bz2"),
+    ".tar.xz": ("tar.xz", "r|xz"),
+    ".txz": ("tar.xz", "r|xz"),
+}
+
+DEFAULT_MAX_MEMBERS = 200_000
+DEFAULT_ARCHIVE_TIME_BUDGET = 60.0
+DEFAULT_ARCHIVE_PREVIEW_BYTES = 8 * 1024
+
+
+def archive_format(name):
+    """
+    Returns:
+        str: "zip", "tar", "tar.gz", ... if ``name`` can be listed, else None.
+    """
+    lower = name.lower()
+    if lower.endswith(".zip"):
+        return "zip"
+    for suffix, (fmt, _) in TAR_SUFFIXES.items():
+        if lower.endswith(suffix):
+            return fmt
+    return None
+
+
+def _tar_mode(name):
+    lower = name.lower()
+    for suffix, (_, mode) in TAR_SUFFIXES.items():
+        if lower.endswith(suffix):
+            return mode
+    raise ValueError(f"Not a tar archive: {name}")
+
+
+def list_archive(
+    path,
+    on_member,
+    want_preview=None,
+    preview_bytes=DEFAULT_ARCHIVE_PREVIEW_BYTES,
+    max_members=DEFAULT_MAX_MEMBERS,
+    time_budget=DEFAULT_ARCHIVE_TIME_BUDGET,
+):
+    """
+    Walk the member headers of a zip or tar archive without extracting it.
+
+    Zip archives are listed from their central directory alone. Tar archives
+    are read as a forward-only stream of headers; plain ``.tar`` files seek
+    past member data, compressed ones have to decompress it but never write
+    anything to disk.
+
+    Args:
+        path (str): archive file.
+        on_member (callable): called as ``on_member(name, size, is_dir, preview)``
+            for each member; ``preview`` is None unless requested.
+        want_preview (callable): ``want_preview(name) -> bool``; for accepted
+            members the first ``preview_bytes + 1`` bytes are read.
+        preview_bytes (int): bytes read per previewed member.
+        max_members (int): stop after this many members.
+        time_budget (float): stop after this many seconds (None for no limit).
+
+    Returns:
+        dict: {"format": str, "members": int, "truncated": bool}
+    """
+    fmt = archive_format(str(path))
+    start = time.monotonic()
+    count = 0
+    truncated = False
+
+    def over_limit():
+        if count >= max_members:
+            return True
+        return time_budget is not None and time.monotonic() - start > time_budget
+
+    if fmt == "zip":
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if over_limit():
+                    truncated = True
+                    break
+                preview = None
+                if not info.is_dir() and want_preview and want_preview(info.filename):
+                    with zf.open(info) as f:
+                        preview = f.read(preview_bytes + 1)
+                on_member(info.filename, info.file_size, info.is_dir(), preview)
+                count += 1
+    else:
+        with tarfile.open(path, mode=_tar_mode(str(path))) as tf:
+            while True:
+                if over_limit():
+                    truncated = True
+                    break
+                member = tf.next()
+                if member is None:
+                    break
+                # TarFile remembers every header it has seen; drop them to keep
+                # memory flat on archives with millions of members.
+                tf.members = []
+                preview = None
+                if member.isfile() and want_preview and want_preview(member.name):
+                    f = tf.extractfile(member)
+                    if f is not None:
+                        preview = f.read(preview_bytes + 1)
+                if member.isdir() or member.isfile():
+                    on_member(member.name, member.size, member.isdir(), preview)
+                count += 1
+    return {"format": fmt, "members": count, "truncated": truncated}
@@ -0,0 +1,294 @@
+import os
+import struct
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import soundfile as sf
+except ImportError:  # optional: only needed for formats other than WAV/FLAC
+    sf = None
+
+AUDIO_EXTS = {'.flac', '.wav', '.ogg', '.opus', '.mp3', '.m4a', '.aiff', '.aif'}
+DEFAULT_AUDIO_SAMPLE_SIZE = 64
+DEFAULT_PROBE_WORKERS = 4
+
+
+def _read_flac_header(f):
+    magic = f.read(4)
+    if magic[:3] == b"ID3":
+        # ID3v2 tag in front of the stream: 10-byte header with a synchsafe size.
+        rest = f.read(6)
+        size = 0
+        for b in rest[2:6]:
+            size = (size << 7) | (b & 0x7F)
+        f.seek(10 + size)
+        magic = f.read(4)
+    if magic != b"fLaC":
+        raise ValueError("not a FLAC stream")
+    block_header = f.read(4)
+    if len(block_header) < 4 or block_header[0] & 0x7F != 0:
+        raise ValueError("missing STREAMINFO block")
+    info = f.read(34)
+    if len(info) < 34:
+        raise ValueError("truncated STREAMINFO block")
+    packed = int.from_bytes(info[10:18], "big")
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    if sample_rate == 0:
+        raise ValueError("invalid sample rate")
+    return {
+        "format": "flac",
+        "sample_rate": sample_rate,
+        "channels": channels,
+        # Zero total samples means "unknown" in STREAMINFO.
+        "duration": total_samples / sample_rate if total_samples else None,
+    }
+
+
+def _read_wav_header(f):
+    riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+    if riff not in (b"RIFF", b"RF64") or wave != b"WAVE":
+        raise ValueError("not a RIFF/WAVE file")
+    fmt = None
+    data_size = None
+    ds64_data_size = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            break
+        chunk_id, chunk_size = struct.unpack("<4sI", chunk)
+        if chunk_id == b"fmt ":
+            body = f.read(chunk_size)
+            _, channels, sample_rate, byte_rate = struct.unpack("<HHII", body[:12])
+            fmt = (channels, sample_rate, byte_rate)
+        elif chunk_id == b"ds64":
+            body = f.read(chunk_size)
+            ds64_data_size = struct.unpack("<Q", body[8:16])[0]
+        elif chunk_id == b"data":
+            data_size = ds64_data_size if chunk_size == 0xFFFFFFFF else chunk_size
+            break
+        else:
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+            continue
+        if chunk_size & 1:
+            f.seek(1, os.SEEK_CUR)
+    if fmt is None:
+        raise ValueError("missing fmt chunk")
+    channels, sample_rate, byte_rate = fmt
+    return {
+        "format": "wav",
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "duration": data_size / byte_rate if data_size is not None and byte_rate else None,
+    }
+
+
+def read_audio_header(path):
+    """
+    Read sample rate, channel count and duration from an audio file header.
+
+    WAV and FLAC headers are parsed directly; other formats go through
+    ``soundfile`` when it is installed. Errors are returned, not raised, so the
+    function can run on a process pool.
+
+    Returns:
+        dict: {"path", "format", "sample_rate", "channels", "duration"} or
+              {"path", "error"}.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        with open(path, "rb") as f:
+            if ext == ".flac":
+                info = _read_flac_header(f)
+            elif ext == ".wav":
+                info = _read_wav_header(f)
+            elif sf is not None:
+                sf_info = sf.info(path)
+                info = {
+                    "format": ext.lstrip("."),
+                    "sample_rate": sf_info.samplerate,
+                    "channels": sf_info.channels,
+                    "duration": sf_info.duration,
+                }
+            else:
+                raise ValueError(f"no header reader for {ext} (install soundfile)")
+    except Exception as e:
+        return {"path": path, "error": str(e)}
+    info["path"] = path
+    return info
+
+
+def select_audio_sample(summary, current_path, sample_size=DEFAULT_AUDIO_SAMPLE_SIZE):
+    """
+    Pick a stratified sample of bulk audio files from a ``summarize_tree`` result.
+
+    Every (directory, extension) with bulk audio is one stratum. Strata get a
+    round-robin share of ``sample_size`` drawn from their listed names, and a
+    weight that scales their file count up by the subdirectories that were not
+    scanned, so per-stratum means can be extrapolated to the whole tree.
+    Strata that get no share are still returned (with empty ``paths``) so they
+    count towards the totals.
+
+    Returns:
+        List[dict]: {"ext", "count", "weight", "paths"} per stratum.
+    """
+    strata = []
+
+    def visit(node, path, weight):
+        stats = node.get("_stats", {})
+        for ext, ext_stats in stats.get("files", {}).items():
+            if ext.lower() in AUDIO_EXTS and ext_stats["bulk"]:
+                strata.append({
+                    "ext": ext.lower(),
+                    "count": ext_stats["count"],
+                    "weight": weight,
+                    "names": [os.path.join(path, name) for name in ext_stats["sample"]],
+                    "paths": [],
+                })
+        subdirs = [key for key, val in node.items() if not key.startswith("_") and isinstance(val, dict)]
+        if subdirs:
+            child_weight = weight * max(stats.get("dirs", len(subdirs)), len(subdirs)) / len(subdirs)
+            for key in subdirs:
+                visit(node[key], os.path.join(path, key), child_weight)
+
+    visit(summary, current_path, 1.0)
+
+    remaining = sample_size
+    while remaining > 0:
+        progressed = False
+        for stratum in strata:
+            if remaining == 0:
+                break
+            if len(stratum["paths"]) < len(stratum["names"]):
+                stratum["paths"].append(stratum["names"][len(stratum["paths"])])
+                remaining -= 1
+                progressed = True
+        if not progressed:
+            break
+    for stratum in strata:
+        del stratum["names"]
+    return strata
+
+
+def probe_audio(paths, workers=DEFAULT_PROBE_WORKERS):
+    """Read audio headers on a process pool, preserving input order."""
+    if not paths:
+        return []
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as pool:
+        return list(pool.map(read_audio_header, paths, chunksize=8))
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+def summarize_audio(strata, probes):
+    """
+    Aggregate header probes into per-extension distributions.
+
+    Args:
+        strata (List[dict]): output of ``select_audio_sample``.
+        probes (dict): {path: ``read_audio_header`` result}.
+
+    Returns:
+        dict: {ext: {"probed", "errors", "sample_rates", "channels",
+                     "duration_percentiles", "estimated_files", "estimated_hours"}}
+    """
+    by_ext = {}
+    for stratum in strata:
+        ext_summary = by_ext.setdefault(stratum["ext"], {
+            "probed": 0,
+            "errors": 0,
+            "sample_rates": Counter(),
+            "channels": Counter(),
+            "durations": [],
+            "estimated_files": 0.0,
+        })
+        stratum_durations = []
+        for path in stratum["paths"]:
+            probe = probes.get(path, {"error": "not probed"})
+            if "error" in probe:
+                ext_summary["errors"] += 1
+                continue
+            ext_summary["probed"] += 1
+            ext_summary["sample_rates"][probe["sample_rate"]] += 1
+            ext_summary["channels"][probe["channels"]] += 1
+            if probe["duration"] is not None:
+                stratum_durations.append(probe["duration"])
+        stratum["durations"] = stratum_durations
+        ext_summary["durations"].extend(stratum_durations)
+        ext_summary["estimated_files"] += stratum["count"] * stratum["weight"]
+
+    for ext, ext_summary in by_ext.items():
+        durations = sorted(ext_summary.pop("durations"))
+        if not durations:
+            ext_summary["duration_percentiles"] = None
+            ext_summary["estimated_hours"] = None
+            continue
+        ext_summary["duration_percentiles"] = {
+            name: _percentile(durations, q)
+            for name, q in (("min", 0.0), ("p5", 0.05), ("p50", 0.5), ("p95", 0.95), ("max", 1.0))
+        }
+        # Strata left out of the sample borrow the extension-wide mean.
+        ext_mean = sum(durations) / len(durations)
+        seconds = 0.0
+        for stratum in strata:
+            if stratum["ext"] != ext:
+                continue
+            mean = (
+                sum(stratum["durations"]) / len(stratum["durations"])
+                if stratum["durations"] else ext_mean
+            )
+            seconds += stratum["count"] * stratum["weight"] * mean
+        ext_summary["estimated_hours"] = seconds / 3600
+    return by_ext
+
+
+def format_audio_summary(audio_summary, n_dirs) -> str:
+    def shares(counter, unit=""):
+        total = sum(counter.values())
+        return ", ".join(
+            f"{value}{unit} ({100 * count / total:.0f}%)" for value, count in counter.most_common()
+        )
+
+    lines = []
+    n_probed = sum(ext["probed"] for ext in audio_summary.values())
+    if not n_probed:
+        n_errors = sum(ext["errors"] for ext in audio_summary.values())
+        per_ext = ", ".join(
+            f"{ext}: {ext_summary['errors']}" for ext, ext_summary in sorted(audio_summary.items())
+        )
+        return (
+            f"Probing audio headers failed: none of the {n_errors} audio files sampled from "
+            f"{n_dirs} directories had a readable header ({per_ext}). Sample rates, channels "
+            "and durations are unknown; the generated code has to read them from the files."
+        )
+    lines.append(
+        f"Headers of {n_probed} audio files sampled from {n_dirs} directories "
+        "(no audio decoded). The generated code can rely on these values instead "
+        "of probing every file."
+    )
+    for ext, ext_summary in sorted(audio_summary.items()):
+        lines.append(f"- {ext}:")
+        if ext_summary["probed"]:
+            lines.append(f"    - sample rates: {shares(ext_summary['sample_rates'], ' Hz')}")
+            lines.append(f"    - channels: {shares(ext_summary['channels'])}")
+        pct = ext_summary["duration_percentiles"]
+        if pct:
+            lines.append(
+                "    - duration [s]: min {min:.2f}, p5 {p5:.2f}, median {p50:.2f}, "
+                "p95 {p95:.2f}, max {max:.2f}".format(**pct)
+            )
+            lines.append(
+                f"    - estimated total: {ext_summary['estimated_hours']:.1f} h "
+                f"over ~{ext_summary['estimated_files']:,.0f} files"
+            )
+        if ext_summary["errors"]:
+            lines.append(f"    - unreadable headers: {ext_summary['errors']}")
+    return "\n".join(lines)
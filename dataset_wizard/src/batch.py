@@ -0,0 +1,241 @@
+import json
+import sys
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from dataset_wizard.src.utils import ThreadOutput, headless
+
+DEFAULT_WORKERS = 4
+# Rounds of "is anything missing?" answered before a session gives up.
+MAX_MISSING_INFO_ROUNDS = 3
+SUMMARY_FILENAME = "summary"
+
+SPEC_KEYS = {
+    "name", "path", "fields", "splits", "format", "reference", "class_name", "output_dir", "notes",
+}
+FORMAT_CHOICES = {
+    "huggingface": "Hugging Face DatasetDict",
+    "lhotse": "Lhotse CutSet",
+    "other": "Other (manual)",
+}
+MISSING_INFO_FALLBACK = (
+    "No further information is available in this non-interactive run. Make reasonable "
+    "assumptions based on the directory structure and state them as comments in the code."
+)
+
+
+class SpecError(Exception):
+    """A dataset spec is invalid or does not answer a stage's question."""
+
+
+def load_specs(path):
+    """
+    Read dataset specs from a JSON file.
+
+    The file holds a list of specs, or ``{"defaults": {...}, "datasets": [...]}``
+    where every dataset inherits the defaults. A spec needs ``path``; the
+    optional keys are ``name`` (default: the directory name), ``fields`` and
+    ``splits`` (text, a list, or a dict of name -> description), ``format``
+    ("huggingface", "lhotse" or "other" with ``reference``), ``reference``,
+    ``class_name``, ``output_dir`` and ``notes`` (answer to the LLM's
+    questions about missing information).
+
+    Returns:
+        List[dict]: the specs with ``name`` and ``format`` filled in.
+
+    Raises:
+        SpecError: on unknown keys, a missing path, an unknown format or
+            duplicate names.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    defaults = {}
+    if isinstance(data, dict):
+        defaults = data.get("defaults", {})
+        data = data.get("datasets", [])
+    specs = []
+    for i, entry in enumerate(data):
+        spec = {**defaults, **entry}
+        unknown = set(spec) - SPEC_KEYS
+        if unknown:
+            raise SpecError(f"Dataset {i + 1}: unknown keys {', '.join(sorted(unknown))}")
+        if not spec.get("path"):
+            raise SpecError(f"Dataset {i + 1}: 'path' is required")
+        spec.setdefault("name", Path(spec["path"]).name)
+        spec.setdefault("format", "other" if spec.get("reference") else "huggingface")
+        if spec["format"] not in FORMAT_CHOICES:
+            raise SpecError(
+                f"Dataset '{spec['name']}': format must be one of {', '.join(FORMAT_CHOICES)}"
+            )
+        if spec["format"] == "other" and not spec.get("reference"):
+            raise SpecError(f"Dataset '{spec['name']}': format 'other' needs a 'reference' script")
+        specs.append(spec)
+    names = Counter(spec["name"] for spec in specs)
+    duplicates = [name for name, count in names.items() if count > 1]
+    if duplicates:
+        raise SpecError(f"Duplicate dataset names: {', '.join(duplicates)} (set 'name' explicitly)")
+    return specs
+
+
+def _describe(value) -> str:
+    if isinstance(value, dict):
+        return "\n".join(f"- {name}: {text}" for name, text in value.items())
+    if isinstance(value, (list, tuple)):
+        return "\n".join(f"- {item}" for item in value)
+    return str(value)
+
+
+class SpecResponder:
+    """
+    Answer the stage prompts of one session from its dataset spec.
+
+    Proposals (fields, splits) are accepted, after one revision round that
+    asks for the spec's values when it has them. Questions about missing
+    information get the spec's ``notes``, then a fixed instruction to make
+    assumptions, and fail the session after ``MAX_MISSING_INFO_ROUNDS``.
+    A question the spec cannot answer raises ``SpecError`` instead of
+    blocking. Without an ``output_dir`` in the spec, the dataset is saved to
+    ``data/`` in the session's ``output_dir``, so concurrent sessions never
+    share one.
+    """
+
+    def __init__(self, spec, output_dir=None):
+        self.spec = spec
+        self.output_dir = output_dir
+        self._asked = Counter()
+
+    def answer(self, stage_id, key, prompt) -> str:
+        n = self._asked[stage_id, key]
+        self._asked[stage_id, key] += 1
+        spec = self.spec
+        if key == "dataset_dir":
+            if n:
+                raise SpecError(f"'{spec['path']}' is not a directory")
+            return str(spec["path"])
+        if key == "approve_fields":
+            if n == 0 and spec.get("fields"):
+                return "Please use exactly these fields:\n" + _describe(spec["fields"])
+            return "y"
+        if key == "approve_splits":
+            if n == 0 and spec.get("splits"):
+                return "Please split the dataset like this:\n" + _describe(spec["splits"])
+            return "y"
+        if key == "output_dir":
+            if spec.get("output_dir"):
+                return str(spec["output_dir"])
+            return str(Path(self.output_dir) / "data") if self.output_dir else ""
+        if key == "class_name":
+            return spec.get("class_name") or "y"
+        if key == "reference_script":
+            return str(spec["reference"])
+        if key == "missing_info":
+            if n >= MAX_MISSING_INFO_ROUNDS:
+                raise SpecError(
+                    f"Still missing information after {n} answers in {stage_id}: {prompt.strip()[:300]}"
+                )
+            if n == 0 and spec.get("notes"):
+                return _describe(spec["notes"])
+            return MISSING_INFO_FALLBACK
+        raise SpecError(f"The spec has no answer for '{key}' in {stage_id}: {prompt.strip()[:300]}")
+
+    def choose(self, stage_id, key, choices) -> str:
+        if key == "format_choice":
+            choice = FORMAT_CHOICES[self.spec["format"]]
+            if choice in choices:
+                return choice
+        raise SpecError(f"The spec has no choice for '{key}' in {stage_id} among {choices}")
+
+
+def write_report(results, report_dir):
+    """
+    Write ``summary.json`` and a ``summary.md`` table of the batch.
+
+    Returns:
+        Path: the Markdown report.
+    """
+    report_dir = Path(report_dir)
+    report_dir.mkdir(parents=True, exist_ok=True)
+    with open(report_dir / f"{SUMMARY_FILENAME}.json", "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    def cost_text(cost):
+        return f"${cost:.4f}" if cost is not None else "n/a"
+
+    lines = [
+        "| dataset | status | stages | wall | LLM calls | tokens (prompt / compl.) | cost | outputs / error |",
+        "| --- | --- | --- | --- | --- | --- | --- | --- |",
+    ]
+    for r in results:
+        detail = r.get("error") or ", ".join(r.get("outputs", [])) or "-"
+        lines.append(
+            f"| {r['name']} | {r['status']} | {len(r.get('stages_completed', []))} "
+            f"| {r['wall_s']:.1f}s | {r.get('llm_calls', 0)} "
+            f"| {r.get('prompt_tokens', 0)} / {r.get('completion_tokens', 0)} "
+            f"| {cost_text(r.get('cost_usd'))} | {detail} |"
+        )
+    n_ok = sum(r["status"] == "ok" for r in results)
+    lines.append("")
+    lines.append(f"{n_ok} of {len(results)} datasets completed.")
+    md_path = report_dir / f"{SUMMARY_FILENAME}.md"
+    md_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return md_path
+
+
+def run_batch(specs, run_session, report_dir, workers=DEFAULT_WORKERS):
+    """
+    Run one wizard session per spec on a pool of ``workers`` threads.
+
+    Every session gets ``report_dir/<name>/`` for its outputs and a
+    ``session.log`` of its console output; live displays are turned off.
+    A failing session is recorded and does not stop the others.
+
+    Args:
+        specs (List[dict]): from ``load_specs``.
+        run_session (callable): ``run_session(spec, output_dir)`` runs the
+            stages and returns a dict of result fields (``status``,
+            ``stages_completed``, token counts, ...).
+        report_dir: directory for the per-dataset outputs and the summary.
+        workers (int): number of sessions run at once.
+
+    Returns:
+        List[dict]: one result per spec, in spec order.
+    """
+    report_dir = Path(report_dir)
+    output = ThreadOutput(sys.stdout)
+
+    def run(spec):
+        output_dir = report_dir / spec["name"]
+        output_dir.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        with open(output_dir / "session.log", "w", encoding="utf-8") as log, output.route(log), headless():
+            try:
+                result = {"status": "ok", **run_session(spec, output_dir)}
+            except Exception as e:
+                traceback.print_exc(file=sys.stdout)
+                result = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+        return {
+            "name": spec["name"],
+            "path": str(spec["path"]),
+            "output_dir": str(output_dir),
+            "wall_s": time.perf_counter() - start,
+            **result,
+        }
+
+    results = [None] * len(specs)
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run, spec): i for i, spec in enumerate(specs)}
+            for n_done, future in enumerate(as_completed(futures), 1):
+                result = results[futures[future]] = future.result()
+                print(
+                    f"[{n_done}/{len(specs)}] {result['name']}: {result['status']}"
+                    + (f" ({result['error']})" if result.get("error") else "")
+                )
+    finally:
+        sys.stdout = output.default
+    write_report(results, report_dir)
+    return results
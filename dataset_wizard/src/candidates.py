@@ -0,0 +1,272 @@
+import ast
+import importlib.util
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+from dataset_wizard.src.utils import CodeBlockExtractor, run_with_spinner
+
+try:
+    from pyflakes.api import check as pyflakes_check
+    from pyflakes.reporter import Reporter
+except ImportError:  # optional: lint warnings are only used to rank candidates
+    pyflakes_check = None
+
+DEFAULT_SAMPLE_DIRS = 2
+DEFAULT_SAMPLE_FILES_PER_EXT = 50
+DEFAULT_SAMPLE_DEPTH = 8
+DEFAULT_SAMPLE_BYTES = 256 * 2**20
+# Candidates only need to show that they run, so they get a smaller sample.
+CANDIDATE_SAMPLE_FILES_PER_EXT = 5
+DEFAULT_DRY_RUN_TIMEOUT = 120.0
+
+# How a candidate is exercised on the sample tree: "script" runs it as
+# create_dataset.py, "module" only executes its top level (dataset.py).
+SCRIPT = "script"
+MODULE = "module"
+
+
+def make_sample_tree(source_dir, dest_dir, max_dirs=DEFAULT_SAMPLE_DIRS,
+                     max_files_per_ext=DEFAULT_SAMPLE_FILES_PER_EXT,
+                     max_depth=DEFAULT_SAMPLE_DEPTH, max_bytes=DEFAULT_SAMPLE_BYTES):
+    """
+    Copy a small, deterministic slice of ``source_dir`` into ``dest_dir``.
+
+    Every directory level keeps its first ``max_dirs`` subdirectories and, per
+    extension, its first ``max_files_per_ext`` files (sorted by name), so the
+    layout and the metadata files a script expects are all present. Files
+    are copied, never linked, so generated code run on the sample cannot
+    change the original data; files that would take the copy past
+    ``max_bytes`` are left out.
+    """
+    source_dir = Path(source_dir)
+    dest_dir = Path(dest_dir)
+    copied = 0
+
+    def copy_level(src, dst, depth):
+        nonlocal copied
+        dst.mkdir(parents=True, exist_ok=True)
+        try:
+            entries = sorted(os.scandir(src), key=lambda e: e.name)
+        except OSError:
+            return
+        n_dirs = 0
+        per_ext = {}
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir():
+                if n_dirs < max_dirs and depth < max_depth:
+                    n_dirs += 1
+                    copy_level(Path(entry.path), dst / entry.name, depth + 1)
+                continue
+            ext = os.path.splitext(entry.name)[1]
+            if per_ext.get(ext, 0) >= max_files_per_ext:
+                continue
+            try:
+                size = entry.stat().st_size
+            except OSError:
+                continue
+            if copied + size > max_bytes:
+                continue
+            per_ext[ext] = per_ext.get(ext, 0) + 1
+            shutil.copyfile(entry.path, dst / entry.name)
+            copied += size
+
+    copy_level(source_dir, dest_dir, 0)
+    return dest_dir
+
+
+def set_read_only(root, read_only=True):
+    """Make the files and directories below ``root`` unwritable (or writable again)."""
+    for dirpath, _, filenames in os.walk(root):
+        os.chmod(dirpath, 0o555 if read_only else 0o755)
+        for name in filenames:
+            os.chmod(os.path.join(dirpath, name), 0o444 if read_only else 0o644)
+
+
+@contextmanager
+def read_only_sample(source_dir, **limits):
+    """
+    A ``make_sample_tree`` copy of ``source_dir`` in a temporary directory,
+    unwritable while in use so a script cannot modify its inputs (this does
+    not hold for root). Keyword arguments are passed to ``make_sample_tree``.
+    """
+    with tempfile.TemporaryDirectory(prefix="dw-sample-") as tmp:
+        sample_dir = make_sample_tree(source_dir, Path(tmp) / "sample", **limits)
+        set_read_only(sample_dir)
+        try:
+            yield sample_dir
+        finally:
+            set_read_only(sample_dir, read_only=False)
+
+
+def _missing_imports(tree):
+    """Top-level modules imported by ``tree`` that cannot be found."""
+    missing = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            top = name.split(".")[0]
+            if top not in missing and importlib.util.find_spec(top) is None:
+                missing.append(top)
+    return missing
+
+
+def _lint_warnings(code):
+    if pyflakes_check is None:
+        return None
+    out = io.StringIO()
+    return pyflakes_check(code, "candidate.py", Reporter(out, out))
+
+
+def check_candidate(response, kind=SCRIPT, sample_dir=None, timeout=DEFAULT_DRY_RUN_TIMEOUT):
+    """
+    Validate one generated reply locally.
+
+    Checks, each only if the previous ones passed: a code block exists, it
+    parses and compiles, its imports resolve (plus pyflakes warnings when
+    installed), and it runs within ``timeout`` seconds: a SCRIPT on
+    ``sample_dir`` (skipped without one), a MODULE by executing its top level.
+
+    Returns:
+        dict: {"code", "checks": {name: bool}, "lint_warnings", "error", "score"}
+    """
+    extractor = CodeBlockExtractor()
+    extractor.feed(response)
+    result = {"code": None, "checks": {}, "lint_warnings": None, "error": None}
+
+    def finish(error=None):
+        result["error"] = error
+        checks = result["checks"]
+        result["score"] = (
+            sum(checks.values()),
+            -(result["lint_warnings"] or 0),
+        )
+        return result
+
+    if extractor.code is None:
+        result["checks"]["code_block"] = False
+        return finish("no code block found")
+    code = result["code"] = extractor.code.strip()
+    result["checks"]["code_block"] = True
+
+    try:
+        tree = ast.parse(code)
+        compile(tree, "candidate.py", "exec")
+    except SyntaxError as e:
+        result["checks"]["compiles"] = False
+        return finish(f"syntax error: {e}")
+    result["checks"]["compiles"] = True
+
+    missing = _missing_imports(tree)
+    result["checks"]["imports"] = not missing
+    result["lint_warnings"] = _lint_warnings(code)
+    if missing:
+        return finish(f"missing modules: {', '.join(missing)}")
+
+    if kind == SCRIPT and sample_dir is None:
+        return finish()
+    with tempfile.TemporaryDirectory(prefix="dw-candidate-") as work_dir:
+        path = Path(work_dir) / "candidate.py"
+        path.write_text(code, encoding="utf-8")
+        if kind == SCRIPT:
+            cmd = [sys.executable, str(path), "--input_dir", str(sample_dir),
+                   "--output_dir", str(Path(work_dir) / "output")]
+        else:
+            cmd = [sys.executable, "-c", "import runpy, sys; runpy.run_path(sys.argv[1])", str(path)]
+        try:
+            proc = subprocess.run(cmd, cwd=work_dir, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            result["checks"]["dry_run"] = False
+            return finish(f"dry run timed out after {timeout:g}s")
+    result["checks"]["dry_run"] = proc.returncode == 0
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1:] or [f"exit code {proc.returncode}"]
+        return finish(f"dry run failed: {tail[0]}")
+    return finish()
+
+
+def rank_candidates(responses, kind=SCRIPT, dataset_dir=None, workers=None,
+                    timeout=DEFAULT_DRY_RUN_TIMEOUT):
+    """
+    Check all candidate replies in parallel on one shared, read-only sample
+    tree of ``dataset_dir``.
+
+    Returns:
+        List[dict]: ``check_candidate`` results with their ``index``, best first
+        (ties keep the original order).
+    """
+    sample = (
+        read_only_sample(dataset_dir, max_files_per_ext=CANDIDATE_SAMPLE_FILES_PER_EXT)
+        if dataset_dir
+        else nullcontext()
+    )
+    with sample as sample_dir:
+        with ThreadPoolExecutor(max_workers=workers or len(responses) or 1) as pool:
+            results = list(pool.map(
+                lambda response: check_candidate(response, kind, sample_dir, timeout), responses
+            ))
+    for index, result in enumerate(results):
+        result["index"] = index
+    return sorted(results, key=lambda r: (r["score"], -r["index"]), reverse=True)
+
+
+def generate_candidates(provider, messages, n, kind=SCRIPT, dataset_dir=None,
+                        message="Generating candidates..."):
+    """
+    Request ``n`` replies to ``messages`` concurrently and pick the best one.
+
+    Every candidate is asked on its own ``provider.fork()``, so their
+    conversation states do not interfere, and then validated with
+    ``rank_candidates``. A per-candidate summary is printed.
+
+    Returns:
+        dict: the best ``check_candidate`` result, with its ``response``.
+
+    Raises:
+        Exception: the first error if every request failed.
+    """
+    forks = [provider.fork() for _ in range(n)]
+
+    def ask(fork):
+        try:
+            return fork.chat(list(messages)), None
+        except Exception as e:
+            return "", e
+
+    def generate_and_rank():
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            replies = list(pool.map(ask, forks))
+        errors = [error for _, error in replies]
+        if all(errors):
+            raise errors[0]
+        ranked = rank_candidates([reply for reply, _ in replies], kind, dataset_dir)
+        for result in ranked:
+            result["response"] = replies[result["index"]][0]
+            if errors[result["index"]] is not None:
+                result["error"] = f"request failed: {errors[result['index']]}"
+        return ranked
+
+    ranked = run_with_spinner(generate_and_rank, (), f"{message} ({n} candidates)")
+    print("\nCandidates (best first):")
+    for result in ranked:
+        passed = [name for name, ok in result["checks"].items() if ok]
+        lint = result["lint_warnings"]
+        print(
+            f"  #{result['index'] + 1}: passed {', '.join(passed) or 'nothing'}"
+            + (f", {lint} lint warnings" if lint else "")
+            + (f" ({result['error']})" if result["error"] else "")
+        )
+    return ranked[0]
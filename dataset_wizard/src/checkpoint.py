@@ -0,0 +1,165 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+SESSIONS_DIRNAME = "sessions"
+CHECKPOINT_FILENAME = "checkpoint.json"
+CHECKPOINT_VERSION = 2
+
+
+def sessions_dir(results_dir) -> Path:
+    return Path(results_dir) / SESSIONS_DIRNAME
+
+
+def latest_session(results_dir):
+    """
+    Returns:
+        str: id of the most recently checkpointed session, or None.
+    """
+    checkpoints = sorted(
+        sessions_dir(results_dir).glob(f"*/{CHECKPOINT_FILENAME}"),
+        key=lambda path: path.stat().st_mtime,
+    )
+    return checkpoints[-1].parent.name if checkpoints else None
+
+
+class SessionCheckpoint:
+    """
+    Persist the progress of a wizard session after every completed stage.
+
+    The checkpoint holds the transcript, and per completed stage its id, the
+    span of messages it added, the files it wrote and a snapshot of the
+    shared stage context. It is rewritten atomically, so an interrupted
+    session always leaves the state after its last completed stage, from
+    which ``restore`` continues without any provider calls.
+    """
+
+    def __init__(self, results_dir, session=None):
+        self.session = session or time.strftime("%Y%m%d-%H%M%S")
+        self.path = sessions_dir(results_dir) / self.session / CHECKPOINT_FILENAME
+        self.stages = []
+        self.messages = []
+        # Background stages complete on their own threads.
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, results_dir, session):
+        checkpoint = cls(results_dir, session)
+        try:
+            with open(checkpoint.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"No checkpoint for session '{session}' at {checkpoint.path}") from None
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version in {checkpoint.path}")
+        checkpoint.stages = data["stages"]
+        checkpoint.messages = data["messages"]
+        return checkpoint
+
+    def save_stage(self, stage, start, messages):
+        """Record that ``stage`` completed, adding ``messages[start:]``."""
+        with self._lock:
+            self.stages.append(
+                {
+                    "id": stage.id,
+                    "start": start,
+                    "end": len(messages),
+                    "outputs": dict(stage.outputs),
+                    # Paths and other non-JSON values are stored as strings.
+                    "context": json.loads(json.dumps(stage.context, default=str)),
+                    "time": time.time(),
+                }
+            )
+            # Other stages get a copy of the transcript that may be out of date.
+            if getattr(stage, "writes_transcript", True):
+                self.messages = list(messages)
+            self._write()
+
+    def _write(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(
+            {
+                "version": CHECKPOINT_VERSION,
+                "session": self.session,
+                "stages": self.stages,
+                "messages": self.messages,
+            },
+            ensure_ascii=False,
+            indent=1,
+        )
+        # Write to a temporary file first so a crash never leaves a torn checkpoint.
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def restore(self, stages, provider, from_stage=None):
+        """
+        Fast-forward ``stages`` to the checkpoint without calling the provider.
+
+        Completed stages are skipped, or with ``from_stage`` everything from
+        that stage on (in stage order) is run again. Files written by skipped
+        stages are restored if they were deleted, the shared context is
+        restored, and a compacting or prefix-layout provider is told about
+        the skipped stages as if they had just run.
+
+        Returns:
+            Tuple[set, List[dict]]: ids of the stages to skip, and the
+            transcript to continue from.
+
+        Raises:
+            ValueError: if the checkpoint does not match ``stages`` or
+                ``from_stage`` is not one of them.
+        """
+        ids = [stage.id for stage in stages]
+        for record in self.stages:
+            if record["id"] not in ids:
+                raise ValueError(
+                    f"Checkpoint of session '{self.session}' does not match the stage list "
+                    f"(unknown stage '{record['id']}')"
+                )
+        rerun = set()
+        if from_stage is not None:
+            if from_stage not in ids:
+                raise ValueError(f"Unknown stage '{from_stage}' (choose from {', '.join(ids)})")
+            rerun = set(ids[ids.index(from_stage):])
+        # Stages complete out of order when they run concurrently.
+        self.stages = [record for record in self.stages if record["id"] not in rerun]
+        # Stages adding messages complete in stage order, so the transcript up
+        # to the last of them is exactly what the kept stages produced.
+        ends = [record["end"] for record in self.stages if record["end"] > record["start"]]
+        self.messages = self.messages[: max(ends, default=1)]
+
+        context = stages[0].context
+        context.clear()
+        for record in self.stages:
+            context.update(record["context"])
+        for stage in stages:
+            if stage.id in rerun:
+                for name in stage.provides:
+                    context.pop(name, None)
+        if "pinned_messages" in context:
+            context["pinned_messages"] = [
+                index for index in context["pinned_messages"] if index < len(self.messages)
+            ]
+        end_stage = getattr(provider, "end_stage", None)
+        # A file rewritten by a later stage is restored in its last version.
+        files = {}
+        for record in sorted(self.stages, key=lambda record: record["start"]):
+            files.update(record["outputs"])
+            if end_stage is not None:
+                end_stage(record["id"], record["start"], record["end"], record["outputs"])
+        for path, content in files.items():
+            if not Path(path).exists():
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                Path(path).write_text(content, encoding="utf-8")
+        pin = getattr(provider, "pin", None)
+        if pin is not None:
+            for index in context.get("pinned_messages", []):
+                pin(self.messages[index]["content"])
+        return {record["id"] for record in self.stages}, list(self.messages)
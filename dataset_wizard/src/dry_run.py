@@ -0,0 +1,273 @@
+import json
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from dataset_wizard.src.analyze_dir import DEFAULT_SCAN_TIME_BUDGET
+from dataset_wizard.src.candidates import read_only_sample
+
+DEFAULT_TIMEOUT = 300.0
+DEFAULT_BUDGET_HOURS = 4.0
+DEFAULT_HOTSPOTS = 15
+STDERR_TAIL_LINES = 30
+
+# Runs create_dataset.py in the child process: argv is the script, an output
+# file for the measurements, "profile" or "time", then the script's own
+# arguments. The script's exit status is passed on.
+HARNESS = r"""
+import gzip, json, os, runpy, sys, time
+script, report_path, mode = sys.argv[1:4]
+output_dir = sys.argv[sys.argv.index("--output_dir") + 1]
+sys.argv = [script] + sys.argv[4:]
+sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+report = {}
+
+
+def peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere.
+    unit = 1 if sys.platform == "darwin" else 1024
+    children = unit * resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    try:
+        # On Linux, ru_maxrss of this process starts at the parent's peak
+        # (it survives fork and exec); VmHWM does not.
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return max(int(line.split()[1]) * 1024, children)
+    except OSError:
+        pass
+    return max(unit * resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, children)
+
+
+def run():
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            raise
+
+
+def count_examples():
+    if os.path.exists(os.path.join(output_dir, "dataset_dict.json")) or os.path.exists(
+        os.path.join(output_dir, "dataset_info.json")
+    ):
+        try:
+            from datasets import load_from_disk
+        except ImportError:
+            return None
+        dataset = load_from_disk(output_dir)
+        return sum(len(split) for split in dataset.values()) if hasattr(dataset, "values") else len(dataset)
+    n = None
+    for root, _, files in os.walk(output_dir):
+        for name in files:
+            if "cuts" in name and name.endswith((".jsonl", ".jsonl.gz")):
+                opener = gzip.open if name.endswith(".gz") else open
+                with opener(os.path.join(root, name), "rt") as f:
+                    n = (n or 0) + sum(1 for line in f if line.strip())
+    return n
+
+
+start = time.perf_counter()
+try:
+    if mode == "profile":
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(run)
+        finally:
+            profiler.dump_stats(report_path + ".prof")
+    else:
+        run()
+finally:
+    report["wall_s"] = time.perf_counter() - start
+    report["peak_rss_bytes"] = peak_rss()
+    with open(report_path, "w") as f:
+        json.dump(report, f)
+if mode == "time":
+    try:
+        report["examples"] = count_examples()
+    except Exception as e:
+        report["examples_error"] = f"{type(e).__name__}: {e}"
+    with open(report_path, "w") as f:
+        json.dump(report, f)
+"""
+
+
+def count_files(root, time_budget=None):
+    """
+    Number of (non-hidden) files below ``root``, as ``make_sample_tree`` sees them.
+
+    Args:
+        time_budget (float): stop walking after this many seconds, e.g. on a
+            slow network mount. None counts everything.
+
+    Returns:
+        Tuple[int, bool]: the count, and whether it covers the whole tree
+        (otherwise it is a lower bound).
+    """
+    n = 0
+    start = time.monotonic()
+    for _, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        n += sum(1 for name in files if not name.startswith("."))
+        if time_budget is not None and time.monotonic() - start > time_budget:
+            return n, False
+    return n, True
+
+
+def missing_sample_input(stderr, sample_dir) -> bool:
+    """
+    Whether a script failed on an input file that is not in the sample.
+
+    The sample keeps every metadata file but only some of the files they
+    list, so a correct script that follows a full manifest fails this way;
+    that is a limit of the sample, not a bug to fix.
+    """
+    lines = stderr.strip().splitlines()
+    if not lines or not lines[-1].startswith(("FileNotFoundError", "OSError")):
+        return False
+    return "No such file or directory" in lines[-1] and str(sample_dir) in lines[-1]
+
+
+def _run_harness(script_path, sample_dir, work_dir, mode, timeout):
+    report_path = Path(work_dir) / f"{mode}.json"
+    cmd = [
+        sys.executable, "-c", HARNESS, str(Path(script_path).resolve()), str(report_path), mode,
+        "--input_dir", str(sample_dir), "--output_dir", str(Path(work_dir) / f"output-{mode}"),
+    ]
+    proc = subprocess.run(cmd, cwd=work_dir, capture_output=True, text=True, timeout=timeout)
+    report = json.loads(report_path.read_text()) if report_path.exists() else {}
+    return proc, report
+
+
+def hotspots(stats_path, limit=DEFAULT_HOTSPOTS):
+    """
+    The functions with the most own time in a cProfile dump.
+
+    Returns:
+        Tuple[str, float]: a text table, and the seconds spent importing
+        modules (a fixed cost that does not grow with the dataset).
+    """
+    stats = pstats.Stats(str(stats_path))
+    rows = []
+    import_s = 0.0
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        if name == "_find_and_load":
+            import_s = max(import_s, cumtime)
+        rows.append((tottime, cumtime, calls, f"{Path(filename).name}:{line}({name})"))
+    rows.sort(reverse=True)
+    lines = [f"{'own s':>8} {'cum s':>8} {'calls':>9}  function"]
+    for tottime, cumtime, calls, where in rows[:limit]:
+        lines.append(f"{tottime:>8.3f} {cumtime:>8.3f} {calls:>9}  {where}")
+    return "\n".join(lines), import_s
+
+
+def dry_run(script_path, dataset_dir, timeout=DEFAULT_TIMEOUT, total_files=None):
+    """
+    Run ``create_dataset.py`` on a deterministic sample of ``dataset_dir``.
+
+    The script runs twice in a subprocess on a read-only copy of the sample
+    tree of ``make_sample_tree``, writing only to a temporary directory:
+    once timed (wall time, peak RSS, examples written)
+    and once under cProfile for the hotspots. The runtime on the full tree
+    is extrapolated from the share of its files in the sample; time spent
+    importing modules is counted once.
+
+    Args:
+        total_files (Tuple[int, bool]): ``count_files`` of ``dataset_dir``,
+            so repeated runs walk the dataset once; by default it is counted
+            within ``DEFAULT_SCAN_TIME_BUDGET``.
+
+    Returns:
+        dict: ``ok``, ``error`` (with ``sample_artifact`` if the script only
+        missed input files left out of the sample), ``sample_files``,
+        ``total_files`` (with ``total_complete`` False if it is only a lower
+        bound, like the projections then), ``wall_s``, ``examples``,
+        ``examples_per_s``, ``peak_rss_bytes``, ``projected_s``,
+        ``projected_examples`` and ``hotspots``.
+    """
+    if total_files is None:
+        total_files = count_files(dataset_dir, DEFAULT_SCAN_TIME_BUDGET)
+    result = {"ok": False, "error": None}
+    result["total_files"], result["total_complete"] = total_files
+    with tempfile.TemporaryDirectory(prefix="dw-dry-run-") as work_dir:
+        with read_only_sample(dataset_dir) as sample_dir:
+            result["sample_files"], _ = count_files(sample_dir)
+            if not result["total_complete"]:
+                result["total_files"] = max(result["total_files"], result["sample_files"])
+            try:
+                proc, report = _run_harness(script_path, sample_dir, work_dir, "time", timeout)
+            except subprocess.TimeoutExpired:
+                result["error"] = f"timed out after {timeout:g}s on a sample of {result['sample_files']} files"
+                return result
+            if proc.returncode != 0:
+                tail = proc.stderr.strip().splitlines()[-STDERR_TAIL_LINES:]
+                result["error"] = "\n".join(tail) or f"exit code {proc.returncode}"
+                result["sample_artifact"] = missing_sample_input(proc.stderr, sample_dir)
+                return result
+            result.update(report)
+            try:
+                _run_harness(script_path, sample_dir, work_dir, "profile", timeout)
+                result["hotspots"], import_s = hotspots(Path(work_dir) / "profile.json.prof")
+            except (subprocess.TimeoutExpired, OSError, ValueError) as e:
+                result["hotspots"], import_s = f"(no profile: {e})", 0.0
+
+    wall = result["wall_s"]
+    examples = result.get("examples")
+    result["examples_per_s"] = examples / wall if examples and wall > 0 else None
+    ratio = result["total_files"] / max(result["sample_files"], 1)
+    fixed = min(import_s, wall)
+    result["projected_s"] = fixed + (wall - fixed) * ratio
+    result["projected_examples"] = round(examples * ratio) if examples is not None else None
+    result["ok"] = True
+    return result
+
+
+def format_duration(seconds) -> str:
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def format_report(result) -> str:
+    """Human-readable summary of a ``dry_run`` result."""
+    if not result["ok"]:
+        text = f"Dry run failed on a sample of {result.get('sample_files', 0)} files:\n{result['error']}"
+        if result.get("sample_artifact"):
+            text += "\n(The script needs input files that are not part of the sample.)"
+        return text
+    rss = result.get("peak_rss_bytes")
+    examples = result.get("examples")
+    throughput = (
+        f"{examples} examples, {result['examples_per_s']:.1f} examples/s"
+        if result.get("examples_per_s") is not None
+        else "examples not counted"
+    )
+    # Without the full file count, the projections are lower bounds.
+    at_least = "" if result.get("total_complete", True) else "at least "
+    lines = [
+        f"Sample: {result['sample_files']} of {at_least}{result['total_files']} files in "
+        f"{result['wall_s']:.1f}s ({throughput})",
+        f"Peak RSS: {rss / 2**20:.0f} MB" if rss else "Peak RSS: n/a",
+        f"Projected for the full dataset: {at_least}{format_duration(result['projected_s'])}"
+        + (
+            f", {at_least or '~'}{result['projected_examples']} examples"
+            if result.get("projected_examples")
+            else ""
+        )
+        + ("" if at_least == "" else " (the file count was cut off by the time budget)"),
+        "",
+        "Hotspots (cProfile, by own time):",
+        result.get("hotspots", "n/a"),
+    ]
+    return "\n".join(lines)
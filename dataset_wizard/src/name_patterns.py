@@ -0,0 +1,134 @@
+import os
+import re
+
+# Digit runs become {int} fields. When a group has too many distinct
+# templates, letter runs are generalised to {str} as well.
+_FINE_RE = re.compile(r"(\d+)")
+_COARSE_RE = re.compile(r"(\d+|[A-Za-z]+)")
+# Literal braces are doubled in template keys; matching them as tokens of
+# their own keeps a name like ``a{int}_1.wav`` from posing as a field.
+_KEY_TOKEN_RE = re.compile(r"(\{\{|\}\}|\{int\}|\{str\})")
+
+# Distinct templates kept per group and level before counting the rest as overflow.
+MAX_TEMPLATES = 8
+
+
+def new_pattern_stats():
+    return {"fine": {}, "coarse": {}, "fine_overflow": 0, "coarse_overflow": 0}
+
+
+def _split_name(name, split_ext):
+    if split_ext:
+        return os.path.splitext(name)
+    return name, ""
+
+
+def _escape(text):
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _tokenize(stem, regex):
+    """
+    Returns:
+        tuple: (template key, [digit strings of the {int} fields])
+    """
+    key = []
+    values = []
+    for i, part in enumerate(regex.split(stem)):
+        if i % 2 == 0:
+            key.append(_escape(part))
+        elif part.isdigit():
+            key.append("{int}")
+            values.append(part)
+        else:
+            key.append("{str}")
+    return "".join(key), values
+
+
+def template_key(name, split_ext=True):
+    """Fine template of a single name, e.g. ``19-198-0001.flac`` -> ``{int}-{int}-{int}.flac``."""
+    stem, ext = _split_name(name, split_ext)
+    return _tokenize(stem, _FINE_RE)[0] + _escape(ext)
+
+
+def add_name(stats, name, split_ext=True):
+    """
+    Fold one name into the pattern stats in O(number of fields).
+
+    Each template keeps a count, its smallest example and, per {int} field,
+    ``[min, max, min_len, max_len, zero_padded]``.
+    """
+    stem, ext = _split_name(name, split_ext)
+    for level, regex in (("fine", _FINE_RE), ("coarse", _COARSE_RE)):
+        key, values = _tokenize(stem, regex)
+        key += _escape(ext)
+        table = stats[level]
+        entry = table.get(key)
+        if entry is None:
+            if len(table) >= MAX_TEMPLATES:
+                stats[f"{level}_overflow"] += 1
+                continue
+            entry = table[key] = {
+                "count": 0,
+                "example": name,
+                "fields": [[int(v), int(v), len(v), len(v), False] for v in values],
+            }
+        entry["count"] += 1
+        if name < entry["example"]:
+            entry["example"] = name
+        for field, value in zip(entry["fields"], values):
+            number = int(value)
+            field[0] = min(field[0], number)
+            field[1] = max(field[1], number)
+            field[2] = min(field[2], len(value))
+            field[3] = max(field[3], len(value))
+            if len(value) > 1 and value[0] == "0":
+                field[4] = True
+
+
+def best_templates(stats):
+    """
+    Returns:
+        tuple: (templates of the finest level without overflow, overflow count)
+    """
+    if not stats["fine_overflow"]:
+        return stats["fine"], 0
+    return stats["coarse"], stats["coarse_overflow"]
+
+
+def _render_template(key, entry):
+    rendered = []
+    ranges = []
+    fields = iter(entry["fields"])
+    for part in _KEY_TOKEN_RE.split(key):
+        if part == "{str}":
+            rendered.append(part)
+        elif part == "{int}":
+            low, high, min_len, max_len, zero_padded = next(fields)
+            if zero_padded and min_len == max_len:
+                rendered.append(f"{{int:0{min_len}}}")
+                ranges.append(f"{low:0{min_len}d}..{high:0{min_len}d}")
+            else:
+                rendered.append("{int}")
+                ranges.append(f"{low}..{high}" if low != high else str(low))
+        else:
+            rendered.append(part)
+    return "".join(rendered), ranges
+
+
+def render_patterns(stats, suffix=""):
+    """
+    Render pattern stats as compact lines, most frequent template first, e.g.
+    ``{int}-{int}-{int:04}.flac ×28539 [19..8975, 121..198, 0000..0129] e.g. 19-198-0001.flac``.
+    """
+    templates, overflow = best_templates(stats)
+    lines = []
+    for key, entry in sorted(templates.items(), key=lambda item: (-item[1]["count"], item[0])):
+        template, ranges = _render_template(key, entry)
+        line = f"{template}{suffix} ×{entry['count']}"
+        if ranges:
+            line += f" [{', '.join(ranges)}]"
+        lines.append(f"{line} e.g. {entry['example']}{suffix}")
+    if overflow:
+        lines.append(f"... and {overflow} more with other name patterns")
+    return lines
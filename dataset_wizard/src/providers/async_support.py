@@ -0,0 +1,88 @@
+import asyncio
+import queue
+import threading
+import weakref
+
+import openai
+
+_http_clients = weakref.WeakKeyDictionary()
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def shared_http_client():
+    """
+    Pooled HTTP client shared by every async provider on the running loop.
+
+    Connection pools are bound to the event loop they were created on, so
+    one client is kept per loop and dropped with it. Uses openai's default
+    timeouts and connection limits.
+    """
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None:
+        client = _http_clients[loop] = openai.DefaultAsyncHttpxClient()
+    return client
+
+
+def background_loop():
+    """Event loop on a daemon thread that runs async providers for sync callers."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="provider-loop", daemon=True).start()
+    return _loop
+
+
+def run_sync(coro):
+    """Run ``coro`` on the background loop and block until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coro, background_loop()).result()
+
+
+class SyncProvider:
+    """
+    Blocking ``chat``/``chat_stream`` facade over an async provider, so the
+    existing stages and provider wrappers can use it unchanged. All calls run
+    on the shared background loop and therefore reuse its pooled HTTP client;
+    calls made from several threads at once (candidates, batch sessions) are
+    in flight together on that loop.
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def __getattr__(self, name):
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+    def fork(self):
+        return SyncProvider(self.provider.fork())
+
+    def chat(self, messages):
+        return run_sync(self.provider.chat(messages))
+
+    def chat_stream(self, messages):
+        chunks = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for chunk in self.provider.chat_stream(messages):
+                    chunks.put(chunk)
+            except BaseException as e:
+                chunks.put(e)
+                raise
+            finally:
+                chunks.put(done)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), background_loop())
+        try:
+            while (chunk := chunks.get()) is not done:
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                yield chunk
+        finally:
+            # Stops the request if the consumer closed the stream early.
+            future.cancel()
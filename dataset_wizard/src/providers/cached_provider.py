@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from dataset_wizard.src.utils import get_cache_dir
+
+RESPONSE_CACHE_DIRNAME = "responses"
+DEFAULT_MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def cache_key(provider_name, model, messages, variant=None) -> str:
+    """
+    Content address of a chat request: sha256 over the canonical JSON of the
+    provider, the model and every message (sorted keys, no whitespace).
+    ``variant`` tells apart forks that sample the same request several times.
+    """
+    request = {"provider": provider_name, "model": model, "messages": messages}
+    if variant is not None:
+        request["variant"] = variant
+    canonical = json.dumps(
+        request,
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk store of chat responses, one JSON file per key.
+
+    A file's mtime is its last use: hits touch it, and when the total size
+    exceeds ``max_bytes`` the least recently used files are deleted first.
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+        self.path = Path(path) if path else get_cache_dir() / RESPONSE_CACHE_DIRNAME
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = sum(size for _, _, size in self._entries())
+        self.hits = 0
+        self.misses = 0
+
+    def _file(self, key):
+        return self.path / key[:2] / f"{key}.json"
+
+    def _entries(self):
+        """Yields (path, mtime, size) of every cached response."""
+        for entry_path in self.path.glob("*/*.json"):
+            try:
+                st = entry_path.stat()
+            except FileNotFoundError:
+                continue
+            yield entry_path, st.st_mtime, st.st_size
+
+    def get(self, key):
+        """Return the cached response text, or None."""
+        entry_path = self._file(key)
+        try:
+            with open(entry_path, encoding="utf-8") as f:
+                payload = json.load(f)
+            os.utime(entry_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return payload["response"]
+
+    def put(self, key, response, **info):
+        entry_path = self._file(key)
+        entry_path.parent.mkdir(exist_ok=True)
+        data = json.dumps(
+            {"response": response, "created": time.time(), **info}, ensure_ascii=False
+        ).encode("utf-8")
+        # Write to a temporary file first so a crash never leaves a torn entry.
+        fd, tmp_path = tempfile.mkstemp(dir=entry_path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        with self._lock:
+            try:
+                self._total_bytes -= entry_path.stat().st_size
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, entry_path)
+            self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits ``max_bytes``."""
+        for entry_path, _, size in sorted(self._entries(), key=lambda e: e[1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                entry_path.unlink()
+            except FileNotFoundError:
+                continue
+            self._total_bytes -= size
+
+    def summary(self):
+        """
+        Returns:
+            tuple: (entry count, total bytes, last use time or None)
+        """
+        entries = list(self._entries())
+        last_used = max((mtime for _, mtime, _ in entries), default=None)
+        return len(entries), sum(size for _, _, size in entries), last_used
+
+    def clear(self) -> int:
+        removed = 0
+        with self._lock:
+            for entry_path, _, _ in list(self._entries()):
+                entry_path.unlink(missing_ok=True)
+                removed += 1
+            self._total_bytes = 0
+        return removed
+
+
+class CachedProvider:
+    """
+    Wrap any provider so that a ``chat`` call with messages already seen for the
+    same provider and model is answered from the ``ResponseCache``.
+
+    Everything except ``chat`` is forwarded to the wrapped provider.
+    """
+
+    def __init__(self, provider, provider_name, cache=None, variant=None):
+        self.provider = provider
+        self.provider_name = provider_name
+        self.cache = cache if cache is not None else ResponseCache()
+        self.variant = variant
+        self.last_cache_hit = False
+        self._n_forks = 0
+
+    def __getattr__(self, name):
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+    def fork(self):
+        """
+        Fork the wrapped provider. The n-th fork caches under its own variant,
+        so candidates sampled in parallel are replayed as distinct answers.
+        """
+        self._n_forks += 1
+        variant = f"{self.variant}.{self._n_forks}" if self.variant else str(self._n_forks)
+        return CachedProvider(self.provider.fork(), self.provider_name, self.cache, variant)
+
+    @property
+    def model_name(self) -> str:
+        # GeminiProvider keeps the name in ``model_name`` and the client in ``model``.
+        name = getattr(self.provider, "model_name", None) or getattr(self.provider, "model", "")
+        return str(name)
+
+    def chat(self, messages):
+        key = cache_key(self.provider_name, self.model_name, messages, self.variant)
+        response = self.cache.get(key)
+        self.last_cache_hit = response is not None
+        if response is None:
+            response = self.provider.chat(messages)
+            self.cache.put(key, response, provider=self.provider_name, model=self.model_name)
+        return response
+
+    def chat_stream(self, messages):
+        """Replay a cached reply as a single chunk, or stream and store a new one."""
+        key = cache_key(self.provider_name, self.model_name, messages, self.variant)
+        response = self.cache.get(key)
+        self.last_cache_hit = response is not None
+        if response is not None:
+            yield response
+            return
+        if hasattr(self.provider, "chat_stream"):
+            chunks = []
+            for chunk in self.provider.chat_stream(messages):
+                chunks.append(chunk)
+                yield chunk
+            response = "".join(chunks)
+        else:
+            response = self.provider.chat(messages)
+            yield response
+        self.cache.put(key, response, provider=self.provider_name, model=self.model_name)
@@ -0,0 +1,204 @@
+import os
+import re
+
+from dataset_wizard.src.utils import (
+    REGENERATE_REQUEST,
+    REVISION_REQUEST,
+    estimate_tokens,
+    is_revision_request,
+)
+
+# Code blocks shorter than this are cheaper to repeat than to point at.
+MIN_DEDUP_CODE_CHARS = 200
+_CODE_BLOCK_RE = re.compile(r"```[^\n`]*\n(.*?)```", re.DOTALL)
+
+
+def dedupe_code_blocks(messages, min_chars=MIN_DEDUP_CODE_CHARS):
+    """
+    Replace fenced code blocks that repeat an earlier block verbatim with a
+    short pointer. The first occurrence is kept, so the prefix of the
+    conversation does not change.
+
+    Returns:
+        List[dict]: new message dicts; the input is not modified.
+    """
+    seen = set()
+
+    def replace(match):
+        code = match.group(1).strip()
+        if len(code) < min_chars:
+            return match.group(0)
+        if code in seen:
+            return "```\n# [identical to the code block in an earlier message]\n```"
+        seen.add(code)
+        return match.group(0)
+
+    return [
+        {**msg, "content": _CODE_BLOCK_RE.sub(replace, msg["content"])}
+        if "```" in msg["content"] else msg
+        for msg in messages
+    ]
+
+
+def _input_note(content):
+    """The user's own input in a message of a finished stage, or None."""
+    if content.startswith(REGENERATE_REQUEST):
+        return None
+    if content.startswith(REVISION_REQUEST):
+        content = content[len(REVISION_REQUEST):]
+    return content.strip() or None
+
+
+def _artifact(reply, outputs, superseded):
+    """
+    A reply reduced to the file the stage saved from it: the file itself, or
+    a pointer if a later stage replaced it. None if the reply carries code
+    that was not saved (a rejected draft), the reply itself if it has no code.
+    """
+    codes = [code.strip() for code in _CODE_BLOCK_RE.findall(reply)]
+    if not codes or not outputs:
+        return reply
+    for path, content in outputs.items():
+        if content.strip() in codes:
+            name = os.path.basename(path)
+            if path in superseded:
+                return f"`{name}` (replaced later by stage `{superseded[path]}`)"
+            return f"`{name}` as saved:\n```python\n{content.strip()}\n```"
+    return None
+
+
+def stage_record(stage_id, span, outputs=None, superseded=None):
+    """
+    Reduce the messages of a finished stage to its state record: one request
+    with the decisions taken and one reply with the accepted results.
+
+    The record's request is the stage's first request, followed by the
+    user's input during the stage (revision feedback, answers to clarification
+    questions), each once. A reply followed by a request to revise or
+    regenerate it was superseded and is dropped; every other reply (e.g. the
+    approved field table as well as the sample built from it) is kept. A
+    reply with code is reduced to the file the stage saved from it
+    (``outputs``: path -> content), or to a pointer if a later stage
+    replaced that file (``superseded``: path -> stage id); code that was not
+    saved (a rejected rewrite) is dropped.
+
+    Returns:
+        List[dict]: the two messages of the record, or ``span`` itself if it
+        already is a single request and reply, or has no reply at all.
+    """
+    outputs = outputs or {}
+    superseded = superseded or {}
+    user_role = span[0]["role"] if span else None
+    replies = [msg for msg in span if msg["role"] != user_role]
+    if not replies:
+        return span
+
+    request = span[0]["content"]
+    notes = []
+    results = []
+    changed = False
+    for i, msg in enumerate(span[1:], start=1):
+        if msg["role"] == user_role:
+            note = _input_note(msg["content"])
+            if note is not None and msg["content"] != request and note not in notes:
+                notes.append(note)
+            continue
+        if i + 1 < len(span) and is_revision_request(span[i + 1]):
+            continue
+        result = _artifact(msg["content"], outputs, superseded)
+        changed = changed or result != msg["content"]
+        if result is not None:
+            results.append(result)
+    if len(span) == 2 and not changed:
+        return span
+
+    if notes:
+        request += "\n\nFurther requests and input during this stage:\n" + "\n".join(f"- {note}" for note in notes)
+    return [
+        {"role": user_role, "content": f"[State record of stage `{stage_id}`]\n{request}"},
+        {"role": replies[-1]["role"], "content": "\n\n".join(results) or "(no accepted result)"},
+    ]
+
+
+class CompactingProvider:
+    """
+    Send a compacted view of the conversation to the wrapped provider.
+
+    Stages keep appending to the full ``messages`` list (which is what gets
+    saved); only the request is compacted. Finished stages, reported through
+    ``end_stage``, are reduced to their ``stage_record``, where a file is
+    only shown in its latest version, and repeated code blocks are
+    deduplicated. The current stage is sent as is. Messages the wrapped
+    provider ``is_pinned`` are never folded into a stage record.
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.stage_spans = []
+        self.last_tokens = None  # (full, compacted) of the last request
+
+    def __getattr__(self, name):
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+    def fork(self):
+        clone = CompactingProvider(self.provider.fork())
+        clone.stage_spans = list(self.stage_spans)
+        return clone
+
+    def end_stage(self, stage_id, start, end, outputs=None):
+        """
+        Mark ``messages[start:end]`` as the transcript of a finished stage
+        that wrote ``outputs`` (path -> content).
+        """
+        if end > start:
+            self.stage_spans.append((stage_id, start, end, dict(outputs or {})))
+
+    def _superseded(self, position):
+        """Files of the stage at ``position`` that a later finished stage changed."""
+        _, _, _, outputs = self.stage_spans[position]
+        superseded = {}
+        for stage_id, _, _, later in self.stage_spans[position + 1:]:
+            for path, content in later.items():
+                if path in outputs and content != outputs[path]:
+                    superseded[path] = stage_id
+        return superseded
+
+    def compact(self, messages):
+        is_pinned = getattr(self.provider, "is_pinned", lambda msg: False)
+        compacted = []
+        position = 0
+        for i, (stage_id, start, end, outputs) in enumerate(self.stage_spans):
+            if end > len(messages):
+                break
+            compacted.extend(messages[position:start])
+            span = messages[start:end]
+            # Pinned reference material is sent verbatim in the stable prefix.
+            compacted.extend(msg for msg in span if is_pinned(msg))
+            compacted.extend(
+                stage_record(
+                    stage_id,
+                    [msg for msg in span if not is_pinned(msg)],
+                    outputs,
+                    self._superseded(i),
+                )
+            )
+            position = end
+        compacted.extend(messages[position:])
+        compacted = dedupe_code_blocks(compacted)
+        self.last_tokens = (
+            sum(estimate_tokens(msg["content"]) for msg in messages),
+            sum(estimate_tokens(msg["content"]) for msg in compacted),
+        )
+        return compacted
+
+    def chat(self, messages):
+        return self.provider.chat(self.compact(messages))
+
+    def chat_stream(self, messages):
+        compacted = self.compact(messages)
+        if hasattr(self.provider, "chat_stream"):
+            yield from self.provider.chat_stream(compacted)
+        else:
+            yield self.provider.chat(compacted)
@@ -0,0 +1,57 @@
+class ConversationState:
+    """
+    Track which messages a stateful provider session already holds.
+
+    Stages pass the whole transcript to ``provider.chat`` on every call. After
+    a successful call the session holds that transcript plus the reply, so as
+    long as the next transcript starts with the same messages only the new
+    tail has to be sent. An edited, removed or reordered message means the
+    session diverged from the transcript and has to be rebuilt.
+
+    ``session`` is an opaque provider handle for the synced state (e.g. the
+    id of the last OpenAI response); it is cleared whenever the state is.
+    """
+
+    def __init__(self, assistant_name):
+        self.assistant_name = assistant_name
+        self.session = None
+        self._seen = []
+
+    @staticmethod
+    def _key(msg):
+        return msg["role"], msg["content"]
+
+    def delta(self, messages):
+        """
+        Returns:
+            list: the messages the session has not seen yet, or None if the
+                  session diverged from ``messages`` and must be rebuilt from
+                  the full transcript.
+        """
+        if self._seen is None:
+            return None
+        n_seen = len(self._seen)
+        if n_seen >= len(messages):
+            return None
+        for seen, msg in zip(self._seen, messages):
+            if seen != self._key(msg):
+                return None
+        return messages[n_seen:]
+
+    def commit(self, messages, reply, session=None):
+        """Record that the session now holds ``messages`` followed by ``reply``."""
+        self._seen = [self._key(msg) for msg in messages]
+        self._seen.append((self.assistant_name, reply))
+        self.session = session
+
+    def fork(self):
+        """Independent copy, for a second session branching off the same point."""
+        clone = ConversationState(self.assistant_name)
+        clone.session = self.session
+        clone._seen = None if self._seen is None else list(self._seen)
+        return clone
+
+    def reset(self):
+        """Mark the synced state as unknown so the next call rebuilds the session."""
+        self._seen = None
+        self.session = None
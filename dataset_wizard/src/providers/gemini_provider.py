@@ -1,7 +1,10 @@
+import copy
 import os
 
 import google.generativeai as genai
 
+from dataset_wizard.src.providers.conversation import ConversationState
+
 
 class GeminiProvider:
     def __init__(self, model="gemini-pro"):
@@ -10,13 +13,105 @@ class GeminiProvider:
         self.model = genai.GenerativeModel(model_name=self.model_name)
         self.chat_session = self.model.start_chat(history=[])
         self.assistant_name = "model"
+        self.state = ConversationState(self.assistant_name)
+        self.last_usage = None
+
+    @staticmethod
+    def _usage(response):
+        usage = getattr(response, "usage_metadata", None)
+        if not usage:
+            return None
+        return {
+            "prompt_tokens": usage.prompt_token_count,
+            "completion_tokens": usage.candidates_token_count,
+            "cached_tokens": getattr(usage, "cached_content_token_count", 0) or 0,
+        }
+
+    @staticmethod
+    def _content(msg):
+        return {"role": msg["role"], "parts": [msg["content"]]}
+
+    def _sync(self, messages):
+        delta = self.state.delta(messages)
+        if delta is None:
+            # The transcript was edited: start over from the full history.
+            self.chat_session = self.model.start_chat(
+                history=[self._content(msg) for msg in messages[:-1]]
+            )
+        else:
+            for msg in delta[:-1]:
+                self.chat_session.history.append(self._content(msg))
 
     def chat(self, messages):
-        for msg in messages[:-1]:
-            role = msg["role"]
-            content = msg["content"]
-            self.chat_session.history.append({"role": role, "parts": [content]})
+        self._sync(messages)
+        user_message = messages[-1]["content"]
+        try:
+            response = self.chat_session.send_message(user_message)
+        except Exception:
+            self.state.reset()
+            raise
+        self.state.commit(messages, response.text)
+        self.last_usage = self._usage(response)
+        return response.text
+
+    def fork(self):
+        """Independent conversation branching off the current one."""
+        clone = copy.copy(self)
+        clone.chat_session = self.model.start_chat(history=list(self.chat_session.history))
+        clone.state = self.state.fork()
+        clone.last_usage = None
+        return clone
 
+    def chat_stream(self, messages):
+        """Yield the reply as text chunks as they are generated."""
+        self._sync(messages)
         user_message = messages[-1]["content"]
-        response = self.chat_session.send_message(user_message)
+        chunks = []
+        try:
+            response = self.chat_session.send_message(user_message, stream=True)
+            for chunk in response:
+                chunks.append(chunk.text)
+                yield chunk.text
+        except BaseException:
+            # Includes the consumer closing the stream early.
+            self.state.reset()
+            raise
+        self.state.commit(messages, "".join(chunks))
+        # Streamed responses report usage on the final chunk.
+        self.last_usage = self._usage(chunk) if chunks else None
+
+
+class AsyncGeminiProvider(GeminiProvider):
+    """
+    asyncio version of ``GeminiProvider``. The SDK's async client keeps one
+    pooled channel per process, which every instance shares.
+    """
+
+    async def chat(self, messages):
+        self._sync(messages)
+        user_message = messages[-1]["content"]
+        try:
+            response = await self.chat_session.send_message_async(user_message)
+        except BaseException:
+            self.state.reset()
+            raise
+        self.state.commit(messages, response.text)
+        self.last_usage = self._usage(response)
         return response.text
+
+    async def chat_stream(self, messages):
+        """Yield the reply as text chunks as they are generated."""
+        self._sync(messages)
+        user_message = messages[-1]["content"]
+        chunks = []
+        try:
+            response = await self.chat_session.send_message_async(user_message, stream=True)
+            async for chunk in response:
+                chunks.append(chunk.text)
+                yield chunk.text
+        except BaseException:
+            self.state.reset()
+            raise
+        self.state.commit(messages, "".join(chunks))
+        # Streamed responses report usage on the final chunk.
+        self.last_usage = self._usage(chunk) if chunks else None
@@ -1,5 +1,45 @@
+import copy
+
 import openai
 
+from dataset_wizard.src.providers.async_support import shared_http_client
+from dataset_wizard.src.providers.conversation import ConversationState
+
+
+def _request(model, state, messages):
+    # The Responses API keeps the conversation server-side, so only the new
+    # messages are sent on top of the previous response.
+    delta = state.delta(messages)
+    if delta is None:
+        return {"model": model, "input": messages, "previous_response_id": None}
+    return {"model": model, "input": delta, "previous_response_id": state.session}
+
+
+def _usage(response):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    details = getattr(usage, "input_tokens_details", None)
+    return {
+        "prompt_tokens": usage.input_tokens,
+        "completion_tokens": usage.output_tokens,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+
+def _stream_event_text(event):
+    """
+    Returns:
+        tuple: (text delta or None, final response once the stream completed or None)
+    """
+    if event.type == "response.output_text.delta":
+        return event.delta, None
+    if event.type == "response.completed":
+        return None, event.response
+    if event.type in ("response.failed", "error"):
+        raise RuntimeError(f"OpenAI stream failed: {event}")
+    return None, None
+
 
 class OpenAIProvider:
     def __init__(self, model="gpt-4o"):
@@ -7,10 +47,122 @@ class OpenAIProvider:
         # virtual env OPENAI_API_KEY is required
         self.client = openai.OpenAI()
         self.assistant_name = "assistant"
+        self.state = ConversationState(self.assistant_name)
+        self.last_usage = None
 
     def chat(self, messages):
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-        )
-        return response.choices[0].message.content
+        try:
+            response = self.client.responses.create(**_request(self.model, self.state, messages))
+        except Exception:
+            self.state.reset()
+            raise
+        self.state.commit(messages, response.output_text, session=response.id)
+        self.last_usage = _usage(response)
+        return response.output_text
+
+    def fork(self):
+        """
+        Independent conversation branching off the current one; shares the
+        HTTP client, so forks can run concurrently.
+        """
+        clone = copy.copy(self)
+        clone.state = self.state.fork()
+        clone.last_usage = None
+        return clone
+
+    def chat_stream(self, messages):
+        """Yield the reply as text chunks as they are generated."""
+        chunks = []
+        final = None
+        try:
+            stream = self.client.responses.create(
+                **_request(self.model, self.state, messages), stream=True
+            )
+            for event in stream:
+                text, completed = _stream_event_text(event)
+                final = completed or final
+                if text:
+                    chunks.append(text)
+                    yield text
+        except BaseException:
+            # Includes the consumer closing the stream early.
+            self.state.reset()
+            raise
+        if final is None:
+            # Incomplete (e.g. max_output_tokens) or cut short: there is no
+            # response to continue from, so the next request sends everything.
+            self.state.reset()
+        else:
+            self.state.commit(messages, "".join(chunks), session=final.id)
+        self.last_usage = _usage(final)
+
+
+class AsyncOpenAIProvider:
+    """
+    asyncio version of ``OpenAIProvider``. Instances share the pooled HTTP
+    client of the running loop, so several conversations can be in flight
+    at once without opening a connection each.
+    """
+
+    def __init__(self, model="gpt-4o", http_client=None):
+        self.model = model
+        self.assistant_name = "assistant"
+        self.state = ConversationState(self.assistant_name)
+        self.last_usage = None
+        self._http_client = http_client
+        self._clients = {}
+
+    def _client(self):
+        # virtual env OPENAI_API_KEY is required
+        http_client = self._http_client or shared_http_client()
+        client = self._clients.get(id(http_client))
+        if client is None:
+            client = self._clients[id(http_client)] = openai.AsyncOpenAI(http_client=http_client)
+        return client
+
+    async def chat(self, messages):
+        try:
+            response = await self._client().responses.create(
+                **_request(self.model, self.state, messages)
+            )
+        except BaseException:
+            self.state.reset()
+            raise
+        self.state.commit(messages, response.output_text, session=response.id)
+        self.last_usage = _usage(response)
+        return response.output_text
+
+    def fork(self):
+        """
+        Independent conversation branching off the current one; shares the
+        HTTP client, so forks can run concurrently.
+        """
+        clone = copy.copy(self)
+        clone.state = self.state.fork()
+        clone.last_usage = None
+        return clone
+
+    async def chat_stream(self, messages):
+        """Yield the reply as text chunks as they are generated."""
+        chunks = []
+        final = None
+        try:
+            stream = await self._client().responses.create(
+                **_request(self.model, self.state, messages), stream=True
+            )
+            async for event in stream:
+                text, completed = _stream_event_text(event)
+                final = completed or final
+                if text:
+                    chunks.append(text)
+                    yield text
+        except BaseException:
+            self.state.reset()
+            raise
+        if final is None:
+            # Incomplete (e.g. max_output_tokens) or cut short: there is no
+            # response to continue from, so the next request sends everything.
+            self.state.reset()
+        else:
+            self.state.commit(messages, "".join(chunks), session=final.id)
+        self.last_usage = _usage(final)
@@ -0,0 +1,202 @@
+import asyncio
+import copy
+import json
+import os
+import re
+import time
+
+from dataset_wizard.src.utils import estimate_tokens
+
+# name -> (time to first token [s], tokens per second)
+LATENCY_PROFILES = {
+    "instant": (0.0, None),
+    "fast": (0.4, 150.0),
+    "chat": (1.5, 60.0),
+    "reasoning": (20.0, 50.0),
+}
+DEFAULT_PROFILE = "instant"
+# Characters per streamed token, matching ``estimate_tokens``.
+CHARS_PER_TOKEN = 4
+
+_CANNED_CODE = """```python
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input_dir", required=True)
+    parser.add_argument("--output_dir", default="./data")
+    args = parser.parse_args()
+    print(args.input_dir, args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
+```"""
+
+# Checked in order against the last message; the first match answers.
+DEFAULT_RULES = [
+    {"match": r"reply only with: All required information is available",
+     "response": "All required information is available."},
+    {"match": r"```python", "response": "Here is the script:\n\n" + _CANNED_CODE},
+    {"match": r"\btable\b", "response": (
+        "| field | source |\n| --- | --- |\n| audio | audio files |\n| text | transcript files |"
+    )},
+    {"match": r"json sample", "response": '```json\n{"audio": "path/to/file", "text": "..."}\n```'},
+    {"match": r"split", "response": "Use the existing train/dev/test directories as splits."},
+    {"match": r"", "response": "OK."},
+]
+
+
+def load_recording(path):
+    """
+    Read assistant replies from a ``save_results`` JSON transcript.
+
+    Returns:
+        List[Tuple[str, str]]: (preceding user message, reply) in transcript order.
+    """
+    with open(path, encoding="utf-8") as f:
+        messages = json.load(f)
+    turns = []
+    last_user = ""
+    for msg in messages:
+        if msg["role"] == "user":
+            last_user = msg["content"]
+        else:
+            turns.append((last_user, msg["content"]))
+    return turns
+
+
+class ReplayProvider:
+    """
+    Offline stand-in for an LLM provider.
+
+    Replies come from a recorded transcript when one is given, otherwise from
+    regex rules on the last message. A recorded reply is picked by the user
+    message it answered, falling back to the next unused reply in order, so
+    small edits to prompts still replay. Latency is simulated from a profile
+    (time to first token, tokens per second) and is fully deterministic.
+    ``last_usage`` reports estimated token counts, and as ``cached_tokens``
+    the prompt prefix shared with the previous request, the way providers
+    with prompt prefix caching would.
+
+    Unset arguments are read from DATASET_WIZARD_REPLAY_FILE,
+    DATASET_WIZARD_REPLAY_RULES (JSON list of {"match", "response"}),
+    DATASET_WIZARD_REPLAY_PROFILE, DATASET_WIZARD_REPLAY_TTFT and
+    DATASET_WIZARD_REPLAY_TPS.
+    """
+
+    def __init__(
+        self,
+        model="replay",
+        recording=None,
+        rules=None,
+        profile=None,
+        ttft=None,
+        tokens_per_sec=None,
+    ):
+        self.model = model
+        self.assistant_name = "assistant"
+
+        recording = recording or os.environ.get("DATASET_WIZARD_REPLAY_FILE")
+        self.turns = load_recording(recording) if recording else []
+        self._used = [False] * len(self.turns)
+
+        rules_path = os.environ.get("DATASET_WIZARD_REPLAY_RULES")
+        if rules is None and rules_path:
+            with open(rules_path, encoding="utf-8") as f:
+                rules = json.load(f)
+        self.rules = [
+            (re.compile(rule["match"]), rule["response"]) for rule in (rules or DEFAULT_RULES)
+        ]
+
+        profile = profile or os.environ.get("DATASET_WIZARD_REPLAY_PROFILE", DEFAULT_PROFILE)
+        if profile not in LATENCY_PROFILES:
+            raise ValueError(
+                f"Unknown latency profile: {profile} (choose from {', '.join(LATENCY_PROFILES)})"
+            )
+        default_ttft, default_tps = LATENCY_PROFILES[profile]
+        if ttft is None and os.environ.get("DATASET_WIZARD_REPLAY_TTFT"):
+            ttft = float(os.environ["DATASET_WIZARD_REPLAY_TTFT"])
+        if tokens_per_sec is None and os.environ.get("DATASET_WIZARD_REPLAY_TPS"):
+            tokens_per_sec = float(os.environ["DATASET_WIZARD_REPLAY_TPS"])
+        self.ttft = default_ttft if ttft is None else ttft
+        self.tokens_per_sec = default_tps if tokens_per_sec is None else tokens_per_sec
+        self.last_usage = None
+        self._last_prompt = ""
+
+    def _record_usage(self, messages, reply):
+        prompt = "".join(f"{msg['role']}\n{msg['content']}\n" for msg in messages)
+        shared = os.path.commonprefix([prompt, self._last_prompt])
+        self._last_prompt = prompt
+        self.last_usage = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "completion_tokens": estimate_tokens(reply),
+            "cached_tokens": estimate_tokens(shared),
+        }
+
+    def respond(self, messages) -> str:
+        """Pick the reply to ``messages`` without simulating latency."""
+        reply = self._respond(messages)
+        self._record_usage(messages, reply)
+        return reply
+
+    def _respond(self, messages):
+        last = messages[-1]["content"]
+        for i, (user, reply) in enumerate(self.turns):
+            if not self._used[i] and user == last:
+                self._used[i] = True
+                return reply
+        for i, (_, reply) in enumerate(self.turns):
+            if not self._used[i]:
+                self._used[i] = True
+                return reply
+        for pattern, reply in self.rules:
+            if pattern.search(last):
+                return reply
+        return ""
+
+    def fork(self):
+        """Copy that replays independently from the current position."""
+        clone = copy.copy(self)
+        clone._used = list(self._used)
+        clone.last_usage = None
+        return clone
+
+    def _token_delay(self):
+        return 1.0 / self.tokens_per_sec if self.tokens_per_sec else 0.0
+
+    def chat(self, messages):
+        reply = self.respond(messages)
+        n_tokens = (len(reply) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+        time.sleep(self.ttft + n_tokens * self._token_delay())
+        return reply
+
+    def chat_stream(self, messages):
+        """Yield the reply in token-sized chunks at the profile's pace."""
+        reply = self.respond(messages)
+        time.sleep(self.ttft)
+        delay = self._token_delay()
+        for i in range(0, len(reply), CHARS_PER_TOKEN):
+            if delay:
+                time.sleep(delay)
+            yield reply[i:i + CHARS_PER_TOKEN]
+
+
+class AsyncReplayProvider(ReplayProvider):
+    """asyncio version of ``ReplayProvider`` for measuring concurrent calls offline."""
+
+    async def chat(self, messages):
+        reply = self.respond(messages)
+        n_tokens = (len(reply) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+        await asyncio.sleep(self.ttft + n_tokens * self._token_delay())
+        return reply
+
+    async def chat_stream(self, messages):
+        reply = self.respond(messages)
+        await asyncio.sleep(self.ttft)
+        delay = self._token_delay()
+        for i in range(0, len(reply), CHARS_PER_TOKEN):
+            if delay:
+                await asyncio.sleep(delay)
+            yield reply[i:i + CHARS_PER_TOKEN]
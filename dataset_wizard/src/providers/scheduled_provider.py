@@ -0,0 +1,312 @@
+import queue
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+DEFAULT_DEADLINE = 300.0
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 30.0
+
+
+class TokenBucket:
+    """Allow ``rate`` requests per second on average with bursts of ``capacity``."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None) -> bool:
+        """Block until a token is available; False if that would pass ``deadline``."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait_time = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait_time > deadline:
+                return False
+            time.sleep(wait_time)
+
+
+def is_rate_limit(exc) -> bool:
+    """HTTP 429 from openai (RateLimitError) or Google APIs (ResourceExhausted)."""
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    return status == 429 or type(exc).__name__ in ("RateLimitError", "ResourceExhausted", "TooManyRequests")
+
+
+def is_retryable(exc) -> bool:
+    """Rate limits, server errors and dropped connections are worth retrying."""
+    if is_rate_limit(exc):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    return isinstance(exc, (ConnectionError, TimeoutError)) or type(exc).__name__ in (
+        "APIConnectionError", "APITimeoutError", "ServiceUnavailable", "DeadlineExceeded",
+    )
+
+
+def _retry_after(exc):
+    """Seconds requested by a Retry-After header, if the error carries one."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _run_in_thread(fn, *args) -> Future:
+    """
+    Run ``fn`` on a daemon thread. Calls abandoned after their deadline keep
+    running in the background without blocking interpreter exit.
+    """
+    future = Future()
+
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, daemon=True).start()
+    return future
+
+
+class SchedulingProvider:
+    """
+    Bound the latency of provider calls.
+
+    * every ``chat`` has a deadline; past it a ``TimeoutError`` is raised,
+    * rate limits and transient errors are retried with full-jitter
+      exponential backoff (or the server's Retry-After), within the deadline,
+    * an optional token bucket spaces requests (``requests_per_minute``),
+    * with ``slots`` (a semaphore shared by several providers), at most that
+      many requests are in flight at once, abandoned ones included,
+    * with ``hedge`` set, the same request is also sent to that provider when
+      the primary has not answered (or streamed a first chunk) after
+      ``hedge_after`` seconds, and the first answer wins.
+
+    A call abandoned at its deadline or lost to a hedge keeps running in the
+    background; the provider's conversation state is reset so that the next
+    call rebuilds its session instead of building on top of it.
+    """
+
+    def __init__(
+        self,
+        provider,
+        deadline=DEFAULT_DEADLINE,
+        max_retries=DEFAULT_MAX_RETRIES,
+        backoff_base=DEFAULT_BACKOFF_BASE,
+        backoff_max=DEFAULT_BACKOFF_MAX,
+        requests_per_minute=None,
+        hedge=None,
+        hedge_after=None,
+        slots=None,
+    ):
+        self.provider = provider
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(requests_per_minute / 60.0) if requests_per_minute else None
+        self.hedge = hedge
+        self.hedge_after = hedge_after if hedge is not None else None
+        self.slots = slots
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._last_winner = provider
+
+    @property
+    def last_usage(self):
+        """Usage reported by whichever provider answered the last call."""
+        return getattr(self._last_winner, "last_usage", None)
+
+    def __getattr__(self, name):
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+    def fork(self):
+        """Fork the wrapped providers; the rate limit stays shared."""
+        clone = SchedulingProvider(
+            self.provider.fork(),
+            deadline=self.deadline,
+            max_retries=self.max_retries,
+            backoff_base=self.backoff_base,
+            backoff_max=self.backoff_max,
+            hedge=self.hedge.fork() if self.hedge is not None else None,
+            hedge_after=self.hedge_after,
+            slots=self.slots,
+        )
+        clone.bucket = self.bucket
+        return clone
+
+    def _abandon(self, provider, future):
+        state = getattr(provider, "state", None)
+        if state is None:
+            return
+        state.reset()
+        # The call may still commit its own state when it finishes.
+        future.add_done_callback(lambda _: state.reset())
+
+    def _backoff(self, attempt, exc, end):
+        delay = _retry_after(exc)
+        if delay is None:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= end:
+            raise TimeoutError(
+                f"LLM request did not succeed within {self.deadline:g}s (last error: {exc})"
+            ) from exc
+        self.retries += 1
+        time.sleep(delay)
+
+    def _acquire(self, end):
+        """Wait for the rate limit and a free slot before starting a request."""
+        if self.bucket is not None and not self.bucket.acquire(end):
+            raise TimeoutError(f"LLM request could not be scheduled within {self.deadline:g}s")
+        if self.slots is not None and not self.slots.acquire(timeout=max(0.0, end - time.monotonic())):
+            raise TimeoutError(f"No free LLM request slot within {self.deadline:g}s")
+
+    def _try_acquire_hedge(self):
+        """Hedges only use a slot that is free right away."""
+        return self.slots is None or self.slots.acquire(blocking=False)
+
+    def _start(self, fn, *args) -> Future:
+        """Run ``fn`` in a thread holding an acquired slot until it finishes."""
+        future = _run_in_thread(fn, *args)
+        if self.slots is not None:
+            future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def _timeout(self):
+        return TimeoutError(f"LLM request did not finish within {self.deadline:g}s")
+
+    def chat(self, messages):
+        end = time.monotonic() + self.deadline
+        for attempt in range(self.max_retries + 1):
+            self._acquire(end)
+            futures = {self._start(self.provider.chat, messages): self.provider}
+            hedge_at = time.monotonic() + self.hedge_after if self.hedge_after is not None else None
+            error = None
+            while futures:
+                wake = min(end, hedge_at) if hedge_at is not None else end
+                done, _ = wait(futures, timeout=max(0.0, wake - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    if hedge_at is not None and time.monotonic() >= hedge_at:
+                        hedge_at = None
+                        if self._try_acquire_hedge():
+                            self.hedges += 1
+                            futures[self._start(self.hedge.chat, messages)] = self.hedge
+                        continue
+                    for future, provider in futures.items():
+                        self._abandon(provider, future)
+                    raise self._timeout()
+                for future in done:
+                    provider = futures.pop(future)
+                    if future.exception() is None:
+                        for other, other_provider in futures.items():
+                            self._abandon(other_provider, other)
+                        if provider is self.hedge:
+                            self.hedge_wins += 1
+                        self._last_winner = provider
+                        return future.result()
+                    error = error or future.exception()
+            if not is_retryable(error) or attempt == self.max_retries:
+                raise error
+            self._backoff(attempt, error, end)
+
+    def _pump(self, provider, messages, chunks):
+        """Stream ``provider`` into ``chunks`` from a daemon thread."""
+        stop = threading.Event()
+
+        def run():
+            stream = provider.chat_stream(messages)
+            try:
+                for chunk in stream:
+                    if stop.is_set():
+                        break
+                    chunks.put((provider, chunk, None))
+            except BaseException as e:
+                chunks.put((provider, None, e))
+                return
+            finally:
+                stream.close()
+            chunks.put((provider, None, None))
+
+        return self._start(run), stop
+
+    def chat_stream(self, messages):
+        """
+        Stream the reply, with retries and hedging before the first chunk.
+        The deadline applies up to the first chunk and then to every gap
+        between chunks, so a long reply that keeps streaming is not cut off.
+        """
+        if not hasattr(self.provider, "chat_stream"):
+            yield self.chat(messages)
+            return
+        end = time.monotonic() + self.deadline
+        for attempt in range(self.max_retries + 1):
+            self._acquire(end)
+            chunks = queue.Queue()
+            pumps = {self.provider: self._pump(self.provider, messages, chunks)}
+            hedge_at = time.monotonic() + self.hedge_after if self.hedge_after is not None else None
+            winner = None
+            completed = False
+            error = None
+            try:
+                while True:
+                    wake = min(end, hedge_at) if hedge_at is not None else end
+                    try:
+                        provider, chunk, exc = chunks.get(timeout=max(0.0, wake - time.monotonic()))
+                    except queue.Empty:
+                        if hedge_at is not None and time.monotonic() >= hedge_at:
+                            hedge_at = None
+                            if hasattr(self.hedge, "chat_stream") and self._try_acquire_hedge():
+                                self.hedges += 1
+                                pumps[self.hedge] = self._pump(self.hedge, messages, chunks)
+                            continue
+                        if winner is not None:
+                            raise TimeoutError(f"LLM stream stalled for {self.deadline:g}s")
+                        raise self._timeout()
+                    if winner is not None and provider is not winner:
+                        continue
+                    if exc is not None:
+                        if winner is not None:
+                            raise exc
+                        error = error or exc
+                        del pumps[provider]
+                        if pumps:
+                            continue
+                        break
+                    if winner is None:
+                        # The first provider to produce output (or finish) wins.
+                        winner = self._last_winner = provider
+                        hedge_at = None
+                        if provider is self.hedge:
+                            self.hedge_wins += 1
+                    if chunk is None:
+                        completed = True
+                        return
+                    yield chunk
+                    end = time.monotonic() + self.deadline
+            finally:
+                for provider, (future, stop) in pumps.items():
+                    if provider is winner and completed or future.done():
+                        continue
+                    stop.set()
+                    self._abandon(provider, future)
+            if not is_retryable(error) or attempt == self.max_retries:
+                raise error
+            self._backoff(attempt, error, end)
@@ -0,0 +1,61 @@
+class StablePrefixProvider:
+    """
+    Lay out requests so that stable material forms a byte-identical prefix.
+
+    Providers cache the longest prompt prefix they have seen recently, so
+    a request is cheapest when everything that does not change between turns
+    comes first. Stages ``pin`` such material (directory summary, reference
+    templates) when they add it to the transcript; every request is then
+    sent as the first message (the system prompt), the pinned messages in
+    the order they were pinned, and the remaining turns in their original
+    order, ending with the message being answered. Pinning new material
+    changes the prefix once, after which it is stable again. The transcript
+    itself is not modified.
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.pinned = []
+
+    def __getattr__(self, name):
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+    def fork(self):
+        clone = StablePrefixProvider(self.provider.fork())
+        clone.pinned = list(self.pinned)
+        return clone
+
+    def pin(self, content):
+        """Keep the message with this exact ``content`` in the stable prefix."""
+        if content not in self.pinned:
+            self.pinned.append(content)
+
+    def is_pinned(self, msg) -> bool:
+        return msg["content"] in self.pinned
+
+    def layout(self, messages):
+        if len(messages) < 3:
+            return messages
+        # The last message is the one being answered and always stays last.
+        head, rest, last = messages[:1], messages[1:-1], messages[-1:]
+        by_content = {}
+        turns = []
+        for msg in rest:
+            if self.is_pinned(msg):
+                by_content.setdefault(msg["content"], msg)
+            else:
+                turns.append(msg)
+        pinned = [by_content[content] for content in self.pinned if content in by_content]
+        return head + pinned + turns + last
+
+    def chat(self, messages):
+        return self.provider.chat(self.layout(messages))
+
+    def chat_stream(self, messages):
+        laid_out = self.layout(messages)
+        if hasattr(self.provider, "chat_stream"):
+            yield from self.provider.chat_stream(laid_out)
+        else:
+            yield self.provider.chat(laid_out)
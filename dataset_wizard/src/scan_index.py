@@ -0,0 +1,134 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from dataset_wizard.src.utils import get_cache_dir
+
+INDEX_FILENAME = "scan_index.sqlite"
+# How long a statement waits for another process (a second wizard run, a
+# concurrent batch session) that is writing to the same index.
+BUSY_TIMEOUT_S = 10.0
+
+
+def stat_stamp(path, with_size=False) -> str:
+    """
+    Build a change stamp for ``path`` from its device, inode and mtime.
+
+    A directory's mtime changes whenever an entry is added, removed or renamed,
+    which is exactly what invalidates its listing. Files additionally include
+    their size.
+    """
+    st = os.stat(path)
+    stamp = f"{st.st_dev}:{st.st_ino}:{st.st_mtime_ns}"
+    if with_size:
+        stamp += f":{st.st_size}"
+    return stamp
+
+
+class ScanIndex:
+    """
+    On-disk cache of per-directory scan records and meta-file previews.
+
+    Entries are keyed by ``(kind, path)`` and only returned while their stamp
+    and scan parameters still match, so a changed directory is rescanned and
+    everything else is served from SQLite. Every ``put`` is committed
+    right away, so several processes can share one index file.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else get_cache_dir() / INDEX_FILENAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=BUSY_TIMEOUT_S, check_same_thread=False)
+        self._conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT_S * 1000)}")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                kind TEXT NOT NULL,
+                path TEXT NOT NULL,
+                stamp TEXT NOT NULL,
+                params TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (kind, path)
+            )"""
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def get(self, kind, path, stamp, params):
+        """Return the cached payload, or None if missing or stale."""
+        key = os.path.abspath(path)
+        params = json.dumps(params, sort_keys=True)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stamp, params, payload FROM entries WHERE kind = ? AND path = ?",
+                (kind, key),
+            ).fetchone()
+            if row is None or row[0] != stamp or row[1] != params:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[2])
+
+    def put(self, kind, path, stamp, params, payload):
+        key = os.path.abspath(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    kind,
+                    key,
+                    stamp,
+                    json.dumps(params, sort_keys=True),
+                    json.dumps(payload, ensure_ascii=False),
+                    time.time(),
+                ),
+            )
+            self._conn.commit()
+
+    def _where_prefix(self, prefix):
+        if prefix is None or os.path.abspath(prefix) == os.sep:
+            return "", ()
+        prefix = os.path.abspath(prefix).rstrip(os.sep)
+        return (
+            " WHERE path = ? OR substr(path, 1, ?) = ?",
+            (prefix, len(prefix) + 1, prefix + os.sep),
+        )
+
+    def summary(self, prefix=None):
+        """
+        Returns:
+            List[tuple]: (kind, entry count, payload bytes, last update time) per kind.
+        """
+        where, args = self._where_prefix(prefix)
+        with self._lock:
+            return self._conn.execute(
+                "SELECT kind, COUNT(*), SUM(LENGTH(payload)), MAX(updated) FROM entries"
+                + where + " GROUP BY kind ORDER BY kind",
+                args,
+            ).fetchall()
+
+    def invalidate(self, prefix=None) -> int:
+        """Drop every entry at or below ``prefix`` (all entries if None)."""
+        where, args = self._where_prefix(prefix)
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM entries" + where, args).rowcount
+            self._conn.commit()
+        return removed
@@ -0,0 +1,84 @@
+import threading
+
+from dataset_wizard.src.utils import run_with_spinner, stream_chat
+
+
+class Speculation:
+    """
+    The reply to a likely next request, fetched in the background.
+
+    Stages start one right after showing a proposal, with the request that
+    follows if the user accepts it, so the reply is (partly) ready when the
+    answer comes. It runs on ``provider.fork()``, which leaves the
+    conversation of the provider itself untouched. Streams stop at the next
+    chunk once cancelled.
+    """
+
+    def __init__(self, provider, messages, pinned=()):
+        self.messages = list(messages)
+        self._provider = provider.fork()
+        pin = getattr(self._provider, "pin", None)
+        if pin is not None:
+            for content in pinned:
+                pin(content)
+        self._chunks = []
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        self.error = None
+        threading.Thread(target=self._run, name="speculation", daemon=True).start()
+
+    def _run(self):
+        try:
+            if hasattr(self._provider, "chat_stream"):
+                stream = self._provider.chat_stream(self.messages)
+                try:
+                    for chunk in stream:
+                        if self._cancelled.is_set():
+                            return
+                        self._chunks.append(chunk)
+                finally:
+                    stream.close()
+            else:
+                self._chunks.append(self._provider.chat(self.messages))
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+    def matches(self, messages) -> bool:
+        return [(m["role"], m["content"]) for m in messages] == [
+            (m["role"], m["content"]) for m in self.messages
+        ]
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def result(self, message="Waiting for the LLM..."):
+        """
+        Wait for the reply.
+
+        Returns:
+            str: the reply, or None if the request failed or was cancelled.
+        """
+        if not self._done.is_set():
+            run_with_spinner(self._done.wait, (), message)
+        if self.error is not None or self._cancelled.is_set():
+            return None
+        return "".join(self._chunks)
+
+
+def speculative_chat(speculation, provider, messages, message="Waiting for the LLM...", extractor=None):
+    """
+    ``stream_chat``, answered by ``speculation`` when it requested exactly
+    ``messages``. Otherwise (or if it failed) the speculation is cancelled
+    and the request is sent as usual.
+    """
+    if speculation is not None:
+        if speculation.matches(messages):
+            reply = speculation.result(message)
+            if reply is not None:
+                if extractor is not None:
+                    extractor.feed(reply)
+                return reply
+        speculation.cancel()
+    return stream_chat(provider, messages, message, extractor=extractor)
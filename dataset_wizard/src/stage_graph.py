@@ -0,0 +1,178 @@
+import io
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+from dataset_wizard.src.utils import ThreadOutput, headless, run_with_spinner
+
+
+class StageGraph:
+    """
+    Run stages as soon as what they ``require`` is available, instead of
+    strictly one after another.
+
+    The stage list stays the reference order, and every stage may only
+    require what an earlier stage ``provides``. Within that order:
+
+    - interactive stages run one at a time on the calling thread, so the
+      user sees the questions in the usual order;
+    - non-interactive stages run on worker threads without live displays,
+      and their console output is printed when they finish; the progress
+      text of their ``status`` is shown while waiting for them;
+    - stages that add messages start only once every earlier such stage has
+      finished, so each one sees the transcript it would have seen in a
+      sequential run and the final transcript has the same order.
+
+    For example, the directory scan starts as soon as the path is known and
+    runs while the user chooses the reference format.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        provided = {}
+        for stage in self.stages:
+            missing = [name for name in stage.requires if name not in provided]
+            if missing:
+                raise ValueError(
+                    f"Stage '{stage.id}' requires {', '.join(missing)}, "
+                    "which no earlier stage provides"
+                )
+            for name in stage.provides:
+                if name in provided:
+                    raise ValueError(
+                        f"'{name}' is provided by both '{provided[name]}' and '{stage.id}'"
+                    )
+                provided[name] = stage.id
+
+    def _ready(self, stage, done, available) -> bool:
+        if not all(name in available for name in stage.requires):
+            return False
+        for earlier in self.stages[: self.stages.index(stage)]:
+            if earlier.id in done:
+                continue
+            if stage.writes_transcript and earlier.writes_transcript:
+                return False
+            if stage.interactive and earlier.interactive:
+                return False
+        return True
+
+    @staticmethod
+    def _waiting_status(stages):
+        """Progress texts of the given running stages that report one."""
+        texts = []
+        for stage in stages:
+            status = stage.status
+            if status is not None:
+                texts.append(f"[{stage.id}: {status()}]")
+        return " ".join(texts)
+
+    def _run_stage(self, stage, provider, messages, telemetry):
+        with telemetry.stage(stage.id, calls=stage.writes_transcript) as stage_event:
+            result = stage.run(provider, messages)
+            if result is False:
+                stage_event["status"] = "stopped"
+        return result
+
+    def _run_background(self, stage, provider, messages, telemetry):
+        buffer = io.StringIO()
+        with sys.stdout.route(buffer), headless():
+            try:
+                result = self._run_stage(stage, provider, messages, telemetry)
+            except BaseException as e:
+                e.stage_output = buffer.getvalue()
+                raise
+        return result, buffer.getvalue()
+
+    def run(self, provider, messages, telemetry, skip=()):
+        """
+        Run all stages except those in ``skip``, each timed by ``telemetry``.
+
+        Args:
+            messages (List[dict]): transcript up to the first stage to run.
+            skip: ids of stages that already completed (e.g. restored from a
+                checkpoint); what they provide counts as available.
+
+        Returns:
+            Tuple[List[dict], bool]: the transcript, and whether all stages
+            completed (False if one stopped the session).
+        """
+        done = set(skip)
+        available = {name for stage in self.stages if stage.id in done for name in stage.provides}
+        pending = [stage for stage in self.stages if stage.id not in done]
+        running = {}
+        stopped = False
+
+        def finish(stage, snapshot, result):
+            nonlocal messages, stopped
+            if result is False:
+                stopped = True
+                return
+            if stage.writes_transcript:
+                messages = result
+            elif len(result) != len(snapshot):
+                raise RuntimeError(
+                    f"Stage '{stage.id}' added messages but does not declare writes_transcript"
+                )
+            done.add(stage.id)
+            available.update(stage.provides)
+
+        def collect(futures):
+            for future in futures:
+                stage, snapshot = running.pop(future)
+                try:
+                    result, output = future.result()
+                except BaseException as e:
+                    print(getattr(e, "stage_output", ""), end="")
+                    raise
+                print(output, end="")
+                finish(stage, snapshot, result)
+
+        # Worker threads write to their own buffer; everything else as before.
+        installed = not isinstance(sys.stdout, ThreadOutput)
+        if installed:
+            sys.stdout = ThreadOutput(sys.stdout)
+        try:
+            with ThreadPoolExecutor(thread_name_prefix="stage") as pool:
+                try:
+                    while (pending or running) and not stopped:
+                        for stage in [s for s in pending if not s.interactive]:
+                            if self._ready(stage, done, available):
+                                pending.remove(stage)
+                                # Stages get their own list, extended in place.
+                                snapshot = list(messages)
+                                future = pool.submit(
+                                    self._run_background, stage, provider, list(snapshot), telemetry
+                                )
+                                running[future] = (stage, snapshot)
+                        stage = next(
+                            (s for s in pending if s.interactive and self._ready(s, done, available)),
+                            None,
+                        )
+                        if stage is not None:
+                            pending.remove(stage)
+                            snapshot = list(messages)
+                            result = self._run_stage(stage, provider, list(snapshot), telemetry)
+                            finish(stage, snapshot, result)
+                        elif running:
+                            waiting = [s for s, _ in running.values()]
+                            finished, _ = run_with_spinner(
+                                partial(wait, return_when=FIRST_COMPLETED),
+                                (list(running),),
+                                f"Waiting for {', '.join(s.id for s in waiting)}...",
+                                status=partial(self._waiting_status, waiting),
+                            )
+                            collect(finished)
+                        else:
+                            raise RuntimeError(
+                                f"Stages {', '.join(s.id for s in pending)} can never run: "
+                                "what they require is not provided"
+                            )
+                finally:
+                    # Let background stages finish before returning or raising.
+                    if running:
+                        finished, _ = wait(list(running))
+                        collect(finished)
+        finally:
+            if installed:
+                sys.stdout = sys.stdout.default
+        return messages, not stopped
@@ -1,18 +1,58 @@
 # stages/abs_stage.py
 from abc import ABC, abstractmethod
-from typing import List
+from pathlib import Path
+from typing import List, Union
 import os
 import tempfile
 import subprocess
 
+import inquirer
+
+from dataset_wizard.src.speculation import Speculation
+
 def comment_lines(text: str) -> str:
         return "\n".join(f"# {line}" if not line.strip().startswith("#") else line for line in text.splitlines())
 
 class AbsStage(ABC):
-    def __init__(self, id: str, description: str = "", final_message: str = ""):
+    def __init__(
+        self,
+        id: str,
+        description: str = "",
+        final_message: str = "",
+        requires=(),
+        provides=(),
+        interactive: bool = True,
+        writes_transcript: bool = True,
+    ):
         self.id = id
         self.description = description
         self.final_message = final_message
+        # Names of what the stage needs from earlier stages and makes available
+        # to later ones; StageGraph runs a stage once all it requires exists.
+        self.requires = tuple(requires)
+        self.provides = tuple(provides)
+        # Interactive stages talk to the user and run one at a time, in order;
+        # the others run in the background as soon as they can.
+        self.interactive = interactive
+        # Stages that add messages run in stage order, so the transcript is
+        # the same as when all stages run one after another.
+        self.writes_transcript = writes_transcript
+        # Shared between the stages of a session (e.g. "dataset_dir").
+        self.context = {}
+        # Files written by the stage: path -> content, kept in checkpoints.
+        self.outputs = {}
+        # SessionCheckpoint updated after the stage completes, if any.
+        self.checkpoint = None
+        # Answers prompts instead of the user in batch mode (see batch.SpecResponder).
+        self.responder = None
+        # While the stage runs, optionally a no-arg callable returning a short
+        # progress text; StageGraph shows it while waiting for the stage.
+        self.status = None
+
+    @property
+    def results_dir(self) -> Path:
+        """Directory for the files this session writes."""
+        return Path(self.context.get("results_dir", "dataset"))
 
     def display_intro(self):
         if self.description:
@@ -22,16 +62,40 @@ class AbsStage(ABC):
         if self.final_message:
             print(f"\n{self.final_message}\n")
 
-    def get_user_input(self, initial_text: str) -> str:
+    def _answer(self, prompt: str, answer: str) -> str:
+        print(prompt)
+        print(f"> {answer}")
+        return answer
+
+    def ask(self, key: str, prompt: str) -> str:
+        """Read one line, e.g. a path. ``key`` names the question for a responder."""
+        if self.responder is not None:
+            return self._answer(prompt, self.responder.answer(self.id, key, prompt))
+        print(prompt)
+        return input("\n> ").strip()
+
+    def choose(self, key: str, message: str, choices: List[str]) -> str:
+        """Pick one of ``choices``. ``key`` names the question for a responder."""
+        if self.responder is not None:
+            return self._answer(message, self.responder.choose(self.id, key, choices))
+        answers = inquirer.prompt([inquirer.List(key, message=message, choices=choices)])
+        return answers[key]
+
+    def get_user_input(self, initial_text: str, key: str = None) -> str:
         """
         Prompt user for input. Options:
         - 'y': accept default text as-is
         - 'e': open editor to modify text
         - Enter: prompt again
 
+        With a responder set, the answer comes from it instead; ``key`` names
+        the question.
+
         Returns:
             str: the edited text with comment lines stripped
         """
+        if self.responder is not None:
+            return self._answer(initial_text, self.responder.answer(self.id, key, initial_text))
         print(initial_text)
         print("\nEdit options:")
         print("  [y] Accept default text")
@@ -66,24 +130,63 @@ class AbsStage(ABC):
             else:
                 return user_choice
 
+    def speculate(self, provider, messages: List[dict], pinned=()):
+        """
+        Start requesting the reply to ``messages`` in the background while
+        the user reviews a proposal; pass the result to
+        ``speculation.speculative_chat``.
+
+        Returns:
+            Speculation: or None when speculation is off, prompts are answered
+            automatically or the provider cannot ``fork``.
+        """
+        if (
+            not self.context.get("speculation", True)
+            or self.responder is not None
+            or not hasattr(provider, "fork")
+        ):
+            return None
+        return Speculation(provider, messages, pinned)
+
+    def add_reference(self, provider, messages: List[dict], content: str):
+        """
+        Append stable reference material (directory summary, templates) as
+        its own user message and ask the provider to keep it in the fixed
+        prompt prefix, where provider-side prefix caching can reuse it.
+        """
+        messages.append({"role": "user", "content": content})
+        self.context.setdefault("pinned_messages", []).append(len(messages) - 1)
+        pin = getattr(provider, "pin", None)
+        if pin is not None:
+            pin(content)
+
     @abstractmethod
-    def run_body(self, provider, messages: List[dict]) -> bool:
+    def run_body(self, provider, messages: List[dict]) -> Union[List[dict], bool]:
         """
         Execute the core logic of the stage.
 
         Returns:
-            bool: True if the tool should proceed to the next stage, False otherwise.
+            Union[List[dict], bool]: ``messages`` with what the stage added, or
+            False to stop the session.
         """
         pass
 
-    def run(self, provider, messages: List[dict]) -> bool:
+    def run(self, provider, messages: List[dict]) -> Union[List[dict], bool]:
         """
         Run the full stage including intro, body, and outro.
 
         Returns:
-            bool: Whether to proceed to the next stage.
+            Union[List[dict], bool]: the transcript extended by the stage, or
+            False to stop the session.
         """
         self.display_intro()
+        start = len(messages)
         should_continue = self.run_body(provider, messages)
+        # Let a compacting provider summarize the transcript of this stage.
+        end_stage = getattr(provider, "end_stage", None)
+        if should_continue and end_stage is not None:
+            end_stage(self.id, start, len(messages), self.outputs)
+        if should_continue and self.checkpoint is not None:
+            self.checkpoint.save_stage(self, start, messages)
         self.display_outro()
         return should_continue
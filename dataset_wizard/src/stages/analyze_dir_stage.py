@@ -1,26 +1,32 @@
 # stages/analyze_dir_stage.py
+import sqlite3
+from functools import partial
 from pathlib import Path
 from typing import List
 
-from dataset_wizard.src.analyze_dir import get_markdown
+from dataset_wizard.src.analyze_dir import ScanProgress, get_markdown
+from dataset_wizard.src.scan_index import ScanIndex
 from dataset_wizard.src.stages.abs_stage import AbsStage
 from dataset_wizard.src.utils import run_with_spinner
 
 
-class AnalyzeDirStage(AbsStage):
+class SelectDatasetDirStage(AbsStage):
     def __init__(self):
         super().__init__(
-            id="analyze_dir",
+            id="select_dataset_dir",
             description="Welcome to the Dataset Directory Analyzer!\n"
             "We'll inspect the dataset folder and summarize its structure for "
             "further processing.",
-            final_message="✅ Directory structure analysis complete and saved!",
+            provides=("dataset_dir",),
+            writes_transcript=False,
         )
 
     def run_body(self, provider, messages: List[dict]) -> bool:
         # Ask user where to save analysis
         while True:
-            user_input = self.get_user_input("Please enter the directory path you downloaded your dataset:")
+            user_input = self.get_user_input(
+                "Please enter the directory path you downloaded your dataset:", key="dataset_dir"
+            )
             target_dir = Path(user_input) if user_input else self.default_root
 
             if target_dir and target_dir.exists() and target_dir.is_dir():
@@ -30,23 +36,59 @@ class AnalyzeDirStage(AbsStage):
                     f"\n❌ The path '{target_dir}' is not a valid directory. "
                     "Please try again.\n"
                 )
+        self.context["dataset_dir"] = target_dir
+        return messages
 
-        # Spinner-style indicator
-        summary = run_with_spinner(
-            get_markdown,
-            (target_dir,),
-            "Analyzing directory structure, please wait..."
+
+class AnalyzeDirStage(AbsStage):
+    def __init__(self, use_index: bool = True, probe_audio: bool = True, index: ScanIndex = None):
+        # Needs no answers, so the scan runs while the user makes the next choices.
+        super().__init__(
+            id="analyze_dir",
+            final_message="✅ Directory structure analysis complete and saved!",
+            requires=("dataset_dir",),
+            provides=("directory_summary",),
+            interactive=False,
         )
+        self.use_index = use_index
+        self.probe_audio = probe_audio
+        # An index shared with other sessions; it stays open after the stage.
+        self.index = index
+
+    def run_body(self, provider, messages: List[dict]) -> bool:
+        target_dir = Path(self.context["dataset_dir"])
+
+        # Spinner-style indicator
+        index = self.index
+        if self.use_index and index is None:
+            try:
+                index = ScanIndex()
+            except sqlite3.Error as e:
+                print(f"⚠️  Scan index unavailable ({e}); scanning without it.")
+        progress = ScanProgress()
+        # Runs in the background, where only StageGraph's spinner is shown.
+        self.status = progress.status
+        try:
+            summary = run_with_spinner(
+                partial(
+                    get_markdown,
+                    index=index,
+                    probe_audio_headers=self.probe_audio,
+                    progress=progress,
+                ),
+                (target_dir,),
+                "Analyzing directory structure, please wait...",
+                status=progress.status,
+            )
+        finally:
+            self.status = None
+            if index is not None and index is not self.index:
+                index.close()
 
         # Interact with provider
         text = f"""Here is the structure of the dataset directory:
 
 {summary}
 """
-        messages.append(
-            {
-                "role": "user",
-                "content": text,
-            }
-        )
+        self.add_reference(provider, messages, text)
         return messages
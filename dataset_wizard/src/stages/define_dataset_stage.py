@@ -1,8 +1,14 @@
 # stages/define_dataset_stage.py
 from typing import List
 
+from dataset_wizard.src.speculation import speculative_chat
 from dataset_wizard.src.stages.abs_stage import AbsStage
-from dataset_wizard.src.utils import run_with_spinner
+from dataset_wizard.src.utils import revision_request, stream_chat
+
+SAMPLE_REQUEST = {
+    "role": "user",
+    "content": "Please now write json sample that describes a example following the definition.",
+}
 
 
 class DefineDatasetStage(AbsStage):
@@ -16,6 +22,8 @@ class DefineDatasetStage(AbsStage):
                 "and which files or directories those fields should be sourced from."
             ),
             final_message="✅ Dataset field and source definition complete!",
+            requires=("directory_summary",),
+            provides=("dataset_fields",),
         )
 
     def run_body(self, provider, messages: List[dict]) -> bool:
@@ -31,41 +39,29 @@ class DefineDatasetStage(AbsStage):
             }
         )
 
-        response = run_with_spinner(
-            provider.chat,
-            (messages,),
+        response = stream_chat(
+            provider,
+            messages,
             "Analyzing dataset directory by LLM..."
         )
         messages.append({"role": provider.assistant_name, "content": response})
         while True:
+            # Ask for the sample as if the definition was approved already.
+            speculation = self.speculate(provider, messages + [SAMPLE_REQUEST])
             confirm = self.get_user_input(
                 response + "\n\n"
-                "Do you approve this definition? (y to accept, anything else to revise)"
+                "Do you approve this definition? (y to accept, anything else to revise)",
+                key="approve_fields",
             )
 
             if confirm == "y":
-                messages.append(
-                    {
-                        "role": "user",
-                        "content": "Please now write json sample that describes a example "
-                        "following the definition.",
-                    }
-                )
-                final_response = provider.chat(messages)
+                messages.append(dict(SAMPLE_REQUEST))
+                final_response = speculative_chat(speculation, provider, messages)
                 print("\n[Generated Dataset Sample]\n")
                 print(final_response)
                 messages.append({"role": provider.assistant_name, "content": final_response})
                 return messages
             else:
-                messages.append(
-                    {
-                        "role": "user",
-                        "content": f"""Please revise the previous proposal based on my
-feedback and regenerate the table and example.
-
-{confirm}
-""",
-                    }
-                )
-                response = provider.chat(messages)
+                messages.append(revision_request(confirm))
+                response = speculative_chat(speculation, provider, messages)
                 messages.append({"role": provider.assistant_name, "content": response})
@@ -2,8 +2,21 @@
 from pathlib import Path
 from typing import List
 
+from dataset_wizard.src.speculation import speculative_chat
 from dataset_wizard.src.stages.abs_stage import AbsStage
-from dataset_wizard.src.utils import run_with_spinner
+from dataset_wizard.src.utils import revision_request, stream_chat
+
+DEFAULT_SAVE_DIR = Path("./data")
+
+
+def split_request(save_dir: Path) -> dict:
+    return {
+        "role": "user",
+        "content": (
+            f"We will save the final DatasetDict to `{save_dir}`.\n"
+            "Please suggest how the DatasetDict should be split (e.g., train/dev/test)."
+        ),
+    }
 
 
 class DefineDatasetDictStage(AbsStage):
@@ -16,30 +29,30 @@ class DefineDatasetDictStage(AbsStage):
                 "(e.g., by folder, metadata, train/dev/test, etc.)."
             ),
             final_message="✅ DatasetDict configuration complete and ready for saving.",
+            requires=("dataset_fields",),
+            provides=("splits",),
         )
 
     def run_body(self, provider, messages: List[dict]) -> bool:
+        # Most users keep the default, so ask for splits with it right away
+        speculation = self.speculate(provider, messages + [split_request(DEFAULT_SAVE_DIR)])
+
         # Ask where to save the DatasetDict
         user_input = self.get_user_input(
-            "Where should the processed DatasetDict be saved? (press Enter for default './data')"
+            "Where should the processed DatasetDict be saved? (press Enter for default './data')",
+            key="output_dir",
         )
-        save_dir = Path(user_input) if user_input else Path("./data")
+        # "y" accepts the default as well
+        save_dir = Path(user_input) if user_input and user_input != "y" else DEFAULT_SAVE_DIR
 
         # Append instruction for AI to propose splits
-        messages.append(
-            {
-                "role": "user",
-                "content": (
-                    f"We will save the final DatasetDict to `{save_dir}`.\n"
-                    "Please suggest how the DatasetDict should be split (e.g., train/dev/test)."
-                ),
-            }
-        )
+        messages.append(split_request(save_dir))
 
         # Let the provider respond
-        response = run_with_spinner(
-            provider.chat,
-            (messages,),
+        response = speculative_chat(
+            speculation,
+            provider,
+            messages,
             "Analyzing dataset dict by LLM..."
         )
         print(response)
@@ -49,20 +62,12 @@ class DefineDatasetDictStage(AbsStage):
         while True:
             confirm = self.get_user_input(
                 response + "\n\n" +
-                "Do you approve this split definition? (y to accept, anything else to revise)"
+                "Do you approve this split definition? (y to accept, anything else to revise)",
+                key="approve_splits",
             )
             if confirm == "y":
                 return messages
             else:
-                messages.append(
-                    {
-                        "role": "user",
-                        "content": f"""Please revise the previous proposal based on my
-feedback and regenerate the table and example.
-
-{confirm}
-""",
-                    }
-                )
-                response = provider.chat(messages)
+                messages.append(revision_request(confirm))
+                response = stream_chat(provider, messages)
                 messages.append({"role": provider.assistant_name, "content": response})
@@ -0,0 +1,153 @@
+# stages/dry_run_stage.py
+import json
+from typing import List
+
+from dataset_wizard.src.analyze_dir import DEFAULT_SCAN_TIME_BUDGET
+from dataset_wizard.src.dry_run import (
+    DEFAULT_BUDGET_HOURS,
+    DEFAULT_TIMEOUT,
+    count_files,
+    dry_run,
+    format_duration,
+    format_report,
+)
+from dataset_wizard.src.stages.abs_stage import AbsStage
+from dataset_wizard.src.utils import CodeBlockExtractor, run_with_spinner, stream_chat
+
+# Rewrites requested from the LLM (to fix a failing or to speed up a slow script).
+MAX_REWRITE_ROUNDS = 2
+CODE_FORMAT = "Please wrap the entire code in a single Python code block using triple backticks (```python)."
+
+
+class DryRunDatasetCodeStage(AbsStage):
+    def __init__(self, budget_hours: float = DEFAULT_BUDGET_HOURS, timeout: float = DEFAULT_TIMEOUT):
+        super().__init__(
+            id="dry_run_dataset_code",
+            description=(
+                "Run create_dataset.py on a small sample of your dataset to check that it works\n"
+                "and to estimate how long it will take on the full dataset."
+            ),
+            final_message="✅ Dry run of the dataset creation code complete.",
+            requires=("create_dataset_script",),
+            provides=("dry_run_report",),
+        )
+        self.budget_hours = budget_hours
+        self.timeout = timeout
+        self._total_files = None
+
+    def _dry_run(self, script_path):
+        if self._total_files is None:
+            # Once per stage, not per rewrite: the walk is slow on network mounts.
+            self._total_files = run_with_spinner(
+                count_files,
+                (self.context["dataset_dir"], DEFAULT_SCAN_TIME_BUDGET),
+                "Counting the files of the dataset...",
+            )
+        result = run_with_spinner(
+            dry_run,
+            (script_path, self.context["dataset_dir"], self.timeout, self._total_files),
+            "Running create_dataset.py on a sample of the dataset...",
+        )
+        print(f"\n{format_report(result)}\n")
+        return result
+
+    def _rewrite_request(self, result) -> str:
+        if not result["ok"]:
+            return (
+                "Running create_dataset.py on a sample of the dataset failed:\n"
+                f"```\n{result['error']}\n```\n"
+                f"Please fix the script. {CODE_FORMAT}"
+            )
+        return (
+            "I ran create_dataset.py on a sample of the dataset:\n"
+            f"```\n{format_report(result)}\n```\n"
+            f"The full dataset would take about {format_duration(result['projected_s'])}, "
+            f"more than the budget of {format_duration(self.budget_hours * 3600)}.\n"
+            "Please rewrite the script to run faster, guided by the hotspots above "
+            "(e.g. avoid repeated work, batch or parallelize the slow steps), "
+            f"without changing the dataset it creates. {CODE_FORMAT}"
+        )
+
+    def run_body(self, provider, messages: List[dict]) -> bool:
+        save_path = self.results_dir / "create_dataset.py"
+        report_path = self.results_dir / "dry_run.json"
+        budget_s = self.budget_hours * 3600
+        attempts = []
+        self._total_files = None
+
+        # ``code``/``result`` is the script on disk; ``last`` the latest attempt,
+        # which the next rewrite request is about.
+        code = save_path.read_text(encoding="utf-8")
+        result = last = self._dry_run(save_path)
+        attempts.append(result)
+        for _ in range(MAX_REWRITE_ROUNDS):
+            if result["ok"] and result["projected_s"] <= budget_s:
+                break
+            if last.get("sample_artifact"):
+                # Not the script's fault; a rewrite would only learn to skip inputs.
+                break
+            if last["ok"]:
+                print(
+                    f"⚠️  Projected runtime exceeds the budget of {format_duration(budget_s)}; "
+                    "asking the AI for a faster version..."
+                )
+            else:
+                print("⚠️  Asking the AI to fix the script...")
+            messages.append({"role": "user", "content": self._rewrite_request(last)})
+            extractor = CodeBlockExtractor()
+            response = stream_chat(
+                provider, messages, "Rewriting create_dataset.py ...", extractor=extractor
+            )
+            messages.append({"role": provider.assistant_name, "content": response})
+            if extractor.code is None:
+                print("\n⚠️  No code block found; keeping the current script.")
+                break
+
+            new_code = extractor.code.strip()
+            save_path.write_text(new_code, encoding="utf-8")
+            last = self._dry_run(save_path)
+            attempts.append(last)
+            # A rewrite replaces the script only if it passes the sample,
+            # and a working script only if it is also faster.
+            if last["ok"] and (not result["ok"] or last["projected_s"] < result["projected_s"]):
+                code, result = new_code, last
+                continue
+            save_path.write_text(code, encoding="utf-8")
+            if result["ok"]:
+                reason = "failed on the sample" if not last["ok"] else "was not faster on the sample"
+                messages.append(
+                    {
+                        "role": "user",
+                        "content": f"That version {reason}, so I kept the previous create_dataset.py.",
+                    }
+                )
+                print(f"Keeping the previous script; the new version {reason}.")
+                break
+
+        if not result["ok"] and last is not result:
+            messages.append(
+                {
+                    "role": "user",
+                    "content": "No version passed the sample, so I kept the original create_dataset.py.",
+                }
+            )
+        if not result["ok"] and result.get("sample_artifact"):
+            print(
+                "⚠️  The script needs input files that the sample leaves out, so it could not be "
+                "dry-run; check it on the full dataset."
+            )
+        elif not result["ok"]:
+            print("❌ create_dataset.py still fails on the sample; check it before running it.")
+        elif result["projected_s"] > budget_s:
+            print(
+                f"⚠️  The full run is projected to take {format_duration(result['projected_s'])}, "
+                f"over the budget of {format_duration(budget_s)}."
+            )
+
+        self.outputs[str(save_path)] = code
+        report = json.dumps({"budget_s": budget_s, "attempts": attempts}, indent=2)
+        report_path.write_text(report, encoding="utf-8")
+        self.outputs[str(report_path)] = report
+        self.context["dry_run_report"] = str(report_path)
+        print(f"Dry run report saved to: {report_path}")
+        return messages
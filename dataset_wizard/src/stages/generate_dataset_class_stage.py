@@ -1,72 +1,94 @@
 # stages/generate_dataset_code_stage.py
-import re
-from pathlib import Path
 from typing import List
 
+from dataset_wizard.src.candidates import MODULE, generate_candidates
+from dataset_wizard.src.speculation import speculative_chat
 from dataset_wizard.src.stages.abs_stage import AbsStage
-from dataset_wizard.src.utils import run_with_spinner
-from dataset_wizard.src.utils import load_resource
+from dataset_wizard.src.utils import REGENERATE_REQUEST, CodeBlockExtractor
+
+DEFAULT_CLASS_NAME = "Dataset"
+
+
+def class_request(class_name: str) -> dict:
+    return {
+        "role": "user",
+        "content": (
+            "Based on the following reference script, generate a Python script of dataset.py.\n"
+            f"The class name should be {class_name}\n."
+            "Please wrap the entire code in a single Python code block using triple backticks (```python).\n"
+        ),
+    }
 
 
 class GenerateDatasetClassStage(AbsStage):
-    def __init__(self):
+    def __init__(self, candidates: int = 1):
         super().__init__(
-            id="generate_dataset_code",
+            id="generate_dataset_class",
             description=(
                 "In this final stage, we will generate the full dataset class.\n"
             ),
             final_message="✅ Dataset creation code successfully generated.",
+            requires=("dataset_class_info",),
+            provides=("dataset_class",),
         )
+        # With more than one, candidates are requested concurrently and the
+        # best locally validated one is kept.
+        self.candidates = candidates
 
     def run_body(self, provider, messages: List[dict]) -> bool:
-        save_path = Path("dataset/dataset.py")
+        save_path = self.results_dir / "dataset.py"
         save_path.parent.mkdir(parents=True, exist_ok=True)
 
+        # Generate with the default name while the user decides
+        speculation = None
+        if self.candidates == 1:
+            speculation = self.speculate(provider, messages + [class_request(DEFAULT_CLASS_NAME)])
+
         user_input = self.get_user_input(
-            "Do you want to change dataset class name from the default name? Default: Dataset)"
+            "Do you want to change dataset class name from the default name? Default: Dataset)",
+            key="class_name",
         )
         if user_input == "y":
-            user_input = "Dataset"
+            user_input = DEFAULT_CLASS_NAME
 
-        messages.append(
-            {
-                "role": "user",
-                "content": (
-                    "Based on the following reference script, generate a Python script of dataset.py.\n"
-                    f"The class name should be {user_input}\n."
-                    "Please wrap the entire code in a single Python code block using triple backticks (```python).\n"
-                ),
-            }
-        )
+        messages.append(class_request(user_input))
 
         retry_count = 0
         while retry_count < 2:
-            response = run_with_spinner(
-                provider.chat,
-                (messages,),
-                "Generating dataset class..."
-            )
+            if self.candidates > 1:
+                best = generate_candidates(
+                    provider,
+                    messages,
+                    self.candidates,
+                    MODULE,
+                    message="Generating dataset class...",
+                )
+                response, code = best["response"], best["code"]
+            else:
+                # Extract the code block while the reply streams in
+                extractor = CodeBlockExtractor()
+                response = speculative_chat(
+                    speculation,
+                    provider,
+                    messages,
+                    "Generating dataset class...",
+                    extractor=extractor,
+                )
+                code = extractor.code
+                speculation = None
             messages.append({"role": provider.assistant_name, "content": response})
 
-            # Extract code block
-            code_blocks = re.findall(r"```(?:python)?\n(.*?)```", response, re.DOTALL)
-            if code_blocks:
-                code = code_blocks[0].strip()
+            if code is not None:
+                code = code.strip()
                 print(f"\nSaving generated script to: {save_path}")
                 save_path.write_text(code, encoding="utf-8")
+                self.outputs[str(save_path)] = code
                 return messages
             else:
                 print(
                     "\n⚠️  No code block found. Asking AI to regenerate with proper formatting..."
                 )
-                messages.append(
-                    {
-                        "role": "user",
-                        "content": (
-                            "Please regenerate the previous script, ensuring the entire code is wrapped in triple backticks like this:```python\n# code here\n```."
-                        ),
-                    }
-                )
+                messages.append({"role": "user", "content": REGENERATE_REQUEST})
                 retry_count += 1
 
         print(
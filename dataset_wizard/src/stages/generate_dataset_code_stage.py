@@ -1,14 +1,13 @@
 # stages/generate_dataset_code_stage.py
-import re
-from pathlib import Path
 from typing import List
 
+from dataset_wizard.src.candidates import SCRIPT, generate_candidates
 from dataset_wizard.src.stages.abs_stage import AbsStage
-from dataset_wizard.src.utils import run_with_spinner
+from dataset_wizard.src.utils import REGENERATE_REQUEST, CodeBlockExtractor, stream_chat
 
 
 class GenerateDatasetCodeStage(AbsStage):
-    def __init__(self):
+    def __init__(self, candidates: int = 1):
         super().__init__(
             id="generate_dataset_code",
             description=(
@@ -17,10 +16,15 @@ class GenerateDatasetCodeStage(AbsStage):
                 "and will produce either a Hugging Face DatasetDict or a Lhotse CutSet depending on your choice.\n"
             ),
             final_message="✅ Dataset creation code successfully generated.",
+            requires=("dataset_info",),
+            provides=("create_dataset_script",),
         )
+        # With more than one, candidates are requested concurrently and the
+        # best locally validated one is kept.
+        self.candidates = candidates
 
     def run_body(self, provider, messages: List[dict]) -> bool:
-        save_path = Path("dataset/create_dataset.py")
+        save_path = self.results_dir / "create_dataset.py"
         save_path.parent.mkdir(parents=True, exist_ok=True)
 
         messages.append(
@@ -36,32 +40,39 @@ class GenerateDatasetCodeStage(AbsStage):
 
         retry_count = 0
         while retry_count < 2:
-            response = run_with_spinner(
-                provider.chat,
-                (messages,),
-                "Generating create_dataset.py ..."
-            )
+            if self.candidates > 1:
+                best = generate_candidates(
+                    provider,
+                    messages,
+                    self.candidates,
+                    SCRIPT,
+                    dataset_dir=self.context.get("dataset_dir"),
+                    message="Generating create_dataset.py ...",
+                )
+                response, code = best["response"], best["code"]
+            else:
+                # Extract the code block while the reply streams in
+                extractor = CodeBlockExtractor()
+                response = stream_chat(
+                    provider,
+                    messages,
+                    "Generating create_dataset.py ...",
+                    extractor=extractor,
+                )
+                code = extractor.code
             messages.append({"role": provider.assistant_name, "content": response})
 
-            # Extract code block
-            code_blocks = re.findall(r"```(?:python)?\n(.*?)```", response, re.DOTALL)
-            if code_blocks:
-                code = code_blocks[0].strip()
+            if code is not None:
+                code = code.strip()
                 print(f"\nSaving generated script to: {save_path}")
                 save_path.write_text(code, encoding="utf-8")
+                self.outputs[str(save_path)] = code
                 return messages
             else:
                 print(
                     "\n⚠️  No code block found. Asking AI to regenerate with proper formatting..."
                 )
-                messages.append(
-                    {
-                        "role": "user",
-                        "content": (
-                            "Please regenerate the previous script, ensuring the entire code is wrapped in triple backticks like this:```python\n# code here\n```."
-                        ),
-                    }
-                )
+                messages.append({"role": "user", "content": REGENERATE_REQUEST})
                 retry_count += 1
 
         print(
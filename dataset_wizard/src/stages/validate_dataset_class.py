@@ -5,39 +5,42 @@ from pathlib import Path
 from dataset_wizard.src.utils import load_resource
 import inquirer
 
-from dataset_wizard.src.utils import run_with_spinner
+from dataset_wizard.src.utils import stream_chat
+
+
+CHECK_PROMPT = (
+    "Based on the current conversation so far, I want to generate a `dataset.py`.\n"
+    "Please check if any important information is missing to generate it correctly.\n"
+    "If anything is missing, list what needs to be clarified.\n"
+    "If nothing is missing, reply only with: All required information is available."
+)
 
 
 class ValidateDatasetClassStage(AbsStage):
     def __init__(self):
         super().__init__(
-            id="generate_dataset_class",
+            id="validate_dataset_class",
             description=(
                 "Now we will generate the Python class used to load the dataset you created.\n"
                 "This class is responsible for reading the saved dataset files and returning structured examples.\n"
             ),
-            final_message="✅ Dataset class successfully generated."
+            final_message="✅ Dataset class successfully generated.",
+            requires=("create_dataset_script",),
+            provides=("dataset_class_info",),
         )
 
     def run_body(self, provider, messages: List[dict]) -> bool:
         reference_code = load_resource("ref_dataset.py")
 
-        messages.append({
-            "role": "user",
-            "content": (
-                "Based on the current conversation so far, I want to generate a `dataset.py`.\n"
-                "Please check if any important information is missing to generate it correctly.\n"
-                "If anything is missing, list what needs to be clarified.\n"
-                ""
-                "If nothing is missing, reply only with: All required information is available."
-                "\n"
-                "**Reference class**\n"
-                "```\n" + reference_code + "\n```"
-            )
-        })
-        reply = run_with_spinner(
-            provider.chat,
-            (messages,),
+        # The reference goes into the stable prompt prefix; the question is
+        # asked with the same wording on every round.
+        self.add_reference(
+            provider, messages, "**Reference class**\n```\n" + reference_code + "\n```"
+        )
+        messages.append({"role": "user", "content": CHECK_PROMPT})
+        reply = stream_chat(
+            provider,
+            messages,
             "Check if we need more information..."
         )
 
@@ -46,16 +49,8 @@ class ValidateDatasetClassStage(AbsStage):
             if "All required information is available" in reply:
                 return messages
 
-            user_response = self.get_user_input(reply)
+            user_response = self.get_user_input(reply, key="missing_info")
             messages.append({"role": "user", "content": user_response})
 
-            messages.append({
-                "role": "user",
-                "content": (
-                    "Based on the current conversation so far, I want to generate a `dataset.py`.\n"
-                    "Please check if any important information is missing to generate it correctly.\n"
-                    "If anything is missing, list what needs to be clarified.\n"
-                    "If nothing is missing, reply only with: All required information is available."
-                )
-            })
-            reply = provider.chat(messages)
+            messages.append({"role": "user", "content": CHECK_PROMPT})
+            reply = stream_chat(provider, messages)
@@ -2,43 +2,50 @@
 from pathlib import Path
 from typing import List
 
-import inquirer
 
 from dataset_wizard.src.stages.abs_stage import AbsStage
 from dataset_wizard.src.utils import load_resource
-from dataset_wizard.src.utils import run_with_spinner
+from dataset_wizard.src.utils import stream_chat
 
 
-class ValidateDatasetInfoStage(AbsStage):
+CHECK_PROMPT = (
+    "Based on the current conversation so far, I want to generate a `create_dataset.py` script.\n"
+    "Please check if any important information is missing to generate it correctly.\n"
+    "If anything is missing, list what needs to be clarified.\n"
+    "If nothing is missing, reply only with: All required information is available."
+)
+
+
+def reference_message(reference_code: str) -> str:
+    return "**Reference code**\n```\n" + reference_code + "\n```"
+
+
+class SelectReferenceStage(AbsStage):
     def __init__(self):
         super().__init__(
-            id="validate_dataset_info",
+            id="select_reference",
             description=(
-                "Check if all required information for dataset generation is available.\n"
-                "We’ll ask the AI to identify any missing details and resolve them iteratively."
+                "Choose the dataset format; its reference code guides the generated scripts."
             ),
-            final_message="✅ All required information for dataset generation is confirmed."
+            provides=("reference_code",),
+            writes_transcript=False,
         )
 
     def run_body(self, provider, messages: List[dict]) -> bool:
         # Prompt user for format choice
-        questions = [
-            inquirer.List(
-                "format_choice",
-                message="Select the dataset format you want to use:",
-                choices=["Hugging Face DatasetDict", "Lhotse CutSet", "Other (manual)"],
-            )
-        ]
-        answers = inquirer.prompt(questions)
-        format_choice = answers["format_choice"]
+        format_choice = self.choose(
+            "format_choice",
+            "Select the dataset format you want to use:",
+            ["Hugging Face DatasetDict", "Lhotse CutSet", "Other (manual)"],
+        )
 
         # For manual option, ask for reference script
         reference_script = None
         if format_choice == "Other (manual)":
-            print(
-                "Please enter the path to a reference script to guide the dataset creation code generation:"
+            reference_input = self.ask(
+                "reference_script",
+                "Please enter the path to a reference script to guide the dataset creation code generation:",
             )
-            reference_input = input("\n> ").strip()
             reference_script = Path(reference_input) if reference_input else None
 
         # Ask for code generation based on selected format
@@ -53,41 +60,39 @@ class ValidateDatasetInfoStage(AbsStage):
             reference_code = load_resource("huggingface_crate_dataset.py")
         elif format_choice == "Lhotse CutSet":
             reference_code = load_resource("lhotse_crate_dataset.py")
+        self.context["reference_code"] = reference_code
+        return messages
 
-        messages.append({
-            "role": "user",
-            "content": (
-                "Based on the current conversation so far, I want to generate a `create_dataset.py` script.\n"
-                "Please check if any important information is missing to generate it correctly.\n"
-                "If anything is missing, list what needs to be clarified.\n"
-                ""
-                "If nothing is missing, reply only with: All required information is available."
-                "\n"
-                "**Reference code**\n"
-                "```\n" + reference_code + "\n```"
-            )
-        })
-        reply = run_with_spinner(
-            provider.chat,
-            (messages,),
-            "Check if we need more information..."
+
+class ValidateDatasetInfoStage(AbsStage):
+    def __init__(self):
+        super().__init__(
+            id="validate_dataset_info",
+            description=(
+                "Check if all required information for dataset generation is available.\n"
+                "We’ll ask the AI to identify any missing details and resolve them iteratively."
+            ),
+            final_message="✅ All required information for dataset generation is confirmed.",
+            requires=("splits", "reference_code"),
+            provides=("dataset_info",),
         )
 
+    def run_body(self, provider, messages: List[dict]) -> bool:
+        reference_code = self.context["reference_code"]
+
+        # The reference goes into the stable prompt prefix; the question is
+        # asked with the same wording on every round.
+        self.add_reference(provider, messages, reference_message(reference_code))
+        messages.append({"role": "user", "content": CHECK_PROMPT})
+        reply = stream_chat(provider, messages, "Check if we need more information...")
+
         while True:
             messages.append({"role": provider.assistant_name, "content": reply})
             if "All required information is available" in reply:
                 return messages
 
-            user_response = self.get_user_input(reply)
+            user_response = self.get_user_input(reply, key="missing_info")
             messages.append({"role": "user", "content": user_response})
 
-            messages.append({
-                "role": "user",
-                "content": (
-                    "Based on the current conversation so far, I want to generate a `create_dataset.py` script.\n"
-                    "Please check if any important information is missing to generate it correctly.\n"
-                    "If anything is missing, list what needs to be clarified.\n"
-                    "If nothing is missing, reply only with: All required information is available."
-                )
-            })
-            reply = provider.chat(messages)
+            messages.append({"role": "user", "content": CHECK_PROMPT})
+            reply = stream_chat(provider, messages)
@@ -0,0 +1,300 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from dataset_wizard.src.utils import estimate_tokens
+
+TELEMETRY_FILENAME = "telemetry.jsonl"
+
+# USD per 1M (prompt, completion) tokens, list prices used for estimates only.
+# Looked up by the longest matching model name prefix.
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "o4-mini": (1.10, 4.40),
+    "o3-mini": (1.10, 4.40),
+    "o3": (2.00, 8.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "replay": (0.0, 0.0),
+}
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """
+    Returns:
+        float: estimated USD, or None for models without a known price.
+    """
+    matches = [name for name in MODEL_PRICES if str(model).startswith(name)]
+    if not matches:
+        return None
+    prompt_price, completion_price = MODEL_PRICES[max(matches, key=len)]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+def load_events(path):
+    """
+    Events of a telemetry file; a line cut off by a crash is skipped.
+    """
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return events
+
+
+class Telemetry:
+    """
+    Structured event stream of a wizard session.
+
+    Every event is a flat dict with an ``event`` kind ("llm_call", "stage",
+    "session") and a ``time`` stamp. Events are kept in memory, passed to
+    subscribers as they happen and, with ``path``, appended to a JSONL file
+    so they survive a crash. With ``append``, the events already in that
+    file (e.g. of a session being resumed) are kept and loaded, so totals
+    and summary cover the whole session.
+    """
+
+    def __init__(self, path=None, append=False):
+        self.events = []
+        self.current_stage = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._file = None
+        if path is not None:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if append and path.exists():
+                self.events = load_events(path)
+            self._file = open(path, "a" if append else "w", encoding="utf-8")
+        self.path = path
+
+    def subscribe(self, callback):
+        """Call ``callback(event)`` for every event from now on."""
+        self._subscribers.append(callback)
+
+    def emit(self, kind, **fields):
+        event = {"event": kind, "time": time.time(), **fields}
+        with self._lock:
+            self.events.append(event)
+            if self._file is not None:
+                self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+                self._file.flush()
+        for callback in self._subscribers:
+            callback(event)
+        return event
+
+    @contextmanager
+    def stage(self, stage_id, calls=True):
+        """
+        Time a stage; LLM calls made inside are attributed to it. Yields the
+        fields of the stage event, so the caller can set e.g. its ``status``.
+
+        Stages running next to the one making LLM calls pass ``calls=False``,
+        which times them without taking over the attribution.
+        """
+        previous = self.current_stage
+        if calls:
+            self.current_stage = stage_id
+        start = time.perf_counter()
+        fields = {"stage": stage_id, "status": "ok"}
+        try:
+            yield fields
+        except BaseException:
+            fields["status"] = "error"
+            raise
+        finally:
+            self.emit("stage", wall_s=time.perf_counter() - start, **fields)
+            if calls:
+                self.current_stage = previous
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def totals(self) -> dict:
+        """Number of LLM calls, tokens and estimated cost of the whole session."""
+        calls = [e for e in self.events if e["event"] == "llm_call"]
+        costs = [c["cost_usd"] for c in calls]
+        return {
+            "llm_calls": len(calls),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+            "completion_tokens": sum(c["completion_tokens"] for c in calls),
+            "cost_usd": None if any(cost is None for cost in costs) else sum(costs),
+        }
+
+    def summary(self) -> str:
+        """Per-stage table of wall time, LLM time, tokens, prefix cache hits and cost."""
+        calls = [e for e in self.events if e["event"] == "llm_call"]
+        rows = []
+        pending = []
+        for event in self.events:
+            # A stage event is emitted when the stage ends, after its calls;
+            # matching in order keeps stages that share an id apart.
+            if event["event"] == "llm_call" and event["stage"] is not None:
+                pending.append(event)
+            elif event["event"] == "stage":
+                stage_calls = [c for c in pending if c["stage"] == event["stage"]]
+                pending = [c for c in pending if c["stage"] != event["stage"]]
+                rows.append((event["stage"], event["wall_s"], stage_calls))
+        unattributed = [c for c in calls if c["stage"] is None]
+        if unattributed:
+            rows.append(("(no stage)", sum(c["wall_s"] for c in unattributed), unattributed))
+
+        def cost_text(cost):
+            return f"${cost:.4f}" if cost is not None else "n/a"
+
+        def total_cost(stage_calls):
+            costs = [c["cost_usd"] for c in stage_calls]
+            return None if any(cost is None for cost in costs) else sum(costs)
+
+        def prefix_hit_text(stage_calls):
+            # Share of prompt tokens read from the provider's prefix cache,
+            # over the calls whose provider reports it.
+            reported = [c for c in stage_calls if c.get("prefix_cached_tokens") is not None]
+            prompt = sum(c["prompt_tokens"] for c in reported)
+            if not prompt:
+                return "n/a"
+            return f"{100 * sum(c['prefix_cached_tokens'] for c in reported) / prompt:.0f}%"
+
+        lines = [
+            f"{'stage':<26} {'wall':>8} {'calls':>5} {'LLM':>8} {'TTFT max':>8} "
+            f"{'prompt':>8} {'compl.':>7} {'prefix':>6} {'cost':>9}"
+        ]
+        for name, wall, stage_calls in rows:
+            ttfts = [c["ttft_s"] for c in stage_calls if c.get("ttft_s") is not None]
+            lines.append(
+                f"{name:<26} {wall:>7.1f}s {len(stage_calls):>5} "
+                f"{sum(c['wall_s'] for c in stage_calls):>7.1f}s "
+                f"{max(ttfts) if ttfts else 0:>7.1f}s "
+                f"{sum(c['prompt_tokens'] for c in stage_calls):>8} "
+                f"{sum(c['completion_tokens'] for c in stage_calls):>7} "
+                f"{prefix_hit_text(stage_calls):>6} "
+                f"{cost_text(total_cost(stage_calls)):>9}"
+            )
+        lines.append(
+            f"{'total':<26} {sum(wall for _, wall, _ in rows):>7.1f}s {len(calls):>5} "
+            f"{sum(c['wall_s'] for c in calls):>7.1f}s {'':>8} "
+            f"{sum(c['prompt_tokens'] for c in calls):>8} "
+            f"{sum(c['completion_tokens'] for c in calls):>7} "
+            f"{prefix_hit_text(calls):>6} "
+            f"{cost_text(total_cost(calls)):>9}"
+        )
+        if rows:
+            slowest = max(rows, key=lambda row: row[1])
+            lines.append(f"Slowest stage: {slowest[0]} ({slowest[1]:.1f}s)")
+        if any(c.get("prefix_cached_tokens") is not None for c in calls):
+            lines.append("prefix: prompt tokens served from the provider's prompt prefix cache.")
+        if any(c["tokens_estimated"] for c in calls):
+            lines.append("Token counts of some calls are estimated (~4 characters per token).")
+        return "\n".join(lines)
+
+
+class InstrumentedProvider:
+    """
+    Record an ``llm_call`` event for every ``chat``/``chat_stream`` call.
+
+    Token counts come from the provider's ``last_usage`` when it reports
+    one, and are estimated from the text otherwise. Time to first token is
+    measured on streams; for ``chat`` it equals the wall time.
+    """
+
+    def __init__(self, provider, telemetry, provider_name, model):
+        self.provider = provider
+        self.telemetry = telemetry
+        self.provider_name = provider_name
+        self.model = model
+
+    def __getattr__(self, name):
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+    def fork(self):
+        return InstrumentedProvider(
+            self.provider.fork(), self.telemetry, self.provider_name, self.model
+        )
+
+    def _record(self, messages, reply, start, ttft, streamed, usage_before, error=None):
+        wall = time.perf_counter() - start
+        cached = getattr(self.provider, "last_cache_hit", False)
+        usage = getattr(self.provider, "last_usage", None)
+        if cached or error or usage is usage_before:
+            # Not reported for this call (cache hit, failure or a provider
+            # without usage): ignore the previous call's numbers.
+            usage = None
+        # Prompt tokens served from the provider's prefix cache, if reported.
+        prefix_cached_tokens = None
+        if cached:
+            prompt_tokens = completion_tokens = 0
+            estimated = False
+        elif usage:
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+            prefix_cached_tokens = usage.get("cached_tokens")
+            estimated = False
+        else:
+            prompt_tokens = sum(estimate_tokens(msg["content"]) for msg in messages)
+            completion_tokens = estimate_tokens(reply or "")
+            estimated = True
+        event = {
+            "stage": self.telemetry.current_stage,
+            "provider": self.provider_name,
+            "model": self.model,
+            "wall_s": wall,
+            "ttft_s": ttft,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "prefix_cached_tokens": prefix_cached_tokens,
+            "tokens_estimated": estimated,
+            "cost_usd": estimate_cost(self.model, prompt_tokens, completion_tokens),
+            "cached": cached,
+            "streamed": streamed,
+        }
+        if error is not None:
+            event["error"] = f"{type(error).__name__}: {error}"
+        self.telemetry.emit("llm_call", **event)
+
+    def chat(self, messages):
+        usage_before = getattr(self.provider, "last_usage", None)
+        start = time.perf_counter()
+        try:
+            reply = self.provider.chat(messages)
+        except Exception as e:
+            self._record(messages, None, start, None, False, usage_before, error=e)
+            raise
+        self._record(messages, reply, start, time.perf_counter() - start, False, usage_before)
+        return reply
+
+    def _stream(self, messages):
+        if hasattr(self.provider, "chat_stream"):
+            yield from self.provider.chat_stream(messages)
+        else:
+            yield self.provider.chat(messages)
+
+    def chat_stream(self, messages):
+        usage_before = getattr(self.provider, "last_usage", None)
+        start = time.perf_counter()
+        ttft = None
+        chunks = []
+        try:
+            for chunk in self._stream(messages):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            self._record(messages, "".join(chunks), start, ttft, True, usage_before, error=e)
+            raise
+        self._record(messages, "".join(chunks), start, ttft, True, usage_before)
@@ -1,3 +1,5 @@
+import os
+import re
 from pathlib import Path
 from typing import List
 
@@ -21,25 +23,300 @@ def load_resource(name: str) -> str:
     return resources_path.read_text(encoding="utf-8")
 
 
-from rich.console import Console
+# User messages asking to redo the previous reply, which they supersede.
+REVISION_REQUEST = (
+    "Please revise the previous proposal based on my\n"
+    "feedback and regenerate the table and example.\n\n"
+)
+REGENERATE_REQUEST = (
+    "Please regenerate the previous script, ensuring the entire code is wrapped in "
+    "triple backticks like this:```python\n# code here\n```."
+)
+
+
+def revision_request(feedback: str) -> dict:
+    return {"role": "user", "content": f"{REVISION_REQUEST}{feedback}\n"}
+
+
+def is_revision_request(msg) -> bool:
+    return msg["content"].startswith((REVISION_REQUEST, REGENERATE_REQUEST))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token count estimate (~4 characters per token for English and code).
+    """
+    return (len(text) + 3) // 4
+
+
+def get_cache_dir() -> Path:
+    """
+    Directory for persistent caches (scan index, ...).
+
+    Uses $DATASET_WIZARD_CACHE_DIR if set, otherwise $XDG_CACHE_HOME/dataset_wizard
+    (default: ~/.cache/dataset_wizard).
+    """
+    override = os.environ.get("DATASET_WIZARD_CACHE_DIR")
+    if override:
+        return Path(override).expanduser()
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "dataset_wizard"
+
+
+from rich.console import Console, Group
 from rich.spinner import Spinner
 from rich.live import Live
+from rich.text import Text
+from concurrent.futures import Future
+from contextlib import contextmanager
+import queue
+import threading
 import time
 
 console = Console()
+_display = threading.local()
+
+
+@contextmanager
+def headless():
+    """Disable live displays (spinners, streamed replies) in the current thread."""
+    _display.headless = True
+    try:
+        yield
+    finally:
+        _display.headless = False
+
+
+def is_headless() -> bool:
+    return getattr(_display, "headless", False)
+
+
+class ThreadOutput:
+    """
+    ``sys.stdout`` replacement that writes each routed thread's output to
+    its own stream and everything else to ``default``.
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self._local = threading.local()
+
+    @contextmanager
+    def route(self, stream):
+        """Send the current thread's output to ``stream``."""
+        self._local.stream = stream
+        try:
+            yield
+        finally:
+            self._local.stream = None
+
+    def _stream(self):
+        return getattr(self._local, "stream", None) or self.default
+
+    def write(self, text):
+        return self._stream().write(text)
+
+    def flush(self):
+        self._stream().flush()
+
+    def __getattr__(self, name):
+        # isatty, fileno, encoding, ... of the stream in use
+        return getattr(self._stream(), name)
+
+
+class DaemonThreadPool:
+    """
+    Bounded thread pool on daemon threads, for work that may be abandoned.
 
-def run_with_spinner(task_fn, args, message="Processing..."):
+    ``ThreadPoolExecutor`` joins its workers at interpreter exit, so a call
+    stuck on e.g. a hung network mount blocks the exit even after its result
+    was given up on. Calls still running here are dropped at exit instead.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max(1, max_workers)
+        self._queue = queue.SimpleQueue()
+        self._idle = threading.Semaphore(0)
+        self._threads = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        self._queue.put((future, fn, args))
+        # Start another worker unless one is idle, as ThreadPoolExecutor does.
+        if not self._idle.acquire(timeout=0):
+            with self._lock:
+                if self._threads < self.max_workers:
+                    self._threads += 1
+                    threading.Thread(target=self._work, daemon=True).start()
+        return future
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, fn, args = item
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+            del item, future
+            self._idle.release()
+
+    def shutdown(self, cancel_futures=False):
+        """
+        Let the workers exit once idle, without waiting for running calls;
+        with ``cancel_futures``, calls that have not started are cancelled.
+        """
+        if cancel_futures:
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[0].cancel()
+        with self._lock:
+            for _ in range(self._threads):
+                self._queue.put(None)
+
+
+def run_with_spinner(task_fn, args, message="Processing...", status=None):
     """
     Runs a blocking function with a live spinner.
 
     Args:
         task_fn (callable): a no-arg function to run.
         message (str): description shown with spinner.
+        status (callable): optional no-arg function returning text shown after
+            the message, re-evaluated on every refresh (e.g. progress counts).
 
     Returns:
         any: result of task_fn()
     """
+    if is_headless():
+        return task_fn(*args)
     spinner = Spinner("dots", text=message)
-    with Live(spinner, refresh_per_second=10, console=console):
+
+    def renderable():
+        if status is not None:
+            spinner.update(text=f"{message} {status()}")
+        return spinner
+
+    with Live(get_renderable=renderable, refresh_per_second=10, console=console):
         result = task_fn(*args)
-    return result
\ No newline at end of file
+    return result
+
+class CodeBlockExtractor:
+    """
+    Find the first fenced code block in a streamed reply while it arrives.
+
+    Matches the same block as ``re.findall(r"```(?:python)?\\n(.*?)```", text)[0]``
+    would on the full text. Chunks are only collected, and each one is
+    scanned together with the few characters before it that could start a
+    fence, so a reply is processed in linear time.
+    """
+
+    _OPEN_RE = re.compile(r"```(?:python)?\n")
+    # Longest opening fence ("```python\n") minus one, rescanned in case it was split.
+    _OPEN_OVERLAP = 9
+
+    def __init__(self):
+        self.code = None
+        self._chunks = []
+        # Received text not ruled out yet: a possible start of the opening
+        # fence, or inside the block a possible start of the closing one.
+        self._window = ""
+        # Text after the opening fence, and its length.
+        self._code_parts = None
+        self._code_len = 0
+
+    @property
+    def text(self):
+        """The reply received so far."""
+        return "".join(self._chunks)
+
+    def feed(self, chunk):
+        self._chunks.append(chunk)
+        if self.code is not None:
+            return
+        if self._code_parts is None:
+            window = self._window + chunk
+            match = self._OPEN_RE.search(window)
+            if match is None:
+                self._window = window[-self._OPEN_OVERLAP:]
+                return
+            chunk = window[match.end():]
+            self._code_parts = []
+            self._window = ""
+        self._code_parts.append(chunk)
+        self._code_len += len(chunk)
+        window = self._window + chunk
+        end = window.find("```")
+        if end == -1:
+            self._window = window[-2:]
+            return
+        self.code = "".join(self._code_parts)[: self._code_len - len(window) + end]
+
+    @property
+    def partial(self):
+        """Code received so far, or None before the opening fence."""
+        if self._code_parts is None:
+            return None
+        return self.code if self.code is not None else "".join(self._code_parts)
+
+
+def stream_chat(provider, messages, message="Waiting for the LLM...", extractor=None):
+    """
+    Call the provider and show its reply as it streams in.
+
+    A spinner is shown until the first chunk; then the tail of the reply is
+    rendered live. The display is transient since stages print the final
+    reply themselves. Providers without ``chat_stream`` fall back to
+    ``run_with_spinner``.
+
+    Args:
+        provider: provider with ``chat`` and optionally ``chat_stream``.
+        messages (List[dict]): the conversation so far.
+        message (str): description shown with the spinner.
+        extractor (CodeBlockExtractor): optional; fed every chunk.
+
+    Returns:
+        str: the full reply.
+    """
+    if not hasattr(provider, "chat_stream"):
+        response = run_with_spinner(provider.chat, (messages,), message)
+        if extractor is not None:
+            extractor.feed(response)
+        return response
+    if is_headless():
+        chunks = []
+        for chunk in provider.chat_stream(messages):
+            chunks.append(chunk)
+            if extractor is not None:
+                extractor.feed(chunk)
+        return "".join(chunks)
+
+    spinner = Spinner("dots", text=message)
+    chunks = []
+
+    def renderable():
+        if not chunks:
+            return spinner
+        status = message
+        if extractor is not None and extractor.partial is not None:
+            n_lines = extractor.partial.count("\n")
+            state = "complete" if extractor.code is not None else "in progress"
+            status = f"{message} code block {state}, {n_lines} lines"
+        spinner.update(text=status)
+        tail = "\n".join("".join(chunks).splitlines()[-max(5, console.height - 4):])
+        return Group(Text(tail), spinner)
+
+    with Live(get_renderable=renderable, refresh_per_second=10, console=console, transient=True):
+        for chunk in provider.chat_stream(messages):
+            chunks.append(chunk)
+            if extractor is not None:
+                extractor.feed(chunk)
+    return "".join(chunks)
@@ -0,0 +1,52 @@
+import subprocess
+import sys
+import textwrap
+import time
+
+HANG_S = 30
+
+
+def exit_time(code):
+    """Seconds until a Python process running ``code`` has exited."""
+    start = time.monotonic()
+    subprocess.run([sys.executable, "-c", textwrap.dedent(code)], check=True, timeout=HANG_S)
+    return time.monotonic() - start
+
+
+def test_abandoned_directory_scan_does_not_block_exit(tmp_path):
+    (tmp_path / "hung").mkdir()
+    elapsed = exit_time(
+        f"""
+        import os, time
+        from dataset_wizard.src import analyze_dir
+        scan_dir = analyze_dir._scan_dir
+
+        def slow_scan(path, **options):
+            if os.path.basename(path) == "hung":
+                time.sleep({HANG_S})
+            return scan_dir(path, **options)
+
+        analyze_dir._scan_dir = slow_scan
+        summary = analyze_dir.summarize_tree({str(tmp_path)!r}, dir_timeout=0.5)
+        assert "timed out" in str(summary), summary
+        """
+    )
+    assert elapsed < HANG_S / 2
+
+
+def test_preview_past_time_budget_does_not_block_exit(tmp_path):
+    (tmp_path / "README.txt").write_text("hello\n")
+    elapsed = exit_time(
+        f"""
+        import time
+        from dataset_wizard.src import analyze_dir
+
+        def slow_preview(*args):
+            time.sleep({HANG_S})
+
+        analyze_dir._read_preview = slow_preview
+        previews = analyze_dir.read_meta_files([{str(tmp_path / "README.txt")!r}], time_budget=0.5)
+        assert "time budget" in previews[0][1][0], previews
+        """
+    )
+    assert elapsed < HANG_S / 2
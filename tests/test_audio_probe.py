@@ -0,0 +1,22 @@
+from dataset_wizard.src.audio_probe import format_audio_summary, summarize_audio
+
+
+def stratum(paths):
+    return {"ext": ".wav", "paths": paths, "count": len(paths), "weight": 1.0}
+
+
+def test_unreadable_headers_are_not_presented_as_reliable():
+    paths = [f"/data/{i}.wav" for i in range(5)]
+    probes = {path: {"error": "not a RIFF file"} for path in paths}
+    text = format_audio_summary(summarize_audio([stratum(paths)], probes), 1)
+    assert "Probing audio headers failed" in text
+    assert ".wav: 5" in text
+    assert "can rely on" not in text
+
+
+def test_readable_headers_are_summarized():
+    paths = ["/data/0.wav", "/data/1.wav"]
+    probes = {path: {"sample_rate": 16000, "channels": 1, "duration": 2.0} for path in paths}
+    text = format_audio_summary(summarize_audio([stratum(paths)], probes), 1)
+    assert text.startswith("Headers of 2 audio files")
+    assert "16000 Hz (100%)" in text
@@ -0,0 +1,24 @@
+from dataset_wizard.src.utils import CodeBlockExtractor
+
+REPLY = "Here is the script:\n```python\nprint('hi')\n```\nand more text ```\nignored```"
+
+
+def feed(chunks):
+    extractor = CodeBlockExtractor()
+    for chunk in chunks:
+        extractor.feed(chunk)
+    return extractor
+
+
+def test_fences_split_across_chunks():
+    for size in range(1, len(REPLY) + 1):
+        extractor = feed([REPLY[i:i + size] for i in range(0, len(REPLY), size)])
+        assert extractor.code == "print('hi')\n"
+        assert extractor.text == REPLY
+
+
+def test_partial_before_and_inside_block():
+    extractor = feed(["Sure.\n``", "`python\nimport os\n", "x = 1\n`"])
+    assert extractor.code is None
+    assert extractor.partial == "import os\nx = 1\n`"
+    assert feed(["no code yet ``"]).partial is None
@@ -0,0 +1,74 @@
+from dataset_wizard.src.providers.compacting_provider import CompactingProvider, stage_record
+from dataset_wizard.src.stages.define_dataset_stage import SAMPLE_REQUEST
+from dataset_wizard.src.utils import REGENERATE_REQUEST, revision_request
+
+TABLE_REQUEST = {"role": "user", "content": "Please suggest a table explaining each field."}
+CODE_REQUEST = {"role": "user", "content": "Please generate create_dataset.py."}
+SCRIPT = "import os\nprint(os.listdir('.'))"
+
+
+def reply(content):
+    return {"role": "assistant", "content": content}
+
+
+def code_reply(code):
+    return reply(f"Here it is:\n```python\n{code}\n```\nIt lists the files.")
+
+
+def test_define_dataset_keeps_approved_table():
+    span = [TABLE_REQUEST, reply("| audio | wav/*.wav |"), dict(SAMPLE_REQUEST), reply('{"audio": "a.wav"}')]
+    request, result = stage_record("define_dataset", span)
+    assert request["content"].startswith("[State record of stage `define_dataset`]")
+    assert SAMPLE_REQUEST["content"] in request["content"]
+    assert "| audio | wav/*.wav |" in result["content"]
+    assert '{"audio": "a.wav"}' in result["content"]
+
+
+def test_define_dataset_drops_revised_table():
+    span = [
+        TABLE_REQUEST,
+        reply("| audio | wav/*.wav |"),
+        revision_request("Add a speaker field."),
+        reply("| audio | wav/*.wav |\n| speaker | directory name |"),
+        dict(SAMPLE_REQUEST),
+        reply('{"audio": "a.wav", "speaker": "spk1"}'),
+    ]
+    request, result = stage_record("define_dataset", span)
+    assert "- Add a speaker field." in request["content"]
+    assert "Please revise" not in request["content"]
+    assert result == reply(
+        '| audio | wav/*.wav |\n| speaker | directory name |\n\n{"audio": "a.wav", "speaker": "spk1"}'
+    )
+
+
+def test_single_request_and_reply_is_unchanged():
+    span = [TABLE_REQUEST, reply("| audio | wav/*.wav |")]
+    assert stage_record("define_dataset", span) is span
+
+
+def test_saved_script_replaces_the_reply():
+    outputs = {"dataset/create_dataset.py": SCRIPT}
+    span = [CODE_REQUEST, reply("Sure, the script:"), {"role": "user", "content": REGENERATE_REQUEST}, code_reply(SCRIPT)]
+    request, result = stage_record("generate_dataset_code", span, outputs)
+    assert REGENERATE_REQUEST not in request["content"]
+    assert result["content"] == f"`create_dataset.py` as saved:\n```python\n{SCRIPT}\n```"
+
+
+def test_rewritten_script_is_shown_once():
+    provider = CompactingProvider(None)
+    first = [CODE_REQUEST, code_reply(SCRIPT)]
+    faster = SCRIPT.replace("listdir", "scandir")
+    rewrite = [
+        {"role": "user", "content": "The dry run failed; please fix the script."},
+        code_reply("print('still broken')"),
+        {"role": "user", "content": "That version failed on the sample, so I kept the previous create_dataset.py."},
+        code_reply(faster),
+    ]
+    messages = first + rewrite
+    provider.end_stage("generate_dataset_code", 0, 2, {"dataset/create_dataset.py": SCRIPT})
+    provider.end_stage("dry_run_dataset_code", 2, 6, {"dataset/create_dataset.py": faster})
+    compacted = provider.compact(messages)
+    assert len(compacted) == 4
+    assert compacted[1]["content"] == "`create_dataset.py` (replaced later by stage `dry_run_dataset_code`)"
+    assert "still broken" not in compacted[3]["content"]
+    assert faster in compacted[3]["content"]
@@ -0,0 +1,20 @@
+from dataset_wizard.src.name_patterns import add_name, new_pattern_stats, render_patterns
+
+
+def patterns(names):
+    stats = new_pattern_stats()
+    for name in names:
+        add_name(stats, name)
+    return render_patterns(stats)
+
+
+def test_zero_padded_fields():
+    assert patterns(["19-198-0001.flac", "19-198-0129.flac"]) == [
+        "{int}-{int}-{int:04}.flac ×2 [19, 198, 0001..0129] e.g. 19-198-0001.flac"
+    ]
+
+
+def test_literal_placeholder_in_name():
+    assert patterns(["a{int}_1.wav", "a{int}_2.wav"]) == ["a{{int}}_{int}.wav ×2 [1..2] e.g. a{int}_1.wav"]
+    assert patterns(["{str}{7}.wav"]) == ["{{str}}{{{int}}}.wav ×1 [7] e.g. {str}{7}.wav"]
+    assert patterns(["a_1.{int}"]) == ["a_{int}.{{int}} ×1 [1] e.g. a_1.{int}"]
@@ -0,0 +1,37 @@
+import sqlite3
+
+from dataset_wizard.src import scan_index
+from dataset_wizard.src.analyze_dir import summarize_tree
+from dataset_wizard.src.scan_index import ScanIndex
+
+
+def make_tree(root):
+    for split in ("train", "test"):
+        (root / split).mkdir(parents=True)
+        for i in range(3):
+            (root / split / f"{i}.wav").write_bytes(b"")
+
+
+def test_two_indexes_share_one_file(tmp_path):
+    make_tree(tmp_path / "data")
+    db = tmp_path / "index.sqlite"
+    with ScanIndex(db) as first, ScanIndex(db) as second:
+        summary = summarize_tree(tmp_path / "data", index=first)
+        assert summarize_tree(tmp_path / "data", index=second) == summary
+        assert second.hits > 0
+    assert "[error]" not in summary
+
+
+def test_locked_index_is_a_cache_miss(tmp_path, monkeypatch):
+    make_tree(tmp_path / "data")
+    db = tmp_path / "index.sqlite"
+    monkeypatch.setattr(scan_index, "BUSY_TIMEOUT_S", 0.05)
+    with ScanIndex(db) as index:
+        expected = summarize_tree(tmp_path / "data")
+        writer = sqlite3.connect(str(db))
+        writer.execute("BEGIN EXCLUSIVE")
+        try:
+            assert summarize_tree(tmp_path / "data", index=index) == expected
+        finally:
+            writer.rollback()
+            writer.close()
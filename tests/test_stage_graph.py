@@ -0,0 +1,36 @@
+import threading
+
+from dataset_wizard.src import stage_graph
+from dataset_wizard.src.stage_graph import StageGraph
+from dataset_wizard.src.stages.abs_stage import AbsStage
+from dataset_wizard.src.telemetry import Telemetry
+
+
+class ScanStage(AbsStage):
+    def __init__(self):
+        super().__init__(id="scan", provides=("summary",), interactive=False, writes_transcript=False)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def run_body(self, provider, messages):
+        self.status = lambda: "12 dirs"
+        self.started.set()
+        self.release.wait(5)
+        self.status = None
+        return messages
+
+
+def test_waiting_spinner_shows_background_status(monkeypatch):
+    stage = ScanStage()
+    shown = []
+
+    def fake_spinner(task_fn, args, message="Processing...", status=None):
+        stage.started.wait(5)
+        shown.append((message, status()))
+        stage.release.set()
+        return task_fn(*args)
+
+    monkeypatch.setattr(stage_graph, "run_with_spinner", fake_spinner)
+    messages, completed = StageGraph([stage]).run(None, [], Telemetry())
+    assert completed
+    assert shown == [("Waiting for scan...", "[scan: 12 dirs]")]
@@ -0,0 +1,31 @@
+from dataset_wizard.src.telemetry import Telemetry
+
+
+def run_stage(telemetry, stage_id):
+    with telemetry.stage(stage_id):
+        telemetry.emit(
+            "llm_call", stage=stage_id, wall_s=0.1, prompt_tokens=10, completion_tokens=5,
+            tokens_estimated=False, cost_usd=0.0,
+        )
+
+
+def test_resumed_session_keeps_earlier_events(tmp_path):
+    path = tmp_path / "telemetry.jsonl"
+    first = Telemetry(path)
+    run_stage(first, "define_dataset")
+    first.close()
+
+    resumed = Telemetry(path, append=True)
+    run_stage(resumed, "generate_dataset_code")
+    resumed.close()
+
+    assert resumed.totals()["llm_calls"] == 2
+    assert Telemetry(path, append=True).totals()["llm_calls"] == 2
+    assert "define_dataset" in resumed.summary()
+
+
+def test_new_session_starts_empty(tmp_path):
+    path = tmp_path / "telemetry.jsonl"
+    run_stage(Telemetry(path), "define_dataset")
+    assert Telemetry(path).totals()["llm_calls"] == 0
+    assert path.read_text() == ""